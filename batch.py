@@ -0,0 +1,355 @@
+from puzzle import GOAL_LAYOUTS, PuzzleProblem, PuzzleState, PackedPuzzleProblem, PackedPuzzleState, get_board_tables
+from search import bfs, dfs, ucs, astar, idastar, bidirectional_bfs, bidirectional_astar, beam_search
+from large_boards import reduction_solve
+from heuristic import ManhattanDistance, LinearConflict, SymmetricMax, euclidean_distance_heuristic
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from collections import deque
+import argparse
+import json
+import struct
+import sys
+import time
+
+ALGORITHMS: Dict[str, Callable] = {
+    'bfs': bfs,
+    'dfs': dfs,
+    'ucs': ucs,
+    'astar': astar,
+    'idastar': idastar,
+    'bidirectional_bfs': bidirectional_bfs,
+    'bidirectional_astar': bidirectional_astar,
+    'beam': beam_search,
+    'reduction': reduction_solve,
+}
+HEURISTIC_ALGORITHMS = {'astar', 'idastar', 'bidirectional_astar', 'beam'}
+
+
+def _pattern_database(height: int, width: int):
+    from pattern_database import PatternDatabase
+    return PatternDatabase(height, width)
+
+
+def _symmetric_pattern_database(height: int, width: int):
+    return SymmetricMax(_pattern_database(height, width), height, width)
+
+
+def _walking_distance(height: int, width: int):
+    from walking_distance import WalkingDistance
+    return WalkingDistance(height, width)
+
+
+def _distance_table(height: int, width: int):
+    from distance_table import DistanceTable
+    return DistanceTable(height, width)
+
+
+# Heuristics are named so every worker builds (or memory-maps) its tables once instead of receiving them per task
+HEURISTICS: Dict[str, Callable[[int, int], Callable]] = {
+    'manhattan': ManhattanDistance,
+    'linear_conflict': LinearConflict,
+    'euclidean': lambda height, width: euclidean_distance_heuristic,
+    'pdb': _pattern_database,
+    'pdb_max': _symmetric_pattern_database,
+    'walking_distance': _walking_distance,
+}
+
+# A board travels between processes as (height, width, tiles)
+Board = Tuple[int, int, Tuple[int, ...]]
+# A board of the binary format is its height and width followed by one byte per tile in row-major order
+BINARY_HEADER = struct.Struct('BB')
+
+# Outcome of a board: solved, rejected by the solvability check, given up by an incomplete search such as beam,
+# or not searched because it could not be read or its solver raised
+SOLVED = 'solved'
+UNSOLVABLE = 'unsolvable'
+NO_SOLUTION = 'no_solution'
+ERROR = 'error'
+
+
+class BatchResult(NamedTuple):
+    index: int
+    path: List[PackedPuzzleState]
+    explored_states_count: int
+    maximum_depth_reached: int
+    wall_time: float
+    # One of SOLVED, UNSOLVABLE, NO_SOLUTION and ERROR
+    status: str
+    # Why the board could not be read or solved, None for boards that were searched
+    error: str = None
+
+
+_worker_algorithm: str = None
+_worker_heuristic: Union[str, Callable] = None
+_worker_tables: Dict[Tuple[str, int, int], Any] = {}
+
+
+def _init_worker(algorithm: str, heuristic: Union[str, Callable]) -> None:
+    global _worker_algorithm, _worker_heuristic
+    _worker_algorithm, _worker_heuristic = algorithm, heuristic
+    _worker_tables.clear()
+
+
+def _worker_table(kind: str, height: int, width: int) -> Any:
+    """
+    Returns the heuristic or distance table of a board size, building it on first use in this process
+    """
+    key = (kind, height, width)
+    if key not in _worker_tables:
+        if kind == 'table':
+            _worker_tables[key] = _distance_table(height, width)
+        elif callable(_worker_heuristic):
+            _worker_tables[key] = _worker_heuristic
+        else:
+            _worker_tables[key] = HEURISTICS[_worker_heuristic](height, width)
+    return _worker_tables[key]
+
+
+def _solve(task: Tuple[int, Board]) -> Tuple[int, List[Tuple[int, int]], int, int, float, str, Optional[str]]:
+    index, (height, width, tiles) = task
+    start_time = time.time()
+    problem = PackedPuzzleProblem(PuzzleState([list(tiles[i: i + width]) for i in range(0, height * width, width)]))
+    if not problem.is_solvable():
+        # Rejected without searching and reported as an empty path, so one bad board does not stop the batch
+        return index, [], 0, 0, time.time() - start_time, UNSOLVABLE, None
+    try:
+        if _worker_algorithm == 'table':
+            path, explored_states_count, maximum_depth_reached = _worker_table('table', height, width).solve(problem)
+        elif _worker_algorithm in HEURISTIC_ALGORITHMS:
+            heuristic = _worker_table('heuristic', height, width)
+            path, explored_states_count, maximum_depth_reached = ALGORITHMS[_worker_algorithm](problem, heuristic)
+        else:
+            path, explored_states_count, maximum_depth_reached = ALGORITHMS[_worker_algorithm](problem)
+    except Exception as e:
+        # E.g. a board size without a distance table or default pattern database; the other boards go on
+        return index, [], 0, 0, time.time() - start_time, ERROR, '{}: {}'.format(type(e).__name__, e)
+    end_time = time.time()
+    # Only the packed boards are sent back, the parent rebuilds the state objects
+    return index, [(state.packed, state.blank) for state in path], explored_states_count, \
+        maximum_depth_reached, end_time - start_time, SOLVED if path else NO_SOLUTION, None
+
+
+def _to_board(problem: PuzzleProblem) -> Board:
+    board = problem.puzzle.state
+    return len(board), len(board[0]), tuple(elem for row in board for elem in row)
+
+
+def _to_result(raw: Tuple[int, List[Tuple[int, int]], int, int, float, str, Optional[str]],
+               problems: Dict[int, PuzzleProblem]) -> BatchResult:
+    index, path, explored_states_count, maximum_depth_reached, wall_time, status, error = raw
+    problem = problems.pop(index)
+    tables = get_board_tables(problem.puzzle.height, problem.puzzle.width)
+    # Workers solve towards the canonical goal; paths are mapped back to the goal each problem asked for
+    path = problem.restore_path([PackedPuzzleState(packed, blank, tables) for packed, blank in path])
+    return BatchResult(index, path, explored_states_count, maximum_depth_reached, wall_time, status, error)
+
+
+def solve_many(problems: Iterable[PuzzleProblem], algorithm: str='astar',
+               heuristic: Union[str, Callable]='manhattan', workers: int=None,
+               chunksize: int=16) -> Iterator[BatchResult]:
+    """
+    Solves many puzzles on a pool of worker processes, yielding each result as soon as it is ready.
+    Results may arrive out of order; BatchResult.index is the position of the problem in the input.
+    Every result has a status: SOLVED with a path, or an empty path and UNSOLVABLE, NO_SOLUTION or ERROR.
+    An exception in place of a problem, as the readers below yield for the boards they cannot read, is not
+    solved but reported with the ERROR status and the exception message as its error. So is an exception raised
+    while solving a board, which does not stop the other boards.
+    :param problems: the puzzles to solve
+    :param algorithm: a name from ALGORITHMS, or 'table' to answer 3x3 boards from the complete distance table
+    :param heuristic: a name from HEURISTICS, or a picklable heuristic sent once to every worker
+    :param workers: number of worker processes, all cores if omitted; 1 solves in this process
+    :param chunksize: number of puzzles sent to a worker per message
+    :return: an iterator over BatchResult
+    """
+    if algorithm != 'table' and algorithm not in ALGORITHMS:
+        raise ValueError('Unknown algorithm {}'.format(algorithm))
+    pending = {}
+    # Boards that could not be read are answered by the parent; the pool reads the tasks from another thread
+    errors = deque()
+
+    def tasks():
+        for index, problem in enumerate(problems):
+            if isinstance(problem, Exception):
+                errors.append(BatchResult(index, [], 0, 0, 0.0, ERROR, str(problem)))
+                continue
+            pending[index] = problem
+            yield index, _to_board(problem)
+
+    if workers == 1:
+        _init_worker(algorithm, heuristic)
+        for task in tasks():
+            while errors:
+                yield errors.popleft()
+            yield _to_result(_solve(task), pending)
+        while errors:
+            yield errors.popleft()
+        return
+    # Imported here so single-process runs do not pay for it at startup
+    import multiprocessing
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(algorithm, heuristic)) as pool:
+        for raw in pool.imap_unordered(_solve, tasks(), chunksize):
+            while errors:
+                yield errors.popleft()
+            yield _to_result(raw, pending)
+    while errors:
+        yield errors.popleft()
+
+
+def goal_tiles(text: str, height: int, width: int) -> List[int]:
+    """
+    Returns the goal named by a GOAL_LAYOUTS key, or given as tiles in row-major order separated by commas
+    """
+    if text in GOAL_LAYOUTS:
+        return GOAL_LAYOUTS[text](height, width)
+    return [int(tile) for tile in text.split(',')]
+
+
+def board_problem(tiles: List[int], width: int, goal: Union[str, List[int]]=None) -> PuzzleProblem:
+    """
+    Returns the problem of a board given as tiles in row-major order, after checking it is a complete board
+    :param goal: the goal, as tiles or as a goal_tiles string, the canonical goal if omitted
+    :raise ValueError: if the tiles do not fill whole rows of the width or are not 0 to size - 1 once each, or if
+    the goal cannot be used (see GoalRelabeling)
+    """
+    if width < 1 or not tiles or len(tiles) % width:
+        raise ValueError('{} tiles do not fill rows of width {}'.format(len(tiles), width))
+    if not all(isinstance(tile, int) for tile in tiles) or sorted(tiles) != list(range(len(tiles))):
+        raise ValueError('The tiles must be 0 to {} once each, got {}'.format(len(tiles) - 1, tiles))
+    height = len(tiles) // width
+    if isinstance(goal, str):
+        goal = goal_tiles(goal, height, width)
+    if goal is not None and (not all(isinstance(tile, int) for tile in goal) or sorted(goal) != sorted(tiles)):
+        raise ValueError('The goal must hold the tiles 0 to {} once each, got {}'.format(len(tiles) - 1, goal))
+    return PuzzleProblem(PuzzleState([tiles[i: i + width] for i in range(0, len(tiles), width)]), goal=goal)
+
+
+def read_boards(lines: Iterable[str], width: int,
+                goal: str=None) -> Iterator[Union[PuzzleProblem, ValueError]]:
+    """
+    Parses one board per line, tiles in row-major order separated by spaces or commas
+    :param goal: the goal of every board (see goal_tiles), the canonical goal if omitted
+    :return: an iterator over the problems, with a ValueError in place of each line that is not a valid board
+    """
+    for line in lines:
+        try:
+            tiles = [int(tile) for tile in line.replace(',', ' ').split()]
+            if tiles:
+                yield board_problem(tiles, width, goal)
+        except ValueError as e:
+            yield e
+
+
+def _flatten(board: List, width: int) -> Tuple[List[int], int]:
+    # A list of rows sets its own width
+    if not isinstance(board, list):
+        raise ValueError('A board is a list of tiles or of rows, got {!r}'.format(board))
+    if board and isinstance(board[0], list):
+        if any(not isinstance(row, list) or len(row) != len(board[0]) for row in board):
+            raise ValueError('The rows of a board must have the same length, got {}'.format(board))
+        return [tile for row in board for tile in row], len(board[0])
+    return board, width
+
+
+def read_json_boards(lines: Iterable[str], width: int,
+                     goal: str=None) -> Iterator[Tuple[Any, Union[PuzzleProblem, ValueError]]]:
+    """
+    Parses one JSON board per line: a list of rows, a list of tiles in row-major order of the given width, or an
+    object with 'tiles' (either list) and optionally 'width', 'goal' (a list like the tiles or a goal_tiles string)
+    and an 'id' to report back
+    :param goal: the goal of the boards that do not give one (see goal_tiles), the canonical goal if omitted
+    :return: an iterator over (id, problem), the id being None when the line has none, with a ValueError in place
+    of the problem of each line that is not a valid board
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        board_id = None
+        try:
+            record = json.loads(line)
+            board_goal = goal
+            if isinstance(record, dict):
+                board_id, board_goal = record.get('id'), record.get('goal', goal)
+                if 'tiles' not in record:
+                    raise ValueError("A board object needs 'tiles'")
+                tiles, board_width = _flatten(record['tiles'], record.get('width', width))
+            else:
+                tiles, board_width = _flatten(record, width)
+            if not isinstance(board_width, int):
+                raise ValueError('The width must be an integer, got {!r}'.format(board_width))
+            if board_goal is not None and not isinstance(board_goal, str):
+                board_goal, _ = _flatten(board_goal, board_width)
+            yield board_id, board_problem(tiles, board_width, board_goal)
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError as well
+            yield board_id, e
+
+
+def read_binary_boards(stream: BinaryIO, goal: str=None) -> Iterator[Union[PuzzleProblem, ValueError]]:
+    """
+    Parses boards written by write_binary_boards until the end of the stream
+    :param goal: the goal of every board (see goal_tiles), the canonical goal if omitted
+    :return: an iterator over the problems, with a ValueError in place of each invalid board; a truncated board
+    ends the stream
+    """
+    while True:
+        header = stream.read(BINARY_HEADER.size)
+        if not header:
+            return
+        if len(header) < BINARY_HEADER.size:
+            yield ValueError('Truncated board header')
+            return
+        height, width = BINARY_HEADER.unpack(header)
+        tiles = list(stream.read(height * width))
+        if len(tiles) < height * width:
+            yield ValueError('Truncated {}x{} board'.format(height, width))
+            return
+        try:
+            yield board_problem(tiles, width, goal)
+        except ValueError as e:
+            yield e
+
+
+def write_binary_boards(stream: BinaryIO, problems: Iterable[PuzzleProblem]) -> int:
+    """
+    Writes the boards of problems in the binary format: a header of two bytes (height, width) and one byte per tile.
+    The goals are not written.
+    :return: the number of boards written
+    """
+    count = 0
+    for problem in problems:
+        board = problem.query.state
+        height, width = len(board), len(board[0])
+        tiles = [tile for row in board for tile in row]
+        stream.write(BINARY_HEADER.pack(height, width) + bytes(tiles))
+        count += 1
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve a file of boards on a pool of worker processes')
+    parser.add_argument('boards', nargs='?', help='file with one board per line, stdin if omitted')
+    parser.add_argument('--algorithm', default='astar', choices=sorted(ALGORITHMS) + ['table'])
+    parser.add_argument('--heuristic', default='manhattan', choices=sorted(HEURISTICS))
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--goal', default=None,
+                        help="goal layout: one of %s, or tiles in row-major order such as '1,2,3,4,5,6,7,8,0'"
+                             % ', '.join(sorted(GOAL_LAYOUTS)))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=16)
+    args = parser.parse_args()
+    source = open(args.boards) if args.boards else sys.stdin
+    start_time = time.time()
+    solved = 0
+    with source:
+        for result in solve_many(read_boards(source, args.width, args.goal), args.algorithm, args.heuristic,
+                                 args.workers, args.chunksize):
+            if result.status == ERROR:
+                print("%d\t%s\terror=%s" % (result.index, result.status, result.error), flush=True)
+            elif result.status == SOLVED:
+                solved += 1
+                print("%d\t%s\tcost=%d\texplored=%d\ttime=%f"
+                      % (result.index, result.status, len(result.path) - 1, result.explored_states_count,
+                         result.wall_time), flush=True)
+            else:
+                print("%d\t%s\texplored=%d\ttime=%f" % (result.index, result.status, result.explored_states_count,
+                                                         result.wall_time), flush=True)
+    print("Solved %d boards in %f seconds" % (solved, time.time() - start_time), file=sys.stderr)
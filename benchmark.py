@@ -0,0 +1,265 @@
+from puzzle import PuzzleState, PackedPuzzleProblem
+from batch import ALGORITHMS, HEURISTICS, HEURISTIC_ALGORITHMS
+from instances import random_walk_board
+from instrumentation import max_rss_kb
+from typing import Dict, Iterator, List, Tuple
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+CORPORA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora')
+KORF100_PATH = os.path.join(CORPORA_DIR, 'korf100.txt')
+
+# Uninformed searches only finish on 3x3 boards
+SMALL_BOARD_ALGORITHMS = {'bfs', 'dfs', 'ucs', 'bidirectional_bfs'}
+# Default configuration of the 15-puzzle instances: only idastar with the strongest heuristic finishes Korf's 100
+# in pure Python, some of them still in hours
+LARGE_BOARD_ALGORITHMS = ['idastar']
+LARGE_BOARD_HEURISTICS = ['pdb_max']
+# Seconds a single run may take before it is stopped and recorded as a timeout
+DEFAULT_TIME_BUDGET = 60.0
+
+# Slack allowed before a slower wall time counts as a regression; node counts are deterministic and must not grow
+TIME_TOLERANCE = 1.25
+TIME_SLACK = 0.05
+
+# An instance is (corpus, id, height, width, tiles, optimal depth or None)
+Instance = Tuple[str, str, int, int, List[int], int]
+
+
+def corpus_3x3(per_depth: int=3, seed: int=0, max_attempts: int=100000) -> List[Instance]:
+    """
+    Returns a fixed corpus of solvable 3x3 boards, up to per_depth boards for every optimal depth from 1 to 31
+    """
+    from distance_table import DistanceTable
+    table = DistanceTable(3, 3)
+    rng = random.Random(seed)
+    buckets: Dict[int, List[List[int]]] = {}
+    for _ in range(max_attempts):
+        tiles = random_walk_board(3, 3, rng.randint(1, 200), rng)
+        depth = table.distance(PackedPuzzleProblem(PuzzleState([tiles[i: i + 3] for i in range(0, 9, 3)]))
+                               .get_initial_state())
+        bucket = buckets.setdefault(depth, [])
+        if depth > 0 and len(bucket) < per_depth and tiles not in bucket:
+            bucket.append(tiles)
+        if all(len(buckets.get(d, [])) >= per_depth for d in range(1, 32)):
+            break
+    table.close()
+    return [('3x3', 'd%02d-%d' % (depth, i), 3, 3, tiles, depth)
+            for depth in sorted(buckets) for i, tiles in enumerate(buckets[depth])]
+
+
+def corpus_korf100(path: str=KORF100_PATH) -> List[Instance]:
+    """
+    Reads Korf's 100 15-puzzle instances, one per line as an optional index followed by the 16 tiles in row-major
+    order (blank as 0, goal with the blank top-left) and optionally the optimal solution length. The copy shipped in
+    corpora/ holds all 100 with their optimal lengths, from Korf's 1985 IDA* paper.
+    """
+    instances = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            values = [int(value) for value in line.split()]
+            if not values:
+                continue
+            if len(values) == 16:
+                values = [number] + values
+            if len(values) not in (17, 18) or sorted(values[1:17]) != list(range(16)):
+                raise ValueError('{} line {} is not a 15-puzzle instance'.format(path, number))
+            optimal = values[17] if len(values) > 17 else None
+            instances.append(('korf100', str(values[0]), 4, 4, values[1:17], optimal))
+    return instances
+
+
+def configurations(height: int, algorithms: List[str], heuristics: List[str]) -> Iterator[Tuple[str, str]]:
+    for algorithm in algorithms:
+        if height > 3 and algorithm in SMALL_BOARD_ALGORITHMS:
+            continue
+        if algorithm in HEURISTIC_ALGORITHMS:
+            for heuristic in heuristics:
+                yield algorithm, heuristic
+        else:
+            yield algorithm, None
+
+
+def run_instance(instance: Instance, algorithm: str, heuristic, heuristic_name: str, memory: bool) -> Dict:
+    corpus, name, height, width, tiles, optimal = instance
+    problem = PackedPuzzleProblem(PuzzleState([tiles[i: i + width] for i in range(0, height * width, width)]))
+    run = (lambda: ALGORITHMS[algorithm](problem, heuristic)) if heuristic is not None \
+        else (lambda: ALGORITHMS[algorithm](problem))
+    start_time = time.perf_counter()
+    path, explored_states_count, maximum_depth_reached = run()
+    wall_time = time.perf_counter() - start_time
+    result = {
+        'corpus': corpus, 'instance': name, 'optimal': optimal,
+        'algorithm': algorithm, 'heuristic': heuristic_name,
+        'cost': len(path) - 1, 'nodes': explored_states_count, 'maximum_depth': maximum_depth_reached,
+        'wall_time': wall_time, 'nodes_per_sec': explored_states_count / wall_time if wall_time > 0 else None,
+        'max_rss_kb': max_rss_kb(), 'timeout': False,
+    }
+    # tracemalloc slows the search down, so the peak is measured on a separate run
+    if memory:
+        tracemalloc.start()
+        run()
+        result['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def _run_child(connection, *args) -> None:
+    connection.send(run_instance(*args))
+    connection.close()
+
+
+def run_with_budget(instance: Instance, algorithm: str, heuristic, heuristic_name: str, memory: bool,
+                    time_budget: float=None) -> Dict:
+    """
+    Runs an instance like run_instance, in a child process that is stopped after time_budget seconds. A stopped
+    run is recorded as a timeout, with no cost and no node count.
+    """
+    if time_budget is None:
+        return run_instance(instance, algorithm, heuristic, heuristic_name, memory)
+    # Forked, so the child shares the tables of the heuristic already loaded here
+    import multiprocessing
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_child,
+                              args=(sender, instance, algorithm, heuristic, heuristic_name, memory), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv() if receiver.poll(time_budget) else None
+    except EOFError:
+        # The child died before sending a result; its traceback is already on stderr
+        raise RuntimeError('%s %s %s/%s failed' % (instance[0], instance[1], algorithm, heuristic_name or '-'))
+    finally:
+        process.terminate()
+        process.join()
+        receiver.close()
+    if result is not None:
+        return result
+    corpus, name, _, _, _, optimal = instance
+    return {'corpus': corpus, 'instance': name, 'optimal': optimal, 'algorithm': algorithm,
+            'heuristic': heuristic_name, 'cost': None, 'nodes': None, 'maximum_depth': None,
+            'wall_time': time_budget, 'nodes_per_sec': None, 'timeout': True}
+
+
+def summarize(results: List[Dict]) -> Dict[str, Dict]:
+    summary = {}
+    for result in results:
+        key = '%s/%s/%s' % (result['corpus'], result['algorithm'], result['heuristic'] or '-')
+        entry = summary.setdefault(key, {'instances': 0, 'nodes': 0, 'wall_time': 0.0, 'suboptimal': 0,
+                                         'timeouts': 0})
+        entry['instances'] += 1
+        if result.get('timeout'):
+            # Counted apart: the nodes and time of an unfinished run do not compare
+            entry['timeouts'] += 1
+            continue
+        entry['nodes'] += result['nodes']
+        entry['wall_time'] += result['wall_time']
+        if result['optimal'] is not None and result['cost'] != result['optimal']:
+            entry['suboptimal'] += 1
+    for entry in summary.values():
+        entry['nodes_per_sec'] = entry['nodes'] / entry['wall_time'] if entry['wall_time'] > 0 else None
+    return summary
+
+
+def compare(summary: Dict[str, Dict], baseline: Dict[str, Dict]) -> List[str]:
+    """
+    Returns a description of every regression of summary against a baseline summary
+    """
+    regressions = []
+    for key, entry in sorted(summary.items()):
+        base = baseline.get(key)
+        if base is None or base['instances'] != entry['instances']:
+            continue
+        if entry['nodes'] > base['nodes']:
+            regressions.append('%s: nodes %d -> %d' % (key, base['nodes'], entry['nodes']))
+        if entry['wall_time'] > max(base['wall_time'] * TIME_TOLERANCE, base['wall_time'] + TIME_SLACK):
+            regressions.append('%s: wall time %.3fs -> %.3fs' % (key, base['wall_time'], entry['wall_time']))
+        if entry['suboptimal'] > base['suboptimal']:
+            regressions.append('%s: suboptimal solutions %d -> %d' % (key, base['suboptimal'], entry['suboptimal']))
+        if entry['timeouts'] > base.get('timeouts', 0):
+            regressions.append('%s: timeouts %d -> %d' % (key, base.get('timeouts', 0), entry['timeouts']))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark every algorithm/heuristic combination on fixed corpora')
+    parser.add_argument('--corpus', nargs='+', default=['3x3', 'korf100'], choices=['3x3', 'korf100'])
+    parser.add_argument('--korf100', default=KORF100_PATH, help="file with Korf's 100 instances")
+    parser.add_argument('--per-depth', type=int, default=3, help='3x3 boards per optimal depth')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--limit', type=int, default=None, help='maximum instances per corpus')
+    parser.add_argument('--algorithms', nargs='+', default=sorted(ALGORITHMS), choices=sorted(ALGORITHMS))
+    parser.add_argument('--heuristics', nargs='+', default=['manhattan', 'linear_conflict', 'euclidean'],
+                        choices=sorted(HEURISTICS))
+    parser.add_argument('--large-algorithms', nargs='+', default=LARGE_BOARD_ALGORITHMS, choices=sorted(ALGORITHMS),
+                        help='algorithms run on boards larger than 3x3')
+    parser.add_argument('--large-heuristics', nargs='+', default=LARGE_BOARD_HEURISTICS, choices=sorted(HEURISTICS),
+                        help='heuristics used on boards larger than 3x3')
+    parser.add_argument('--time-budget', type=float, default=DEFAULT_TIME_BUDGET,
+                        help='seconds per run before it is recorded as a timeout, 0 for no limit')
+    parser.add_argument('--memory', action='store_true', help='also measure peak traced memory with tracemalloc')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help='results file to compare against')
+    args = parser.parse_args()
+
+    instances = []
+    if '3x3' in args.corpus:
+        instances += corpus_3x3(args.per_depth, args.seed)[:args.limit]
+    if 'korf100' in args.corpus:
+        if not os.path.exists(args.korf100):
+            print('The korf100 corpus %s is missing' % args.korf100, file=sys.stderr)
+            exit(1)
+        instances += corpus_korf100(args.korf100)[:args.limit]
+
+    heuristic_cache = {}
+    results = []
+    for instance in instances:
+        height, width = instance[2], instance[3]
+        algorithms, heuristics = (args.algorithms, args.heuristics) if height <= 3 \
+            else (args.large_algorithms, args.large_heuristics)
+        for algorithm, heuristic_name in configurations(height, algorithms, heuristics):
+            heuristic = None
+            if heuristic_name is not None:
+                if (heuristic_name, height, width) not in heuristic_cache:
+                    heuristic_cache[(heuristic_name, height, width)] = HEURISTICS[heuristic_name](height, width)
+                heuristic = heuristic_cache[(heuristic_name, height, width)]
+            result = run_with_budget(instance, algorithm, heuristic, heuristic_name, args.memory,
+                                     args.time_budget or None)
+            results.append(result)
+            if result['timeout']:
+                print("%s %s %s/%s: timeout after %.1fs" % (result['corpus'], result['instance'], algorithm,
+                                                            heuristic_name or '-', result['wall_time']),
+                      file=sys.stderr)
+            else:
+                print("%s %s %s/%s: cost=%d nodes=%d time=%.4fs" % (result['corpus'], result['instance'], algorithm,
+                                                                     heuristic_name or '-', result['cost'],
+                                                                     result['nodes'], result['wall_time']),
+                      file=sys.stderr)
+
+    summary = summarize(results)
+    report = {
+        'metadata': {'python': platform.python_version(), 'platform': platform.platform(),
+                     'seed': args.seed, 'per_depth': args.per_depth, 'time': time.time()},
+        'results': results,
+        'summary': summary,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    for key, entry in sorted(summary.items()):
+        print("%-45s instances=%d timeouts=%d nodes=%d time=%.3fs nodes/sec=%.0f"
+              % (key, entry['instances'], entry['timeouts'], entry['nodes'], entry['wall_time'],
+                 entry['nodes_per_sec'] or 0))
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f)['summary'])
+        for regression in regressions:
+            print('REGRESSION %s' % regression)
+        if regressions:
+            exit(1)
@@ -0,0 +1,171 @@
+from puzzle import PuzzleProblem, PackedPuzzleState, canonical_tiles, get_board_tables
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import sqlite3
+
+# A cached board maps to (remaining distance, next move); the goal maps to (0, '')
+Entry = Tuple[int, str]
+# Shortest packed board stored in SQLite; boards up to 128 bits keep the key length of existing cache files
+MIN_KEY_BYTES = 16
+
+
+def _key(state: PackedPuzzleState) -> Tuple[int, int, int]:
+    return state.tables.height, state.tables.width, state.packed
+
+
+def _blob(height: int, width: int, packed: int) -> bytes:
+    # Packed boards of large sizes take more than MIN_KEY_BYTES, e.g. 6x6 boards 216 bits
+    tables = get_board_tables(height, width)
+    return packed.to_bytes(max(MIN_KEY_BYTES, (tables.bits * tables.size + 7) // 8), 'little')
+
+
+class SolutionCache:
+    """
+    Cache of solved boards in front of the search functions. Every board on a returned path is recorded with its
+    remaining distance and next move, so a later query landing on any of them is answered by replaying moves.
+    Entries live in a bounded in-memory LRU, optionally backed by an SQLite file shared across runs.
+    Remaining distances are optimal when the cached paths come from optimal searches (bfs, ucs, astar, idastar).
+    A board keeps the shortest distance recorded for it, so paths of suboptimal searches (beam, reduction, weighted
+    anytime_astar) never replace a shorter entry, and a lookup only follows moves that lower the distance by one.
+    With symmetric set, boards are stored under their canonical image (see puzzle.canonical_tiles) with the move
+    seen in that image, so a board also hits the entries recorded for its symmetric equivalents.
+    """
+
+    def __init__(self, max_size: int=100000, path: str=None, symmetric: bool=True):
+        self.max_size = max_size
+        self.symmetric = symmetric
+        self.entries: Dict[Tuple[int, int, int], Entry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path)
+            self.db.execute('CREATE TABLE IF NOT EXISTS solutions (height INTEGER, width INTEGER, packed BLOB, '
+                            'distance INTEGER, move TEXT, PRIMARY KEY (height, width, packed))')
+            self.db.commit()
+
+    def _put(self, key: Tuple[int, int, int], entry: Entry) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def _stored(self, key: Tuple[int, int, int]) -> Optional[Entry]:
+        # The entry of a board without counting a hit or refreshing its place in the LRU
+        entry = self.entries.get(key)
+        if entry is None and self.db is not None:
+            height, width, packed = key
+            entry = self.db.execute('SELECT distance, move FROM solutions WHERE height = ? AND width = ? AND '
+                                    'packed = ?', (height, width, _blob(height, width, packed))).fetchone()
+        return entry
+
+    def _get(self, key: Tuple[int, int, int]) -> Optional[Entry]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry
+        if self.db is not None:
+            height, width, packed = key
+            row = self.db.execute('SELECT distance, move FROM solutions WHERE height = ? AND width = ? AND packed = ?',
+                                  (height, width, _blob(height, width, packed))).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self._put(key, row)
+                return row
+        return None
+
+    def _canonical(self, state: PackedPuzzleState) -> Tuple[Tuple[int, int, int], Dict[str, str]]:
+        # Returns the key of a board and the map of its moves to the moves of the stored image. The symmetries of
+        # the board are their own inverse, so the same map also turns stored moves back into moves of the board.
+        tables = state.tables
+        if not self.symmetric or len(tables.symmetries) == 1:
+            return _key(state), tables.symmetries[0][1]
+        tiles, index = canonical_tiles(state.tiles(), tables)
+        return (tables.height, tables.width, tables.pack(tiles)), tables.symmetries[index][1]
+
+    def _get_state(self, state: PackedPuzzleState) -> Optional[Entry]:
+        key, moves = self._canonical(state)
+        entry = self._get(key)
+        return (entry[0], moves[entry[1]] if entry[1] else '') if entry is not None else None
+
+    def lookup(self, state: PackedPuzzleState) -> Optional[List[PackedPuzzleState]]:
+        """
+        Returns the cached path from state to the goal, or None if the board is not (fully) cached
+        """
+        path = [state]
+        entry = self._get_state(state)
+        while entry is not None and entry[0] > 0:
+            path.append(path[-1].next_state(entry[1]))
+            next_entry = self._get_state(path[-1])
+            # Anything but one move less is left from another path, and following it could loop
+            entry = next_entry if next_entry is not None and next_entry[0] == entry[0] - 1 else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def record(self, path: List[PackedPuzzleState]) -> None:
+        """
+        Records every board of a path ending at the goal with its remaining distance and next move. Boards already
+        cached with a shorter distance keep their entry, and the boards before them on the path are recorded with
+        the distance through it.
+        """
+        rows = []
+        distance = -1
+        for position in range(len(path) - 1, -1, -1):
+            state = path[position]
+            distance += 1
+            if position == len(path) - 1:
+                move = ''
+            else:
+                next_state = path[position + 1]
+                move = next(move for move, new_blank in state.tables.moves[state.blank].items()
+                            if new_blank == next_state.blank)
+            key, moves = self._canonical(state)
+            stored = self._stored(key)
+            if stored is not None and stored[0] <= distance:
+                distance = stored[0]
+                continue
+            if move:
+                move = moves[move]
+            self._put(key, (distance, move))
+            height, width, packed = key
+            rows.append((height, width, _blob(height, width, packed), distance, move))
+        if self.db is not None:
+            self.db.executemany('INSERT INTO solutions VALUES (?, ?, ?, ?, ?) ON CONFLICT (height, width, packed) '
+                                'DO UPDATE SET distance = excluded.distance, move = excluded.move '
+                                'WHERE excluded.distance < distance', rows)
+            self.db.commit()
+
+    def solve(self, problem: PuzzleProblem, search: Callable, *args, **kwargs) -> [List[PackedPuzzleState], int]:
+        """
+        Answers the problem from the cache, or runs search(problem, *args, **kwargs) and caches its path
+        :param problem: a PackedPuzzleProblem
+        :param search: one of the search functions, e.g. search.astar
+        :return: the same (path, explored_states_count, maximum_depth_reached) triple as the search; cache hits
+        report no explored states
+        """
+        start = problem.get_initial_state()
+        path = self.lookup(start)
+        if path is not None:
+            return path, 0, len(path) - 1
+        path, explored_states_count, maximum_depth_reached = search(problem, *args, **kwargs)
+        if path:
+            self.record(path)
+        return path, explored_states_count, maximum_depth_reached
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the hit, miss and eviction counters and the number of boards in memory
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'disk_hits': self.disk_hits, 'size': len(self.entries)}
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,267 @@
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem, check_solvable, get_board_tables, transform_tiles
+from typing import List, Sequence
+from collections import deque
+import argparse
+import mmap
+import os
+import struct
+import time
+
+from pattern_database import DEFAULT_TABLES_DIR
+
+# Header of a distance table file: magic, height, width
+HEADER = struct.Struct('<4sBB')
+MAGIC = b'DST1'
+# Magic of tables holding only the boards with the blank on or above the main diagonal
+SYMMETRIC_MAGIC = b'DSS1'
+UNVISITED = 255
+# Largest table built: one byte for each of the 12! / 2 boards of a 3x4 or 2x6 board, about 240 MB
+MAX_TABLE_ENTRIES = 239500800
+
+
+def table_entries(size: int) -> int:
+    """
+    Returns the number of reachable boards with size cells, size! / 2
+    """
+    entries = 1
+    for i in range(3, size + 1):
+        entries *= i
+    return entries
+
+
+def rank_permutation(tiles: Sequence[int], size: int) -> int:
+    """
+    Returns the rank of a solvable board in [0, size! / 2): the blank position times (size - 1)! / 2 plus the
+    Lehmer code of the other tiles. Only the first size - 3 of those tiles are ranked since, for a given blank
+    position, the order of the last two is fixed by the permutation parity of a solvable board.
+    :param tiles: the tiles of the board in row-major order
+    :param size: number of cells of the board
+    :return: the rank of the board
+    """
+    rank = 0
+    others = [tile for tile in tiles if tile != 0]
+    for i in range(size - 3):
+        tile = others[i]
+        smaller = 0
+        for other in others[i + 1:]:
+            if other < tile:
+                smaller += 1
+        rank = rank * (size - 1 - i) + smaller
+    return tiles.index(0) * (table_entries(size) // size) + rank
+
+
+def check_table_size(height: int, width: int) -> None:
+    """
+    Raises ValueError for board sizes with more than MAX_TABLE_ENTRIES boards, whose table could not be built
+    """
+    entries = table_entries(height * width)
+    if entries > MAX_TABLE_ENTRIES:
+        raise ValueError('A distance table of {}x{} boards needs {} entries, more than the {} allowed'
+                         .format(height, width, entries, MAX_TABLE_ENTRIES))
+
+
+def _upper_cells(width: int) -> List[int]:
+    # Index of every cell among the cells on or above the main diagonal of a square board, -1 below it
+    index, cells = 0, []
+    for pos in range(width * width):
+        row, column = divmod(pos, width)
+        cells.append(index if row <= column else -1)
+        index += row <= column
+    return cells
+
+
+def symmetric_entries(height: int, width: int) -> int:
+    """
+    Returns the number of entries of a symmetric table: boards with the blank on or above the main diagonal
+    """
+    size = height * width
+    return height * (height + 1) // 2 * (table_entries(size) // size)
+
+
+def symmetric_rank(tiles: Sequence[int], height: int, width: int) -> int:
+    """
+    Returns the rank of a solvable board of a square board size in a table that only stores the boards with the
+    blank on or above the main diagonal. Other boards are transposed first, which keeps their distance to the goal.
+    Boards with the blank on the diagonal are stored together with their transpose, so the table holds a little
+    more than half of the boards.
+    :param tiles: the tiles of the board in row-major order
+    :param height: number of rows of the board
+    :param width: number of columns of the board
+    :return: the rank of the board in [0, symmetric_entries)
+    """
+    size = height * width
+    row, column = divmod(tiles.index(0), width)
+    if row > column:
+        tiles = transform_tiles(tiles, get_board_tables(height, width).symmetries[1][0])
+    per_blank = table_entries(size) // size
+    return _upper_cells(width)[tiles.index(0)] * per_blank + rank_permutation(tiles, size) % per_blank
+
+
+def _is_symmetric(height: int, width: int, symmetric: bool) -> bool:
+    if symmetric is None:
+        return height == width
+    if symmetric and height != width:
+        raise ValueError('Only square boards have symmetric distance tables, got {}x{}'.format(height, width))
+    return symmetric
+
+
+def build_table(height: int, width: int, symmetric: bool=False) -> bytearray:
+    """
+    Builds the distance to the goal of every solvable board by a retrograde BFS from the goal
+    :param height: number of rows of the board
+    :param width: number of columns of the board
+    :param symmetric: only store the boards with the blank on or above the main diagonal (square boards)
+    :return: a bytearray holding the distance of every board, indexed by rank_permutation, or by symmetric_rank
+    for a symmetric table
+    :raise ValueError: if the board size has too many boards (see check_table_size)
+    """
+    check_table_size(height, width)
+    tables = get_board_tables(height, width)
+    size, shifts, mask, neighbors = tables.size, tables.shifts, tables.mask, tables.neighbors
+    if _is_symmetric(height, width, symmetric):
+        table = bytearray([UNVISITED]) * symmetric_entries(height, width)
+        rank = lambda tiles: symmetric_rank(tiles, height, width)
+    else:
+        table = bytearray([UNVISITED]) * table_entries(size)
+        rank = lambda tiles: rank_permutation(tiles, size)
+    goal = tables.pack(list(range(size)))
+    table[rank(tables.unpack(goal))] = 0
+    explored = {goal}
+    frontier = deque([(goal, 0)])
+    while frontier:
+        packed, blank = frontier.popleft()
+        distance = table[rank(tables.unpack(packed))] + 1
+        for new_blank, _ in neighbors[blank]:
+            tile = (packed >> shifts[new_blank]) & mask
+            child = packed - (tile << shifts[new_blank]) + (tile << shifts[blank])
+            if child not in explored:
+                explored.add(child)
+                table[rank(tables.unpack(child))] = min(distance, UNVISITED - 1)
+                frontier.append((child, new_blank))
+    return table
+
+
+def table_path(height: int, width: int, directory: str=DEFAULT_TABLES_DIR, symmetric: bool=None) -> str:
+    """
+    Returns the file name a distance table is persisted to; symmetric defaults to True for square boards
+    """
+    suffix = '_sym' if _is_symmetric(height, width, symmetric) else ''
+    return os.path.join(directory, 'distance_{}x{}{}.bin'.format(height, width, suffix))
+
+
+def save_table(path: str, height: int, width: int, table: bytearray, symmetric: bool=False) -> None:
+    """
+    Writes a distance table to disk with its header
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(SYMMETRIC_MAGIC if symmetric else MAGIC, height, width))
+        f.write(table)
+    os.replace(tmp_path, path)
+
+
+def load_table(path: str, height: int, width: int, symmetric: bool=False) -> mmap.mmap:
+    """
+    Memory-maps a distance table read-only
+    :return: the mapped file; entry r lives at offset HEADER.size + r
+    """
+    with open(path, 'rb') as f:
+        table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, file_height, file_width = HEADER.unpack_from(table)
+    entries = symmetric_entries(height, width) if symmetric else table_entries(height * width)
+    if magic != (SYMMETRIC_MAGIC if symmetric else MAGIC) or (file_height, file_width) != (height, width) \
+            or len(table) != HEADER.size + entries:
+        table.close()
+        raise ValueError('{} is not a distance table of a {}x{} board'.format(path, height, width))
+    return table
+
+
+class DistanceTable:
+    """
+    Exact distance to the goal of every solvable board, loaded from disk with mmap (built and persisted first if
+    it does not exist yet). Calling it returns the distance, so it is also a perfect heuristic.
+    Tables of square boards are symmetric by default and only store the boards with the blank on or above the
+    main diagonal, looking the others up through their transpose.
+    Board sizes with more than MAX_TABLE_ENTRIES boards raise ValueError.
+    """
+
+    def __init__(self, height: int=3, width: int=3, directory: str=DEFAULT_TABLES_DIR, build: bool=True,
+                 symmetric: bool=None):
+        check_table_size(height, width)
+        self.height, self.width = height, width
+        self.size = height * width
+        self.symmetric = _is_symmetric(height, width, symmetric)
+        path = table_path(height, width, directory, self.symmetric)
+        if not os.path.exists(path):
+            if not build:
+                raise FileNotFoundError(path)
+            save_table(path, height, width, build_table(height, width, self.symmetric), self.symmetric)
+        self.table = load_table(path, height, width, self.symmetric)
+
+    def _check_size(self, height: int, width: int) -> None:
+        if (height, width) != (self.height, self.width):
+            raise ValueError('The distance table of {}x{} boards cannot answer a {}x{} board'
+                             .format(self.height, self.width, height, width))
+
+    def distance(self, state: PuzzleState) -> int:
+        """
+        Returns the number of moves needed to solve the board, a PuzzleState or PackedPuzzleState of the table's
+        board size. The answer is only meaningful for solvable boards.
+        """
+        self._check_size(state.height, state.width)
+        tiles = state.tiles() if hasattr(state, 'tiles') else [elem for row in state.state for elem in row]
+        if self.symmetric:
+            return self.table[HEADER.size + symmetric_rank(tiles, self.height, self.width)]
+        return self.table[HEADER.size + rank_permutation(tiles, self.size)]
+
+    def __call__(self, state: PuzzleState) -> int:
+        return self.distance(state)
+
+    def solve(self, problem: PuzzleProblem) -> [List[PuzzleState], int]:
+        """
+        Returns an optimal path from the initial state of the problem to the goal by following strictly
+        decreasing distances, without any search.
+        :param problem: a PuzzleProblem of the table's board size; other than PackedPuzzleProblem ones get a path
+        of PuzzleState
+        :return: the same (path, explored_states_count, maximum_depth_reached) triple as the search functions
+        """
+        self._check_size(problem.puzzle.height, problem.puzzle.width)
+        if not isinstance(problem, PackedPuzzleProblem):
+            # The puzzle of a PuzzleProblem is already relabeled onto the canonical goal
+            path, explored_states_count, maximum_depth_reached = self.solve(PackedPuzzleProblem(problem.puzzle))
+            return [PuzzleState(state.state) for state in path], explored_states_count, maximum_depth_reached
+        check_solvable(problem)
+        state = problem.get_initial_state()
+        distance = self.distance(state)
+        path = [state]
+        while distance > 0:
+            for next_state, _, _ in state.get_neighbors():
+                if self.distance(next_state) == distance - 1:
+                    break
+            else:
+                return [], len(path), len(path) - 1
+            state = next_state
+            distance -= 1
+            path.append(state)
+        return path, len(path), len(path) - 1
+
+    def close(self) -> None:
+        self.table.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the complete distance table of a small board')
+    parser.add_argument('--height', type=int, default=3)
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--directory', default=DEFAULT_TABLES_DIR)
+    parser.add_argument('--full', action='store_true', help='store every board, also on square boards')
+    args = parser.parse_args()
+    symmetric = _is_symmetric(args.height, args.width, False if args.full else None)
+    start_time = time.time()
+    table = build_table(args.height, args.width, symmetric)
+    end_time = time.time()
+    path = table_path(args.height, args.width, args.directory, symmetric)
+    save_table(path, args.height, args.width, table, symmetric)
+    print("Distance table: %d entries, %d bytes, max distance %d, built in %f seconds -> %s"
+          % (len(table), os.path.getsize(path), max(table), end_time - start_time, path))
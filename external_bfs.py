@@ -0,0 +1,218 @@
+from puzzle import get_board_tables
+from typing import Iterable, Iterator, List, Sequence
+from array import array
+import argparse
+import heapq
+import mmap
+import os
+import time
+
+# Layer and run files hold sorted packed boards as native unsigned 64-bit integers
+RECORD = 'Q'
+# Approximate memory held per buffered child: its array slot plus the Python int created while sorting
+BUFFERED_STATE_BYTES = 48
+# Boards read from a sorted file at a time
+READ_CHUNK = 1 << 16
+# Largest number of files merged in one pass; more runs are merged in several passes
+MAX_MERGE = 256
+DEFAULT_MEMORY_BUDGET = 256 << 20
+
+
+def layer_path(directory: str, depth: int) -> str:
+    return os.path.join(directory, 'layer_{:03d}.bin'.format(depth))
+
+
+def read_sorted(path: str) -> Iterator[int]:
+    """
+    Streams the boards of a layer or run file in order
+    """
+    with open(path, 'rb') as f:
+        while True:
+            chunk = array(RECORD)
+            try:
+                chunk.fromfile(f, READ_CHUNK)
+            except EOFError:
+                # fromfile keeps the records read before the end of the file
+                yield from chunk
+                return
+            yield from chunk
+
+
+def write_sorted(path: str, boards: Iterable[int]) -> int:
+    """
+    Writes boards given in order to a file, dropping repeated ones
+    :return: the number of boards written
+    """
+    count = 0
+    last = None
+    buffer = array(RECORD)
+    with open(path, 'wb') as f:
+        for board in boards:
+            if board == last:
+                continue
+            last = board
+            buffer.append(board)
+            if len(buffer) >= READ_CHUNK:
+                buffer.tofile(f)
+                count += len(buffer)
+                buffer = array(RECORD)
+        buffer.tofile(f)
+        count += len(buffer)
+    return count
+
+
+def _subtract(boards: Iterable[int], previous: Iterable[int]) -> Iterator[int]:
+    # Both streams are sorted, so a single forward walk over the previous boards finds every duplicate
+    previous = iter(previous)
+    old = next(previous, None)
+    for board in boards:
+        while old is not None and old < board:
+            old = next(previous, None)
+        if board != old:
+            yield board
+
+
+def _write_run(directory: str, number: int, buffer: array) -> str:
+    path = os.path.join(directory, 'run_{:06d}.bin'.format(number))
+    write_sorted(path, sorted(buffer))
+    return path
+
+
+def _merge_runs(runs: List[str], directory: str) -> List[str]:
+    while len(runs) > MAX_MERGE:
+        merged = os.path.join(directory, 'run_merged_{}.bin'.format(len(runs)))
+        write_sorted(merged, heapq.merge(*[read_sorted(run) for run in runs[:MAX_MERGE]]))
+        for run in runs[:MAX_MERGE]:
+            os.remove(run)
+        runs = runs[MAX_MERGE:] + [merged]
+    return runs
+
+
+def _open_distance_file(path: str, height: int, width: int) -> mmap.mmap:
+    from distance_table import HEADER, MAGIC, UNVISITED, table_entries
+    entries = table_entries(height * width)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, height, width))
+        block = bytes([UNVISITED]) * READ_CHUNK
+        for start in range(0, entries, READ_CHUNK):
+            f.write(block[:min(READ_CHUNK, entries - start)])
+    with open(path, 'r+b') as f:
+        return mmap.mmap(f.fileno(), 0)
+
+
+def external_bfs(height: int, width: int, directory: str, memory_budget: int=DEFAULT_MEMORY_BUDGET,
+                 start: Sequence[int]=None, pattern: Sequence[int]=None, distance_path: str=None,
+                 counts_path: str=None, keep_layers: bool=False, max_depth: int=None) -> List[int]:
+    """
+    Breadth-first search over every board reachable from a start board that keeps the layers on disk instead of
+    an explored set in memory. Each layer is expanded in a stream; the children are buffered up to the memory
+    budget, sorted and written as runs. The runs are then merged, and boards already in the previous two layers
+    are dropped while merging (delayed duplicate detection), which leaves the next layer as a sorted file.
+    Since every move is reversible, the layer of a board is its distance from the start, and with the default
+    start (the goal) its distance to the goal.
+    :param height: number of rows of the board
+    :param width: number of columns of the board
+    :param directory: working directory for the layer and run files
+    :param memory_budget: approximate number of bytes used to buffer children before they are written to a run
+    :param start: the tiles of the start board in row-major order, the goal if omitted
+    :param pattern: tiles to keep apart; the other tiles are relabeled to a single value, which searches the
+    abstract space of a pattern database that counts every move
+    :param distance_path: if given, also writes the distance of every board as a distance_table file that stores
+    every board (load it with DistanceTable(symmetric=False)); only board sizes a distance table accepts (see
+    distance_table.check_table_size)
+    :param counts_path: if given, appends a 'depth<TAB>count' line to this file as each layer is finished
+    :param keep_layers: keep every layer file instead of only the last two
+    :param max_depth: stop after this layer
+    :return: the number of boards in each layer
+    """
+    tables = get_board_tables(height, width)
+    if tables.bits * tables.size > 64:
+        raise ValueError('External BFS needs boards that pack into 64 bits, got {}x{}'.format(height, width))
+    if pattern is not None and distance_path is not None:
+        raise ValueError('Distance files index complete boards and cannot be written for a pattern')
+    if distance_path is not None:
+        from distance_table import check_table_size
+        check_table_size(height, width)
+    size, shifts, mask, neighbors = tables.size, tables.shifts, tables.mask, tables.neighbors
+    tiles = list(start) if start is not None else list(range(size))
+    if pattern is not None:
+        hidden = [tile for tile in tiles if tile != 0 and tile not in pattern]
+        tiles = [min(hidden) if tile in hidden else tile for tile in tiles]
+    os.makedirs(directory, exist_ok=True)
+    capacity = max(READ_CHUNK, memory_budget // BUFFERED_STATE_BYTES)
+
+    distances = _open_distance_file(distance_path, height, width) if distance_path is not None else None
+
+    def record(depth):
+        from distance_table import HEADER, rank_permutation
+        for board in read_sorted(layer_path(directory, depth)):
+            distances[HEADER.size + rank_permutation(tables.unpack(board), size)] = min(depth, 254)
+
+    write_sorted(layer_path(directory, 0), [tables.pack(tiles)])
+    counts = [1]
+    depth = 0
+    if counts_path is not None:
+        with open(counts_path, 'w') as f:
+            f.write('0\t1\n')
+    if distances is not None:
+        record(0)
+    while max_depth is None or depth < max_depth:
+        runs = []
+        buffer = array(RECORD)
+        for packed in read_sorted(layer_path(directory, depth)):
+            blank = 0
+            while (packed >> shifts[blank]) & mask:
+                blank += 1
+            for new_blank, _ in neighbors[blank]:
+                tile = (packed >> shifts[new_blank]) & mask
+                buffer.append(packed - (tile << shifts[new_blank]) + (tile << shifts[blank]))
+            if len(buffer) >= capacity:
+                runs.append(_write_run(directory, len(runs), buffer))
+                buffer = array(RECORD)
+        if buffer:
+            runs.append(_write_run(directory, len(runs), buffer))
+        runs = _merge_runs(runs, directory)
+        previous = [read_sorted(layer_path(directory, d)) for d in (depth - 1, depth) if d >= 0]
+        children = heapq.merge(*[read_sorted(run) for run in runs])
+        count = write_sorted(layer_path(directory, depth + 1), _subtract(children, heapq.merge(*previous)))
+        for run in runs:
+            os.remove(run)
+        if not keep_layers and depth >= 1:
+            os.remove(layer_path(directory, depth - 1))
+        if count == 0:
+            os.remove(layer_path(directory, depth + 1))
+            break
+        depth += 1
+        counts.append(count)
+        if counts_path is not None:
+            with open(counts_path, 'a') as f:
+                f.write('{}\t{}\n'.format(depth, count))
+        if distances is not None:
+            record(depth)
+    if distances is not None:
+        distances.flush()
+        distances.close()
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Breadth-first search with the layers kept on disk')
+    parser.add_argument('--height', type=int, default=3)
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--directory', default='bfs_layers', help='working directory for layer files')
+    parser.add_argument('--memory', type=int, default=DEFAULT_MEMORY_BUDGET >> 20, help='memory budget in MiB')
+    parser.add_argument('--pattern', default=None, help="tiles of an abstract pattern space, e.g. '1,2,3'")
+    parser.add_argument('--distance-file', default=None, help='also write a distance_table file')
+    parser.add_argument('--counts', default=None, help='file receiving the per-layer counts')
+    parser.add_argument('--keep-layers', action='store_true')
+    parser.add_argument('--max-depth', type=int, default=None)
+    args = parser.parse_args()
+    start_time = time.time()
+    pattern = [int(tile) for tile in args.pattern.split(',')] if args.pattern else None
+    counts = external_bfs(args.height, args.width, args.directory, args.memory << 20, pattern=pattern,
+                          distance_path=args.distance_file, counts_path=args.counts,
+                          keep_layers=args.keep_layers, max_depth=args.max_depth)
+    for depth, count in enumerate(counts):
+        print("%d\t%d" % (depth, count))
+    print("%d boards in %d layers, %f seconds" % (sum(counts), len(counts), time.time() - start_time))
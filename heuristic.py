@@ -1,12 +1,14 @@
-from puzzle import PuzzleState
+from puzzle import PuzzleState, PackedPuzzleState, get_board_tables, transform_tiles
+from typing import Callable, List
 
 
 def manhattan_distance_heuristic(state: PuzzleState):
     manhattan_distance_sum = 0
     for i in range(state.height):
         for j in range(state.width):
-            manhattan_distance_sum += abs(i - state.state[i][j] / state.height) \
-                + abs(j - state.state[i][j] % state.width)
+            if state.state[i][j] != 0:
+                manhattan_distance_sum += abs(i - state.state[i][j] // state.width) \
+                    + abs(j - state.state[i][j] % state.width)
     return manhattan_distance_sum
 
 
@@ -14,6 +16,174 @@ def euclidean_distance_heuristic(state: PuzzleState):
     euclidean_distance_sum = 0
     for i in range(state.height):
         for j in range(state.width):
-            euclidean_distance_sum += ((i - state.state[i][j] / state.height) ** 2 \
-                + (j - state.state[i][j] % state.width) ** 2) ** 0.5
+            if state.state[i][j] != 0:
+                euclidean_distance_sum += ((i - state.state[i][j] // state.width) ** 2 \
+                    + (j - state.state[i][j] % state.width) ** 2) ** 0.5
     return euclidean_distance_sum
+
+
+def state_tiles(state) -> List[int]:
+    """
+    Returns the tiles of a PuzzleState or PackedPuzzleState in row-major order
+    """
+    return state.tiles() if hasattr(state, 'tiles') else [elem for row in state.state for elem in row]
+
+
+class IncrementalHeuristic:
+    """
+    Heuristic that can give the value of a successor from the value of its parent.
+    Calling it evaluates a state from scratch, delta returns the change caused by one move
+    of a packed board, which search.ucs_astar and search.idastar use when it is available.
+    """
+
+    def __init__(self, height: int=3, width: int=3):
+        self.height, self.width = height, width
+        self.tables = get_board_tables(height, width)
+        self.size = self.tables.size
+
+    def __call__(self, state) -> int:
+        raise NotImplementedError
+
+    def delta(self, packed: int, tile: int, from_pos: int, to_pos: int) -> int:
+        """
+        Returns h(child) - h(parent) where child is the packed parent board with tile moved from from_pos to to_pos
+        :param packed: the parent board
+        :param tile: the tile that moves
+        :param from_pos: the cell the tile leaves, which becomes the blank
+        :param to_pos: the cell the tile moves to, the blank of the parent
+        :return: the change of the heuristic value
+        """
+        raise NotImplementedError
+
+
+class ManhattanDistance(IncrementalHeuristic):
+    """
+    Sum of the Manhattan distances of the tiles to their goal cells, updated with a precomputed
+    (tile, from_pos, to_pos) delta table.
+    """
+
+    def __init__(self, height: int=3, width: int=3):
+        super().__init__(height, width)
+        size, width = self.size, self.width
+        self.distance = [[abs(pos // width - tile // width) + abs(pos % width - tile % width) if tile else 0
+                          for pos in range(size)] for tile in range(size)]
+        self.deltas = [self.distance[tile][to_pos] - self.distance[tile][from_pos]
+                       for tile in range(size) for from_pos in range(size) for to_pos in range(size)]
+
+    def __call__(self, state) -> int:
+        distance = self.distance
+        return sum(distance[tile][pos] for pos, tile in enumerate(state_tiles(state)))
+
+    def delta(self, packed: int, tile: int, from_pos: int, to_pos: int) -> int:
+        return self.deltas[(tile * self.size + from_pos) * self.size + to_pos]
+
+
+class LinearConflict(ManhattanDistance):
+    """
+    Manhattan distance plus two moves for every tile that has to leave its goal row (or column) to let
+    other tiles of that line pass, counted as the line length minus its longest in-order subsequence.
+    delta only re-examines the goal line of the moved tile when the tile leaves or enters it, reading that
+    line's tiles straight from the packed board.
+    """
+
+    def __init__(self, height: int=3, width: int=3):
+        super().__init__(height, width)
+        width, size = self.width, self.size
+        self.rows = [list(range(i * width, (i + 1) * width)) for i in range(height)]
+        self.columns = [list(range(j, size, width)) for j in range(width)]
+        self.goal_row = [tile // width for tile in range(size)]
+        self.goal_column = [tile % width for tile in range(size)]
+
+    @staticmethod
+    def _line_conflicts(tiles_in_line: List[int], line: int, goal_line: List[int], goal_offset: List[int]) -> int:
+        # Goal offsets of the tiles that belong to this line, in the order they appear
+        offsets = [goal_offset[tile] for tile in tiles_in_line if tile and goal_line[tile] == line]
+        if len(offsets) < 2:
+            return 0
+        longest = [1] * len(offsets)
+        for i in range(len(offsets)):
+            for k in range(i):
+                if offsets[k] < offsets[i] and longest[k] + 1 > longest[i]:
+                    longest[i] = longest[k] + 1
+        return len(offsets) - max(longest)
+
+    def _row_conflicts(self, tiles: List[int], row: int) -> int:
+        return self._line_conflicts([tiles[pos] for pos in self.rows[row]], row, self.goal_row, self.goal_column)
+
+    def _column_conflicts(self, tiles: List[int], column: int) -> int:
+        return self._line_conflicts([tiles[pos] for pos in self.columns[column]], column,
+                                    self.goal_column, self.goal_row)
+
+    def __call__(self, state) -> int:
+        tiles = state_tiles(state)
+        conflicts = sum(self._row_conflicts(tiles, row) for row in range(self.height)) \
+            + sum(self._column_conflicts(tiles, column) for column in range(self.width))
+        return super().__call__(state) + 2 * conflicts
+
+    def _packed_conflicts(self, packed: int, cells: List[int], line: int, goal_line: List[int],
+                          goal_offset: List[int]) -> int:
+        shifts, mask = self.tables.shifts, self.tables.mask
+        return self._line_conflicts([(packed >> shifts[pos]) & mask for pos in cells], line, goal_line, goal_offset)
+
+    def delta(self, packed: int, tile: int, from_pos: int, to_pos: int) -> int:
+        manhattan = super().delta(packed, tile, from_pos, to_pos)
+        width = self.width
+        if from_pos // width == to_pos // width:
+            # Horizontal move: the row keeps its order, the two columns change
+            from_line, to_line = from_pos % width, to_pos % width
+            lines, goal_line, goal_offset = self.columns, self.goal_column, self.goal_row
+        else:
+            from_line, to_line = from_pos // width, to_pos // width
+            lines, goal_line, goal_offset = self.rows, self.goal_row, self.goal_column
+        # The blank is not counted, so only the goal line of the tile changes, and only if the tile leaves or enters it
+        line = goal_line[tile]
+        if line != from_line and line != to_line:
+            return manhattan
+        shifts = self.tables.shifts
+        child = packed - (tile << shifts[from_pos]) + (tile << shifts[to_pos])
+        change = self._packed_conflicts(child, lines[line], line, goal_line, goal_offset) \
+            - self._packed_conflicts(packed, lines[line], line, goal_line, goal_offset)
+        return manhattan + 2 * change
+
+
+class SymmetricMax:
+    """
+    Maximum of a heuristic over the symmetric images of a board. Every image lies at the same distance from the
+    goal, so the maximum stays admissible (and consistent if the heuristic is) and is often larger, e.g. a pattern
+    database looked up at the transposed board reads other entries of the same tables. It has no delta, so the
+    searches evaluate every successor from scratch.
+    """
+
+    def __init__(self, heuristic: Callable, height: int=3, width: int=3):
+        self.heuristic = heuristic
+        self.tables = get_board_tables(height, width)
+
+    def __call__(self, state) -> int:
+        tiles = state_tiles(state)
+        h = self.heuristic(state)
+        for cells, _ in self.tables.symmetries[1:]:
+            image = transform_tiles(tiles, cells)
+            h = max(h, self.heuristic(PackedPuzzleState(self.tables.pack(image), image.index(0), self.tables)))
+        return h
+
+
+def manhattan_distance_to(target: PuzzleState) -> Callable[[PuzzleState], int]:
+    """
+    Returns a heuristic estimating the distance from a state to the given target board, e.g. the initial
+    state for the backward half of bidirectional_astar
+    :param target: the board to measure the distance to
+    :return: a function returning the sum of the Manhattan distances of every tile to its cell in target
+    """
+    width = target.width
+    tiles = [elem for row in target.state for elem in row]
+    target_pos = [divmod(pos, width) for pos in sorted(range(len(tiles)), key=tiles.__getitem__)]
+
+    def heuristic(state: PuzzleState) -> int:
+        distance_sum = 0
+        for i, row in enumerate(state.state):
+            for j, elem in enumerate(row):
+                if elem != 0:
+                    target_i, target_j = target_pos[elem]
+                    distance_sum += abs(i - target_i) + abs(j - target_j)
+        return distance_sum
+    return heuristic
@@ -0,0 +1,173 @@
+from puzzle import PackedPuzzleState, get_board_tables, is_solvable
+from typing import IO, Iterable, Iterator, List, Tuple
+import argparse
+import itertools
+import json
+import os
+import random
+import struct
+import sys
+import time
+
+from pattern_database import DEFAULT_TABLES_DIR
+
+# Header of a binary instance file: magic, height, width, 1 if depths are optimal distances (0 for walk lengths)
+HEADER = struct.Struct('<4sBBB')
+MAGIC = b'PZI1'
+
+# A generated instance is (packed board, depth)
+Instance = Tuple[int, int]
+
+
+def random_walk_board(height: int, width: int, steps: int, rng: random.Random) -> List[int]:
+    """
+    Returns a solvable board made by moving the blank randomly from the goal
+    """
+    tables = get_board_tables(height, width)
+    tiles = list(range(tables.size))
+    blank = 0
+    for _ in range(steps):
+        new_blank = rng.choice(tables.neighbors[blank])[0]
+        tiles[blank], tiles[new_blank] = tiles[new_blank], 0
+        blank = new_blank
+    return tiles
+
+
+def random_walk_instances(height: int, width: int, min_depth: int, max_depth: int,
+                          seed: int=None) -> Iterator[Instance]:
+    """
+    Generates solvable boards endlessly by random walks from the goal that never undo their previous move.
+    The walk length is drawn uniformly from [min_depth, max_depth] and reported as the depth, which is an upper
+    bound of the optimal distance.
+    """
+    tables = get_board_tables(height, width)
+    shifts, mask = tables.shifts, tables.mask
+    # choices[blank][previous] lists the cells the blank may move to without going back to previous
+    choices = []
+    for options in tables.neighbors:
+        targets = [new_blank for new_blank, _ in options]
+        choices.append({previous: tuple(target for target in targets if target != previous)
+                        for previous in targets + [-1]})
+    goal = tables.pack(list(range(tables.size)))
+    rng = random.Random(seed)
+    while True:
+        steps = rng.randint(min_depth, max_depth)
+        packed, blank, previous = goal, 0, -1
+        for _ in range(steps):
+            new_blank = rng.choice(choices[blank][previous])
+            tile = (packed >> shifts[new_blank]) & mask
+            packed += (tile << shifts[blank]) - (tile << shifts[new_blank])
+            previous, blank = blank, new_blank
+        yield packed, steps
+
+
+def table_instances(table, min_depth: int, max_depth: int, seed: int=None) -> Iterator[Instance]:
+    """
+    Generates solvable boards endlessly by drawing uniformly random solvable boards and keeping those whose exact
+    distance, looked up in a distance_table.DistanceTable, lies in [min_depth, max_depth]. Ranges far from the
+    typical distance are rare among random boards and take correspondingly longer to fill.
+    """
+    tables = get_board_tables(table.height, table.width)
+    rng = random.Random(seed)
+    tiles = list(range(tables.size))
+    while True:
+        rng.shuffle(tiles)
+        if not is_solvable(tiles, tables.width):
+            i, j = [pos for pos, tile in enumerate(tiles) if tile != 0][:2]
+            tiles[i], tiles[j] = tiles[j], tiles[i]
+        packed = tables.pack(tiles)
+        depth = table.distance(PackedPuzzleState(packed, tiles.index(0), tables))
+        if min_depth <= depth <= max_depth:
+            yield packed, depth
+
+
+def _record_size(height: int, width: int) -> int:
+    tables = get_board_tables(height, width)
+    return (tables.size * tables.bits + 7) // 8
+
+
+def write_binary(stream: IO[bytes], height: int, width: int, instances: Iterable[Instance], exact: bool) -> int:
+    """
+    Writes instances as fixed-size records: the packed board in little-endian order followed by one depth byte
+    :return: the number of instances written
+    """
+    record_size = _record_size(height, width)
+    stream.write(HEADER.pack(MAGIC, height, width, int(exact)))
+    count = 0
+    for packed, depth in instances:
+        stream.write(packed.to_bytes(record_size, 'little') + bytes((min(depth, 255),)))
+        count += 1
+    return count
+
+
+def write_jsonl(stream: IO[str], height: int, width: int, instances: Iterable[Instance], exact: bool) -> int:
+    """
+    Writes instances as one JSON object per line with the tiles in row-major order
+    :return: the number of instances written
+    """
+    tables = get_board_tables(height, width)
+    count = 0
+    for packed, depth in instances:
+        stream.write(json.dumps({'height': height, 'width': width, 'tiles': tables.unpack(packed),
+                                 'depth': depth, 'exact': exact}) + '\n')
+        count += 1
+    return count
+
+
+def read_binary(stream: IO[bytes]) -> Iterator[Tuple[int, int, List[int], int]]:
+    """
+    Reads a file written by write_binary
+    :return: an iterator over (height, width, tiles, depth)
+    """
+    magic, height, width, _ = HEADER.unpack(stream.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError('Not an instance file')
+    tables = get_board_tables(height, width)
+    record_size = _record_size(height, width)
+    while True:
+        record = stream.read(record_size + 1)
+        if len(record) < record_size + 1:
+            return
+        yield height, width, tables.unpack(int.from_bytes(record[:record_size], 'little')), record[record_size]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate solvable boards within a difficulty range')
+    parser.add_argument('--height', type=int, default=3)
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--min-depth', type=int, default=1)
+    parser.add_argument('--max-depth', type=int, default=31)
+    parser.add_argument('--method', default='auto', choices=['auto', 'walk', 'table'],
+                        help='auto looks depths up in the distance table if one exists, otherwise uses random walks')
+    parser.add_argument('--directory', default=DEFAULT_TABLES_DIR, help='directory of the distance tables')
+    parser.add_argument('--format', default='binary', choices=['binary', 'jsonl'])
+    parser.add_argument('--output', default=None, help='output file, stdout if omitted')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    method = args.method
+    if method == 'auto':
+        from distance_table import table_path
+        method = 'table' if os.path.exists(table_path(args.height, args.width, args.directory)) else 'walk'
+    if method == 'table':
+        from distance_table import DistanceTable
+        generated = table_instances(DistanceTable(args.height, args.width, args.directory),
+                                    args.min_depth, args.max_depth, args.seed)
+    else:
+        generated = random_walk_instances(args.height, args.width, args.min_depth, args.max_depth, args.seed)
+    generated = itertools.islice(generated, args.count)
+
+    start_time = time.time()
+    if args.format == 'binary':
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        with output:
+            count = write_binary(output, args.height, args.width, generated, method == 'table')
+    else:
+        output = open(args.output, 'w') if args.output else sys.stdout
+        with output:
+            count = write_jsonl(output, args.height, args.width, generated, method == 'table')
+    elapsed = time.time() - start_time
+    print("Generated %d instances by %s in %f seconds (%.0f/s)" % (count, method, elapsed,
+                                                                  count / elapsed if elapsed > 0 else 0),
+          file=sys.stderr)
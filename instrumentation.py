@@ -0,0 +1,339 @@
+from problem import SearchProblem, SearchState
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple, Union
+import json
+import time
+import tracemalloc
+
+PHASES = ('successors', 'hashing', 'heuristic', 'queue', 'goal')
+
+
+def max_rss_kb() -> Optional[int]:
+    """
+    Returns the peak resident set size of the process in kilobytes, or None where the resource module does not
+    exist (Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class SearchObserver:
+    """
+    Collects metrics of one search run. Passing an observer to a search wraps its problem, frontiers, heuristics and
+    visited-state containers with timing and counting proxies; searches without an observer run the plain code
+    path and pay nothing. Packed puzzles keep their compact code path, whose successors are generated inline, so
+    there the 'successors' phase is the time not spent in the other phases.
+    Besides expansions, it counts the successors generated (after move pruning), the duplicates among them (states
+    already seen) and the reopened states (closed states reached again on a cheaper path).
+    A sample event is emitted every sample_every expansions and, if sample_ms is set, at least every sample_ms
+    milliseconds, plus a final one when the search returns.
+    """
+
+    def __init__(self, sample_every: int=1000, sample_ms: float=None):
+        self.sample_every = sample_every
+        self.sample_ms = sample_ms
+        self.events: List[Dict[str, Any]] = []
+        self.algorithm = None
+        self.expansions = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.reopened = 0
+        self.f_bound = None
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.inline_successors = False
+        self.frontiers: List[_TimedFrontier] = []
+        # Searches without frontier objects give (frontier size, closed size) through this function
+        self.sizes: Callable[[], Tuple[int, int]] = None
+        self.start_time = self.last_sample_time = None
+
+    def instrument(self, algorithm: str, problem: SearchProblem, frontier=None, heuristic: Callable=None,
+                   inline_successors: bool=False):
+        """
+        Starts observing a run and returns (problem, frontier, heuristic) wrapped so that every call is timed and
+        counted. With inline_successors the search generates successors itself instead of calling the problem,
+        which is then returned as is.
+        """
+        self.algorithm = algorithm
+        self.inline_successors = inline_successors
+        self.start_time = self.last_sample_time = time.perf_counter()
+        return problem if inline_successors else _TimedProblem(problem, self), \
+            self.wrap_frontier(frontier) if frontier is not None else None, self.wrap_heuristic(heuristic)
+
+    def wrap_frontier(self, frontier, replaces: '_TimedFrontier'=None) -> '_TimedFrontier':
+        """
+        Returns a timed frontier whose popped items make up a closed set. A frontier that takes over from another
+        one (as between the iterations of anytime_astar) replaces it and keeps its closed set.
+        """
+        timed = _TimedFrontier(frontier, self, replaces.closed if replaces is not None else set())
+        if replaces is not None:
+            self.frontiers.remove(replaces)
+        self.frontiers.append(timed)
+        return timed
+
+    def wrap_heuristic(self, heuristic: Callable) -> Callable:
+        return _TimedHeuristic(heuristic, self) if heuristic is not None else None
+
+    def wrap_visited(self, visited: Union[set, dict]) -> Union[set, dict]:
+        """
+        Returns a copy of the set or dict of states a search has seen that times every operation as 'hashing' and
+        counts each membership test as a generated successor, and each hit as a duplicate. Searches only test a
+        successor against it once.
+        """
+        return _VisitedSet(visited, self) if isinstance(visited, set) else _VisitedDict(visited, self)
+
+    def expanded(self) -> None:
+        self.expansions += 1
+        if self.expansions % self.sample_every == 0:
+            self.sample()
+        elif self.sample_ms is not None and (time.perf_counter() - self.last_sample_time) * 1000 >= self.sample_ms:
+            self.sample()
+
+    def frontier_size(self) -> int:
+        if self.sizes is not None:
+            return self.sizes()[0]
+        return sum(frontier.size() for frontier in self.frontiers)
+
+    def closed_size(self) -> int:
+        if self.sizes is not None:
+            return self.sizes()[1]
+        return sum(len(frontier.closed) for frontier in self.frontiers)
+
+    def current_phases(self, elapsed: float) -> Dict[str, float]:
+        phases = dict(self.phases)
+        if self.inline_successors:
+            phases['successors'] = max(0.0, elapsed - sum(phases.values()))
+        return phases
+
+    def sample(self, final: bool=False) -> None:
+        now = time.perf_counter()
+        elapsed = now - self.start_time
+        event = {
+            'algorithm': self.algorithm,
+            'final': final,
+            'time': time.time(),
+            'elapsed': elapsed,
+            'expansions': self.expansions,
+            'generated': self.generated,
+            'duplicates': self.duplicates,
+            'reopened': self.reopened,
+            'frontier_size': self.frontier_size(),
+            'closed_size': self.closed_size(),
+            'f_bound': self.f_bound,
+            'nodes_per_sec': self.expansions / elapsed if elapsed > 0 else None,
+            'max_rss_kb': max_rss_kb(),
+            'phases': self.current_phases(elapsed),
+        }
+        if tracemalloc.is_tracing():
+            event['traced_bytes'] = tracemalloc.get_traced_memory()[0]
+        self.last_sample_time = now
+        self.emit(event)
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+
+    def finish(self, result: Tuple[List[SearchState], int, int]) -> Tuple[List[SearchState], int, int]:
+        """
+        Emits the final event and passes the search result through
+        """
+        self.sample(final=True)
+        return result
+
+
+class JsonlObserver(SearchObserver):
+    """
+    Observer that streams every event as one JSON line to a file instead of keeping them in memory.
+    """
+
+    def __init__(self, stream: IO[str], sample_every: int=1000, sample_ms: float=None):
+        super().__init__(sample_every, sample_ms)
+        self.stream = stream
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self.stream.write(json.dumps(event) + '\n')
+        self.stream.flush()
+
+
+def prometheus_snapshot(observer: SearchObserver) -> str:
+    """
+    Returns the current metrics of an observer in the Prometheus text exposition format
+    """
+    elapsed = time.perf_counter() - observer.start_time if observer.start_time is not None else 0
+    labels = 'algorithm="%s"' % (observer.algorithm or '')
+    lines = [
+        '# TYPE search_expansions_total counter',
+        'search_expansions_total{%s} %d' % (labels, observer.expansions),
+        '# TYPE search_generated_total counter',
+        'search_generated_total{%s} %d' % (labels, observer.generated),
+        '# TYPE search_duplicates_total counter',
+        'search_duplicates_total{%s} %d' % (labels, observer.duplicates),
+        '# TYPE search_reopened_total counter',
+        'search_reopened_total{%s} %d' % (labels, observer.reopened),
+        '# TYPE search_frontier_size gauge',
+        'search_frontier_size{%s} %d' % (labels, observer.frontier_size() if observer.start_time is not None else 0),
+        '# TYPE search_closed_size gauge',
+        'search_closed_size{%s} %d' % (labels, observer.closed_size() if observer.start_time is not None else 0),
+        '# TYPE search_nodes_per_second gauge',
+        'search_nodes_per_second{%s} %f' % (labels, observer.expansions / elapsed if elapsed > 0 else 0),
+    ]
+    rss = max_rss_kb()
+    if rss is not None:
+        lines += ['# TYPE search_max_rss_kilobytes gauge', 'search_max_rss_kilobytes %d' % rss]
+    lines.append('# TYPE search_phase_seconds_total counter')
+    phases = observer.current_phases(elapsed)
+    for phase in PHASES:
+        lines.append('search_phase_seconds_total{%s,phase="%s"} %f' % (labels, phase, phases[phase]))
+    if observer.f_bound is not None:
+        lines += ['# TYPE search_f_bound gauge', 'search_f_bound{%s} %f' % (labels, observer.f_bound)]
+    return '\n'.join(lines) + '\n'
+
+
+class _TimedProblem(SearchProblem):
+
+    def __init__(self, problem: SearchProblem, observer: SearchObserver):
+        self.problem = problem
+        self.observer = observer
+
+    def get_initial_state(self) -> SearchState:
+        return self.problem.get_initial_state()
+
+    def get_goal_state(self) -> SearchState:
+        return self.problem.get_goal_state()
+
+    def is_goal_state(self, state: SearchState) -> bool:
+        start = time.perf_counter()
+        result = self.problem.is_goal_state(state)
+        self.observer.phases['goal'] += time.perf_counter() - start
+        return result
+
+    def get_neighbors(self, state: SearchState):
+        start = time.perf_counter()
+        neighbors = self.problem.get_neighbors(state)
+        self.observer.phases['successors'] += time.perf_counter() - start
+        return neighbors
+
+
+class _TimedFrontier:
+
+    def __init__(self, frontier, observer: SearchObserver, closed: set):
+        self.frontier = frontier
+        self.observer = observer
+        self.closed = closed
+        self.peek_priority = getattr(frontier, 'peek_priority', None)
+
+    @property
+    def entries(self):
+        return self.frontier.entries
+
+    def push(self, item, *args):
+        if item in self.closed:
+            # Back in the open list, as the inconsistent states anytime_astar requeues
+            self.closed.discard(item)
+            self.observer.reopened += 1
+        start = time.perf_counter()
+        self.frontier.push(item, *args)
+        self.observer.phases['queue'] += time.perf_counter() - start
+
+    def pop(self):
+        start = time.perf_counter()
+        if self.peek_priority is not None:
+            self.observer.f_bound = self.peek_priority()
+        item = self.frontier.pop()
+        self.observer.phases['queue'] += time.perf_counter() - start
+        self.closed.add(item)
+        self.observer.expanded()
+        return item
+
+    def update(self, item, priority):
+        start = time.perf_counter()
+        self.frontier.update(item, priority)
+        self.observer.phases['queue'] += time.perf_counter() - start
+
+    def size(self):
+        return self.frontier.size()
+
+    def is_empty(self):
+        return self.frontier.is_empty()
+
+
+class _TimedHeuristic:
+
+    def __init__(self, heuristic: Callable, observer: SearchObserver):
+        self.heuristic = heuristic
+        self.observer = observer
+        if hasattr(heuristic, 'delta'):
+            self.delta = self._delta
+
+    def __call__(self, state):
+        start = time.perf_counter()
+        result = self.heuristic(state)
+        self.observer.phases['heuristic'] += time.perf_counter() - start
+        return result
+
+    def _delta(self, *args):
+        start = time.perf_counter()
+        result = self.heuristic.delta(*args)
+        self.observer.phases['heuristic'] += time.perf_counter() - start
+        return result
+
+
+class _VisitedSet(set):
+
+    def __init__(self, items, observer: SearchObserver):
+        super().__init__(items)
+        self.observer = observer
+
+    def __contains__(self, item):
+        start = time.perf_counter()
+        found = super().__contains__(item)
+        observer = self.observer
+        observer.phases['hashing'] += time.perf_counter() - start
+        observer.generated += 1
+        if found:
+            observer.duplicates += 1
+        return found
+
+    def add(self, item):
+        start = time.perf_counter()
+        super().add(item)
+        self.observer.phases['hashing'] += time.perf_counter() - start
+
+
+class _VisitedDict(dict):
+
+    def __init__(self, items, observer: SearchObserver):
+        super().__init__(items)
+        self.observer = observer
+
+    def __contains__(self, key):
+        start = time.perf_counter()
+        found = super().__contains__(key)
+        observer = self.observer
+        observer.phases['hashing'] += time.perf_counter() - start
+        observer.generated += 1
+        if found:
+            observer.duplicates += 1
+        return found
+
+    def get(self, key, default=None):
+        start = time.perf_counter()
+        value = super().get(key, self)
+        observer = self.observer
+        observer.phases['hashing'] += time.perf_counter() - start
+        observer.generated += 1
+        if value is self:
+            return default
+        observer.duplicates += 1
+        return value
+
+    def __getitem__(self, key):
+        start = time.perf_counter()
+        value = super().__getitem__(key)
+        self.observer.phases['hashing'] += time.perf_counter() - start
+        return value
+
+    def __setitem__(self, key, value):
+        start = time.perf_counter()
+        super().__setitem__(key, value)
+        self.observer.phases['hashing'] += time.perf_counter() - start
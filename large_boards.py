@@ -0,0 +1,178 @@
+from problem import SearchProblem
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem, PackedPuzzleState, BoardTables, check_solvable
+from search import astar, beam_search
+from heuristic import ManhattanDistance, LinearConflict
+from typing import Callable, List, Sequence, Tuple
+import argparse
+import time
+
+# Weight of the tile distances in the heuristic of the placement searches: moving a tile by one cell takes about
+# five moves of the blank, so the weighted estimate keeps those searches short at the cost of a few extra moves
+PLACEMENT_WEIGHT = 5
+# Largest side of the region left to the final optimal search
+FINAL_SIZE = 3
+
+
+class PlacementProblem(SearchProblem):
+    """
+    Moves a few tracked tiles to their target cells. The other tiles are irrelevant, so a state is only the tuple
+    (blank cell, cell of each tracked tile), and the blank never enters a locked cell, which keeps the tiles already
+    fixed in place.
+    """
+
+    def __init__(self, tables: BoardTables, blank: int, positions: Sequence[int], targets: Sequence[int],
+                 locked: bytearray):
+        self.tables = tables
+        self.start = (blank,) + tuple(positions)
+        self.targets = tuple(targets)
+        self.locked = locked
+
+    def get_initial_state(self) -> Tuple[int, ...]:
+        return self.start
+
+    def is_goal_state(self, state: Tuple[int, ...]) -> bool:
+        return state[1:] == self.targets
+
+    def get_neighbors(self, state: Tuple[int, ...]) -> List[Tuple[Tuple[int, ...], str, float]]:
+        blank = state[0]
+        neighbors = []
+        for new_blank, move in self.tables.neighbors[blank]:
+            if not self.locked[new_blank]:
+                positions = tuple(blank if pos == new_blank else pos for pos in state[1:])
+                neighbors.append(((new_blank,) + positions, move, 1))
+        return neighbors
+
+    def heuristic(self, state: Tuple[int, ...]) -> int:
+        """
+        Weighted Manhattan distance of the tracked tiles to their targets plus the distance of the blank to the
+        nearest misplaced one
+        """
+        width = self.tables.width
+        blank_row, blank_column = divmod(state[0], width)
+        tiles_distance, blank_distance = 0, None
+        for pos, target in zip(state[1:], self.targets):
+            if pos != target:
+                row, column = divmod(pos, width)
+                target_row, target_column = divmod(target, width)
+                tiles_distance += abs(row - target_row) + abs(column - target_column)
+                distance = abs(row - blank_row) + abs(column - blank_column)
+                blank_distance = distance if blank_distance is None else min(blank_distance, distance)
+        return PLACEMENT_WEIGHT * tiles_distance + (blank_distance - 1 if blank_distance else 0)
+
+
+def _move(tables: BoardTables, blank: int, new_blank: int) -> str:
+    return next(move for move, pos in tables.moves[blank].items() if pos == new_blank)
+
+
+def reduction_solve(problem: PackedPuzzleProblem,
+                    final_heuristic: Callable[[PackedPuzzleState], float]=None) -> [List[PackedPuzzleState], int]:
+    """
+    Solves a board of any size by fixing its lines one at a time: the bottom row or the right column, whichever
+    side is longer, is filled tile by tile and then left alone, which shrinks the board until it is at most 3x3.
+    The last two tiles of a line are placed together, since placing the last one alone would have to move the one
+    before it. Every tile is moved by a short search over the cells of the tiles being placed only (see
+    PlacementProblem), and the remaining top-left region, which holds the blank's goal cell, is solved optimally
+    with astar. The runtime grows about linearly with the number of tiles, at the price of paths several times
+    longer than optimal on large boards. Raises RuntimeError if a placement search finds no way to move its tiles
+    around the fixed ones.
+    :param problem: a PackedPuzzleProblem
+    :param final_heuristic: heuristic of the final optimal search, Manhattan distance if omitted
+    :return: List[PackedPuzzleState] representing the path
+    """
+    check_solvable(problem)
+    start = problem.get_initial_state()
+    tables = start.tables
+    if min(tables.height, tables.width) < 2:
+        raise ValueError('Boards need at least two rows and two columns, got {}x{}'.format(tables.height,
+                                                                                           tables.width))
+    full_width = tables.width
+    tiles = start.tiles()
+    blank = start.blank
+    locked = bytearray(tables.size)
+    moves = []
+    explored_states_count = 0
+
+    def slide(new_blank):
+        nonlocal blank
+        moves.append(_move(tables, blank, new_blank))
+        tiles[blank], tiles[new_blank] = tiles[new_blank], 0
+        blank = new_blank
+
+    def place(cells):
+        # In the goal, the tile numbered like a cell sits on that cell
+        nonlocal explored_states_count
+        placement = PlacementProblem(tables, blank, [tiles.index(cell) for cell in cells], cells, locked)
+        path, count, _ = astar(placement, placement.heuristic)
+        explored_states_count += count
+        if not path:
+            # Skipping the tiles would leave the board unsolved below them, so there is nothing to fall back to
+            raise RuntimeError('No placement of tiles {} found without moving the {} fixed tiles'
+                               .format(cells, sum(locked)))
+        for state in path[1:]:
+            slide(state[0])
+        for cell in cells:
+            locked[cell] = 1
+
+    height, width = tables.height, tables.width
+    while height > FINAL_SIZE or width > FINAL_SIZE:
+        if height >= width:
+            height -= 1
+            line = [height * full_width + column for column in range(width)]
+        else:
+            width -= 1
+            line = [row * full_width + width for row in range(height)]
+        for cell in line[:-2]:
+            place([cell])
+        place(line[-2:])
+
+    # The tiles left in the top-left region are relabeled as the goal of a board of that size
+    region = [tiles[row * full_width + column] for row in range(height) for column in range(width)]
+    labels = [(tile // full_width) * width + tile % full_width for tile in region]
+    final = PackedPuzzleProblem(PuzzleState([labels[i: i + width] for i in range(0, len(labels), width)]))
+    path, count, _ = astar(final, final_heuristic or ManhattanDistance(height, width))
+    explored_states_count += count
+    for state, next_state in zip(path, path[1:]):
+        row, column = divmod(next_state.blank, width)
+        slide(row * full_width + column)
+
+    path = [start]
+    for move in moves:
+        path.append(path[-1].next_state(move))
+    return path, explored_states_count, len(path) - 1
+
+
+def suboptimality(path: List[PackedPuzzleState], lower_bound: float) -> float:
+    """
+    Returns the ratio of the cost of a path to a lower bound of the optimal cost, e.g. an admissible heuristic
+    value of the initial state; the path is at most that many times longer than optimal
+    """
+    cost = len(path) - 1
+    return cost / lower_bound if lower_bound > 0 else 1.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve random large boards with beam search and line reduction')
+    parser.add_argument('--height', type=int, default=5)
+    parser.add_argument('--width', type=int, default=5)
+    parser.add_argument('--count', type=int, default=5)
+    parser.add_argument('--beam-widths', type=int, nargs='*', default=[100, 1000],
+                        help='beam widths to run, none to skip beam search')
+    args = parser.parse_args()
+    heuristic = LinearConflict(args.height, args.width)
+    solvers = [('reduction', lambda problem: reduction_solve(problem))]
+    for beam_width in args.beam_widths:
+        solvers.append(('beam%d' % beam_width,
+                        lambda problem, beam_width=beam_width: beam_search(problem, heuristic, beam_width)))
+    for number in range(args.count):
+        problem = PackedPuzzleProblem(PuzzleProblem(width=args.width, height=args.height).puzzle)
+        lower_bound = heuristic(problem.get_initial_state())
+        for name, solve in solvers:
+            start_time = time.perf_counter()
+            path, explored_states_count, _ = solve(problem)
+            elapsed = time.perf_counter() - start_time
+            if not path:
+                print("%d %-10s no solution, explored=%d time=%.3fs" % (number, name, explored_states_count, elapsed))
+                continue
+            print("%d %-10s cost=%d lower_bound=%d ratio<=%.2f explored=%d time=%.3fs"
+                  % (number, name, len(path) - 1, lower_bound, suboptimality(path, lower_bound),
+                     explored_states_count, elapsed))
@@ -1,29 +1,92 @@
-from puzzle import PuzzleProblem, PuzzleState
-from search import bfs, dfs, astar, ucs
-from heuristic import manhattan_distance_heuristic, euclidean_distance_heuristic
-from visualizer import Visualizer
+from puzzle import PuzzleState, GOAL_LAYOUTS, path_moves
+from batch import ALGORITHMS, HEURISTICS, ERROR, SOLVED, read_boards, read_binary_boards, read_json_boards, solve_many
+from typing import Any, Dict, Iterator, List
+import argparse
+import json
+import os
+import sys
 import time
 
+FORMATS = ('jsonl', 'binary', 'text')
 
-if __name__ == '__main__':
-    puzzle = PuzzleProblem(PuzzleState([[3, 1, 2], [4, 0, 5], [6, 7, 8]]))
-    #puzzle = PuzzleProblem()
-    print("Initial Puzzle State")
-    print()
-    print(puzzle.puzzle)
-    start_time = time.time()
-    path, explored_states_count, maximum_depth_reached = bfs(puzzle)
-    end_time = time.time()
-    if not path:
-        print('No solution was found for the puzzle:\n%s' % str(puzzle.puzzle))
-        exit(1)
-    print()
-    print("Number of explored states: %d" % explored_states_count)
-    print()
-    print("Cost of the solution: %d" % (len(path) - 1))
-    print()
-    print("Maximum depth reached: %d" % maximum_depth_reached)
-    print()
-    print("Running time(seconds): %f" % (end_time - start_time))
+
+def show(path: List[PuzzleState]) -> None:
+    """
+    Plays a solution in the visualizer. pygame is only imported here, so runs that never display anything do not
+    pay for it, nor get its banner in their output.
+    """
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    from visualizer import Visualizer
     Visualizer(path).play()
 
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve a stream of boards, writing one JSON result per line as '
+                                                 'each board is solved')
+    parser.add_argument('boards', nargs='?', help='file of boards, stdin if omitted')
+    parser.add_argument('--format', default='jsonl', choices=FORMATS,
+                        help='jsonl: one JSON list of rows or of tiles, or an object with tiles and optionally width, '
+                             'goal and id, per line; binary: height and width bytes then one byte per tile; '
+                             'text: tiles separated by spaces or commas, one board per line')
+    parser.add_argument('--algorithm', default='astar', choices=sorted(ALGORITHMS) + ['table'])
+    parser.add_argument('--heuristic', default='manhattan', choices=sorted(HEURISTICS))
+    parser.add_argument('--width', type=int, default=3, help='width of boards given as a flat list of tiles')
+    parser.add_argument('--goal', default=None,
+                        help="goal layout: one of %s, or tiles in row-major order such as '1,2,3,4,5,6,7,8,0'"
+                             % ', '.join(sorted(GOAL_LAYOUTS)))
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes, 1 solves in this process and 0 uses every core')
+    parser.add_argument('--chunksize', type=int, default=1)
+    parser.add_argument('--show', action='store_true', help='play every solution in the visualizer')
+    args = parser.parse_args()
+    # CPU time of the process so far: interpreter start, imports and argument parsing
+    startup = time.process_time()
+    start_time = time.perf_counter()
+
+    ids: Dict[int, Any] = {}
+
+    def problems() -> Iterator:
+        if args.format == 'jsonl':
+            source = open(args.boards) if args.boards else sys.stdin
+            with source:
+                for index, (board_id, problem) in enumerate(read_json_boards(source, args.width, args.goal)):
+                    if board_id is not None:
+                        ids[index] = board_id
+                    yield problem
+        elif args.format == 'binary':
+            source = open(args.boards, 'rb') if args.boards else sys.stdin.buffer
+            with source:
+                yield from read_binary_boards(source, args.goal)
+        else:
+            source = open(args.boards) if args.boards else sys.stdin
+            with source:
+                yield from read_boards(source, args.width, args.goal)
+
+    solved = 0
+    errors = 0
+    count = 0
+    for result in solve_many(problems(), args.algorithm, args.heuristic, args.workers or None, args.chunksize):
+        count += 1
+        record = {'index': result.index}
+        if result.index in ids:
+            record['id'] = ids.pop(result.index)
+        record['status'] = result.status
+        if result.status == ERROR:
+            record['error'] = result.error
+            errors += 1
+            print(json.dumps(record), flush=True)
+            continue
+        if result.status == SOLVED:
+            solved += 1
+            record.update(cost=len(result.path) - 1, moves=path_moves(result.path))
+        else:
+            # Unsolvable, or abandoned by an incomplete search such as beam
+            record.update(cost=None, moves=None)
+        record.update(explored=result.explored_states_count, max_depth=result.maximum_depth_reached,
+                      time=round(result.wall_time, 6))
+        print(json.dumps(record), flush=True)
+        if args.show and result.path:
+            show(result.path)
+    elapsed = time.perf_counter() - start_time
+    print("Solved %d of %d boards (%d errors) in %f seconds (%.1f boards/sec), startup %f seconds"
+          % (solved, count, errors, elapsed, count / elapsed if elapsed else 0, startup), file=sys.stderr)
@@ -0,0 +1,180 @@
+from puzzle import MOVE_CODES, MOVES, get_board_tables
+from typing import Dict, List, Tuple
+from collections import deque
+import argparse
+import time
+
+# Sequences of two moves are enough to drop the move that undoes the previous one
+DEFAULT_DEPTH = 2
+
+
+def redundant_sequences(height: int, width: int, depth: int) -> List[Tuple[int, ...]]:
+    """
+    Returns the minimal redundant move sequences of up to depth moves. A sequence is a tuple of tokens
+    blank * 4 + move_code, so it is tied to the cell the blank starts from. It is redundant when another sequence
+    that comes first in length-then-move-code order leads from the same cell to the same board, and minimal when
+    none of its proper suffixes is redundant (its proper prefixes never are: a prefix of a first sequence is first).
+    Such pairs are found by a breadth-first search from every blank cell whose successors are generated in move
+    code order, so the first sequence reaching a board is the smallest one.
+    :param height: number of rows of the board
+    :param width: number of columns of the board
+    :param depth: maximum length of the sequences
+    :return: the sequences, shortest first
+    """
+    tables = get_board_tables(height, width)
+    size, shifts, mask = tables.size, tables.shifts, tables.mask
+    ordered = [sorted((MOVE_CODES[move], new_blank) for new_blank, move in options) for options in tables.neighbors]
+    layers, seen = [], []
+    for blank in range(size):
+        # Any board with distinct labels works, the effect of a sequence does not depend on them
+        labels = list(range(size))
+        labels[0], labels[blank] = labels[blank], 0
+        packed = tables.pack(labels)
+        layers.append([(packed, blank, ())])
+        seen.append({packed})
+    redundant = set()
+    # Layers of all blank cells advance together so every shorter redundant sequence is known before it is
+    # looked for as a suffix
+    for _ in range(depth):
+        for start in range(size):
+            next_layer = []
+            for packed, blank, sequence in layers[start]:
+                for code, new_blank in ordered[blank]:
+                    tile = (packed >> shifts[new_blank]) & mask
+                    child = packed - (tile << shifts[new_blank]) + (tile << shifts[blank])
+                    extended = sequence + (blank * 4 + code,)
+                    if child in seen[start]:
+                        if not any(extended[i:] in redundant for i in range(1, len(extended) - 1)):
+                            redundant.add(extended)
+                    else:
+                        seen[start].add(child)
+                        next_layer.append((child, new_blank, extended))
+            layers[start] = next_layer
+    return sorted(redundant, key=lambda sequence: (len(sequence), sequence))
+
+
+class MovePruning:
+    """
+    Finite-state automaton over the recent moves of a search path that never emits a successor completing a
+    redundant move sequence of up to depth moves (see redundant_sequences), built per board size as an
+    Aho-Corasick automaton of those sequences. States 0 to size - 1 are the start states of the blank cells.
+    moves[state] lists the allowed (new_blank, move_code, next_state) in the order of BoardTables.neighbors,
+    transitions[state] maps the allowed move letters to the next state and removed[state] counts the moves dropped.
+    The default depth of 2 only drops the move undoing the previous one, which is safe for every search. Longer
+    sequences (the shortest non-trivial ones are 8 moves long, e.g. circling a 2x2 block twice instead of once the
+    other way) also prune short cycles. Every pruned path has an alternative that is not pruned and no longer, which
+    keeps the tree search idastar and the breadth-first searches optimal; combined with duplicate detection in any
+    other expansion order it can cut off every path to a board, so the other searches refuse such automata.
+    """
+
+    def __init__(self, height: int, width: int, depth: int=DEFAULT_DEPTH):
+        tables = get_board_tables(height, width)
+        self.height, self.width, self.depth = height, width, depth
+        patterns = redundant_sequences(height, width, depth)
+        self.patterns = len(patterns)
+        children: List[Dict[int, int]] = [{}]
+        terminal = [False]
+        for pattern in patterns:
+            node = 0
+            for token in pattern:
+                if token not in children[node]:
+                    children[node][token] = len(children)
+                    children.append({})
+                    terminal.append(False)
+                node = children[node][token]
+            terminal[node] = True
+        fail = [0] * len(children)
+        queue = deque(children[0].values())
+        while queue:
+            node = queue.popleft()
+            terminal[node] = terminal[node] or terminal[fail[node]]
+            for token, child in children[node].items():
+                fail[child] = self._goto(children, fail, fail[node], token) if node else 0
+                queue.append(child)
+
+        self.blanks: List[int] = []
+        ids: Dict[Tuple[int, int], int] = {}
+        pending = deque()
+
+        def state_id(node, blank):
+            if (node, blank) not in ids:
+                ids[(node, blank)] = len(self.blanks)
+                self.blanks.append(blank)
+                pending.append((node, blank))
+            return ids[(node, blank)]
+
+        for blank in range(tables.size):
+            state_id(0, blank)
+        rows = []
+        while pending:
+            node, blank = pending.popleft()
+            row = []
+            for new_blank, move in tables.neighbors[blank]:
+                target = self._goto(children, fail, node, blank * 4 + MOVE_CODES[move])
+                if not terminal[target]:
+                    row.append((new_blank, MOVE_CODES[move], state_id(target, new_blank)))
+            rows.append(tuple(row))
+        self.moves: Tuple[Tuple[Tuple[int, int, int], ...], ...] = tuple(rows)
+        self.transitions = [{MOVES[code]: state for _, code, state in row} for row in rows]
+        self.removed = [len(tables.neighbors[blank]) - len(row) for blank, row in zip(self.blanks, rows)]
+        self.expansions = 0
+        self.pruned = 0
+
+    @staticmethod
+    def _goto(children, fail, node, token):
+        while node and token not in children[node]:
+            node = fail[node]
+        return children[node].get(token, 0)
+
+    def start(self, blank: int) -> int:
+        """
+        Returns the automaton state of a search path that starts with the blank at the given cell
+        """
+        return blank
+
+    def reset(self) -> None:
+        """
+        Zeroes the counters; every search using the automaton calls it when it starts
+        """
+        self.expansions = 0
+        self.pruned = 0
+
+    def count(self, expansions: int, pruned: int) -> None:
+        """
+        Adds the expansions of a search run and the successors the automaton kept it from generating
+        """
+        self.expansions += expansions
+        self.pruned += pruned
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the size of the automaton and the expansions and pruned successors of the latest search
+        """
+        return {'depth': self.depth, 'patterns': self.patterns, 'states': len(self.moves),
+                'expansions': self.expansions, 'pruned': self.pruned}
+
+
+_move_pruning: Dict[Tuple[int, int, int], MovePruning] = {}
+
+
+def get_move_pruning(height: int, width: int, depth: int=DEFAULT_DEPTH) -> MovePruning:
+    """
+    Returns the automaton of the given board size and depth, building it on first use. The returned instance is
+    shared, and every search resets its counters when it starts, so they describe the latest run.
+    """
+    pruning = _move_pruning.get((height, width, depth))
+    if pruning is None:
+        pruning = _move_pruning[(height, width, depth)] = MovePruning(height, width, depth)
+    return pruning
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the move pruning automaton of a board size')
+    parser.add_argument('--height', type=int, default=3)
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--depth', type=int, default=12)
+    args = parser.parse_args()
+    start_time = time.time()
+    pruning = MovePruning(args.height, args.width, args.depth)
+    print("Move pruning automaton: %d redundant sequences, %d states, built in %f seconds"
+          % (pruning.patterns, len(pruning.moves), time.time() - start_time))
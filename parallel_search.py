@@ -0,0 +1,246 @@
+from puzzle import PuzzleState, PackedPuzzleProblem, PackedPuzzleState, check_solvable
+from heuristic import ManhattanDistance
+from typing import Callable, List
+import argparse
+import heapq
+import multiprocessing
+import queue
+import time
+
+# Number of nodes a worker expands between looks at its inbox, and the size of a batch sent to another worker
+EXPANSIONS_PER_ROUND = 256
+BATCH_SIZE = 128
+
+
+def owner(packed: int, workers: int) -> int:
+    """
+    Returns the worker that owns a packed board
+    """
+    return hash((packed,)) % workers
+
+
+class _Worker:
+    """
+    One HDA* process: it owns the boards that hash to it, keeps their open and closed lists, and sends generated
+    boards it does not own to their owners in batches.
+    """
+
+    def __init__(self, index, workers, problem, heuristic, inboxes, control, results, sent, received, idle,
+                 incumbent, stop):
+        self.index, self.workers = index, workers
+        self.tables = problem.get_initial_state().tables
+        self.goal = problem.goal_packed
+        self.heuristic = heuristic
+        self.delta = getattr(heuristic, 'delta', None)
+        self.inboxes, self.control, self.results = inboxes, control, results
+        self.sent, self.received, self.idle = sent, received, idle
+        self.incumbent, self.stop = incumbent, stop
+        self.open = []
+        self.g = {}
+        self.parent = {}
+        self.count = 0
+        self.explored_states_count = 0
+        self.maximum_depth_reached = -1
+        self.outboxes = [[] for _ in range(workers)]
+
+    def receive(self, packed, blank, g, h, parent_packed):
+        if g < self.g.get(packed, float('inf')) and g + h < self.incumbent.value:
+            self.g[packed] = g
+            self.parent[packed] = parent_packed
+            heapq.heappush(self.open, (g + h, self.count, packed, blank, g, h))
+            self.count += 1
+
+    def flush(self, target):
+        if self.outboxes[target]:
+            with self.sent.get_lock():
+                self.sent[self.index] += 1
+            self.inboxes[target].put(self.outboxes[target])
+            self.outboxes[target] = []
+
+    def expand(self):
+        tables = self.tables
+        shifts, mask, neighbors = tables.shifts, tables.mask, tables.neighbors
+        f, _, packed, blank, g, h = heapq.heappop(self.open)
+        if g > self.g[packed]:
+            return
+        self.explored_states_count += 1
+        self.maximum_depth_reached = max(self.maximum_depth_reached, g)
+        if packed == self.goal:
+            with self.incumbent.get_lock():
+                if g < self.incumbent.value:
+                    self.incumbent.value = g
+            return
+        for new_blank, _ in neighbors[blank]:
+            tile = (packed >> shifts[new_blank]) & mask
+            child = packed - (tile << shifts[new_blank]) + (tile << shifts[blank])
+            if self.delta is not None:
+                child_h = h + self.delta(packed, tile, new_blank, blank)
+            else:
+                child_h = self.heuristic(PackedPuzzleState(child, new_blank, tables))
+            target = owner(child, self.workers)
+            if target == self.index:
+                self.receive(child, new_blank, g + 1, child_h, packed)
+            else:
+                self.outboxes[target].append((child, new_blank, g + 1, child_h, packed))
+                if len(self.outboxes[target]) >= BATCH_SIZE:
+                    self.flush(target)
+
+    def drain(self, block):
+        inbox = self.inboxes[self.index]
+        while True:
+            try:
+                batch = inbox.get(block, 0.005) if block else inbox.get_nowait()
+            except queue.Empty:
+                return
+            self.idle[self.index] = 0
+            for node in batch:
+                self.receive(*node)
+            with self.received.get_lock():
+                self.received[self.index] += 1
+            block = False
+
+    def run(self):
+        while not self.stop.is_set():
+            self.drain(block=False)
+            # Nodes whose f-value reaches the incumbent can never lead to a better solution
+            if self.open and self.open[0][0] >= self.incumbent.value:
+                self.open = []
+            if self.open:
+                self.idle[self.index] = 0
+                for _ in range(EXPANSIONS_PER_ROUND):
+                    if not self.open:
+                        break
+                    self.expand()
+                for target in range(self.workers):
+                    self.flush(target)
+            else:
+                self.idle[self.index] = 1
+                self.drain(block=True)
+        self.results.put(('stats', self.index, self.explored_states_count, self.maximum_depth_reached))
+        # Serve parent lookups for the path reconstruction until told to quit
+        while True:
+            message = self.control.get()
+            if message[0] == 'quit':
+                return
+            self.results.put(('parent', message[1], self.parent.get(message[1])))
+
+
+def _run_worker(*args) -> None:
+    _Worker(*args).run()
+
+
+def _terminated(sent, received, idle, previous):
+    """
+    Four-counter termination test: every worker idle and all sent batches received, observed twice in a row
+    with unchanged counters
+    """
+    snapshot = (tuple(sent[:]), tuple(received[:]), tuple(idle[:]))
+    done = all(snapshot[2]) and sum(snapshot[0]) == sum(snapshot[1]) and snapshot == previous
+    return done, snapshot
+
+
+def _check_workers(processes: List[multiprocessing.Process]) -> None:
+    # Workers only exit when told to quit, so one that is gone before died from an exception or was killed
+    for index, process in enumerate(processes):
+        if not process.is_alive():
+            for other in processes:
+                other.terminate()
+            raise RuntimeError('HDA* worker {} died with exit code {}'.format(index, process.exitcode))
+
+
+def _result(results: multiprocessing.Queue, processes: List[multiprocessing.Process]):
+    # Waits for the next message of the workers, checking that none of them died meanwhile
+    while True:
+        try:
+            return results.get(timeout=0.1)
+        except queue.Empty:
+            _check_workers(processes)
+
+
+def hdastar(problem: PackedPuzzleProblem, heuristic: Callable[[PackedPuzzleState], float],
+            workers: int=None) -> [List[PackedPuzzleState], int]:
+    """
+    Returns the path from the initial state of the problem to a goal state using hash-distributed A*.
+    Every worker process owns the boards that hash to it and keeps their open and closed lists; generated boards
+    are sent to their owners in batches. Workers prune nodes whose f-value reaches the best solution found so far
+    and the search ends when all of them are idle with no batch in transit, so the result stays optimal.
+    It does not speed up 3x3 or 15-puzzle boards: starting the processes and pickling every board sent to another
+    worker costs more than expanding it with an incremental heuristic, so the scaling report below gets slower as
+    workers are added. It can only pay off when expanding a node costs far more than sending it (e.g. with an
+    expensive heuristic) and every worker has a core of its own. A worker that dies makes hdastar raise
+    RuntimeError.
+    :param problem: a PackedPuzzleProblem
+    :param heuristic: a picklable heuristic, e.g. ManhattanDistance
+    :param workers: number of worker processes, all cores if omitted
+    :return: the same (path, explored_states_count, maximum_depth_reached) triple as astar
+    """
+    check_solvable(problem)
+    workers = workers or multiprocessing.cpu_count()
+    start = problem.get_initial_state()
+    inboxes = [multiprocessing.Queue() for _ in range(workers)]
+    controls = [multiprocessing.Queue() for _ in range(workers)]
+    results = multiprocessing.Queue()
+    sent = multiprocessing.Array('q', workers)
+    received = multiprocessing.Array('q', workers)
+    idle = multiprocessing.Array('b', workers, lock=False)
+    incumbent = multiprocessing.Value('d', float('inf'))
+    stop = multiprocessing.Event()
+    # The initial board is delivered like any other batch so the counters stay balanced
+    with sent.get_lock():
+        sent[0] += 1
+    inboxes[owner(start.packed, workers)].put([(start.packed, start.blank, 0, heuristic(start), None)])
+    processes = [multiprocessing.Process(target=_run_worker,
+                                         args=(index, workers, problem, heuristic, inboxes, controls[index], results,
+                                               sent, received, idle, incumbent, stop), daemon=True)
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+    previous = None
+    while True:
+        time.sleep(0.01)
+        _check_workers(processes)
+        done, previous = _terminated(sent, received, idle, previous)
+        if done:
+            break
+    stop.set()
+    explored_states_count, maximum_depth_reached = 0, -1
+    for _ in range(workers):
+        _, _, explored, depth = _result(results, processes)
+        explored_states_count += explored
+        maximum_depth_reached = max(maximum_depth_reached, depth)
+    path = []
+    if incumbent.value != float('inf'):
+        tables = start.tables
+        packed = problem.goal_packed
+        while packed is not None:
+            tiles = tables.unpack(packed)
+            path.append(PackedPuzzleState(packed, tiles.index(0), tables))
+            controls[owner(packed, workers)].put(('parent', packed))
+            _, _, packed = _result(results, processes)
+        path.reverse()
+    for control in controls:
+        control.put(('quit',))
+    for process in processes:
+        process.join()
+    return path, explored_states_count, maximum_depth_reached
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scaling report of hash-distributed A* against worker count')
+    parser.add_argument('tiles', nargs='*', type=int,
+                        default=[8, 6, 7, 2, 5, 4, 3, 0, 1], help='board tiles in row-major order')
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+    board = [args.tiles[i: i + args.width] for i in range(0, len(args.tiles), args.width)]
+    problem = PackedPuzzleProblem(PuzzleState(board))
+    heuristic = ManhattanDistance(len(board), args.width)
+    print("workers\tcost\texplored\tseconds\tnodes/sec\tspeedup")
+    baseline = None
+    for workers in args.workers:
+        start_time = time.time()
+        path, explored_states_count, _ = hdastar(problem, heuristic, workers)
+        elapsed = time.time() - start_time
+        baseline = baseline or elapsed
+        print("%d\t%d\t%d\t%f\t%.0f\t%.2f" % (workers, len(path) - 1, explored_states_count, elapsed,
+                                               explored_states_count / elapsed, baseline / elapsed))
@@ -0,0 +1,252 @@
+from puzzle import get_board_tables
+from typing import Dict, List, Sequence, Tuple
+import argparse
+import mmap
+import os
+import struct
+import time
+
+# Header of a pattern database file: magic, height, width, number of pattern tiles and the tiles themselves
+HEADER = struct.Struct('<4sBBB32s')
+MAGIC = b'PDB1'
+UNVISITED = 255
+
+DEFAULT_TABLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables')
+
+# Default disjoint partitions of the tiles for each board size (the blank is tile 0 and sits top-left in the goal)
+DEFAULT_PARTITIONS: Dict[Tuple[int, int], List[Tuple[int, ...]]] = {
+    (3, 3): [(1, 2, 3, 4, 5, 6, 7, 8)],
+    (4, 4): [(1, 2, 3, 5, 6, 7), (9, 10, 11, 13, 14, 15), (4, 8, 12)],
+}
+
+
+def table_entries(size: int, pattern_size: int) -> int:
+    """
+    Returns the number of ways to place pattern_size distinguishable tiles on size cells
+    :param size: number of cells of the board
+    :param pattern_size: number of tiles in the pattern
+    :return: size! / (size - pattern_size)!
+    """
+    entries = 1
+    for i in range(pattern_size):
+        entries *= size - i
+    return entries
+
+
+def rank_positions(positions: Sequence[int], size: int) -> int:
+    """
+    Returns the rank of a partial permutation (the cells of the pattern tiles) in [0, table_entries)
+    :param positions: the cell of each pattern tile, in pattern order
+    :param size: number of cells of the board
+    :return: the rank of the positions
+    """
+    rank = 0
+    for i, pos in enumerate(positions):
+        smaller = 0
+        for previous in positions[:i]:
+            if previous < pos:
+                smaller += 1
+        rank = rank * (size - i) + pos - smaller
+    return rank
+
+
+def unrank_positions(rank: int, size: int, pattern_size: int) -> List[int]:
+    """
+    Inverse of rank_positions
+    :param rank: the rank of the positions
+    :param size: number of cells of the board
+    :param pattern_size: number of tiles in the pattern
+    :return: the cell of each pattern tile, in pattern order
+    """
+    digits = []
+    for i in range(pattern_size - 1, -1, -1):
+        rank, digit = divmod(rank, size - i)
+        digits.append(digit)
+    digits.reverse()
+    free = list(range(size))
+    return [free.pop(digit) for digit in digits]
+
+
+def build_table(height: int, width: int, pattern: Sequence[int]) -> bytearray:
+    """
+    Builds the additive pattern database of the given pattern tiles by a retrograde 0-1 BFS from the goal.
+    Only moves of pattern tiles are counted, so disjoint patterns can be summed admissibly.
+    :param height: number of rows of the board
+    :param width: number of columns of the board
+    :param pattern: the tiles of the pattern
+    :return: a bytearray holding the distance of every placement of the pattern tiles, indexed by rank_positions
+    """
+    size = height * width
+    neighbors = get_board_tables(height, width).neighbors
+    pattern_size = len(pattern)
+    entries = table_entries(size, pattern_size)
+    table = bytearray([UNVISITED]) * entries
+    seen = bytearray(entries * size)
+    start = rank_positions(list(pattern), size) * size
+    next_layer = [start]
+    distance = 0
+    while next_layer:
+        layer = []
+        for code in next_layer:
+            if not seen[code]:
+                seen[code] = 1
+                layer.append(code)
+        next_layer = []
+        # The layer grows while it is processed: blank moves into free cells cost nothing
+        i = 0
+        while i < len(layer):
+            code = layer[i]
+            i += 1
+            rank, blank = divmod(code, size)
+            if table[rank] == UNVISITED:
+                table[rank] = min(distance, UNVISITED - 1)
+            positions = unrank_positions(rank, size, pattern_size)
+            occupant = [-1] * size
+            for index, pos in enumerate(positions):
+                occupant[pos] = index
+            for new_blank, _ in neighbors[blank]:
+                index = occupant[new_blank]
+                if index < 0:
+                    new_code = rank * size + new_blank
+                    if not seen[new_code]:
+                        seen[new_code] = 1
+                        layer.append(new_code)
+                else:
+                    positions[index] = blank
+                    new_code = rank_positions(positions, size) * size + new_blank
+                    positions[index] = new_blank
+                    if not seen[new_code]:
+                        next_layer.append(new_code)
+        distance += 1
+    return table
+
+
+def table_path(height: int, width: int, pattern: Sequence[int], directory: str=DEFAULT_TABLES_DIR) -> str:
+    """
+    Returns the file name a pattern database is persisted to
+    """
+    return os.path.join(directory, 'pdb_{}x{}_{}.bin'.format(height, width, '-'.join(map(str, pattern))))
+
+
+def save_table(path: str, height: int, width: int, pattern: Sequence[int], table: bytearray) -> None:
+    """
+    Writes a pattern database to disk with its header
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, height, width, len(pattern), bytes(pattern)))
+        f.write(table)
+    os.replace(tmp_path, path)
+
+
+def load_table(path: str, height: int, width: int, pattern: Sequence[int]) -> mmap.mmap:
+    """
+    Memory-maps a pattern database read-only, so several processes share the same pages
+    :return: the mapped file; entry r lives at offset HEADER.size + r
+    """
+    with open(path, 'rb') as f:
+        table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, file_height, file_width, pattern_size, tiles = HEADER.unpack_from(table)
+    if magic != MAGIC or (file_height, file_width) != (height, width) \
+            or tuple(tiles[:pattern_size]) != tuple(pattern) \
+            or len(table) != HEADER.size + table_entries(height * width, pattern_size):
+        table.close()
+        raise ValueError('{} is not a pattern database of tiles {} on a {}x{} board'.format(path, pattern, height, width))
+    return table
+
+
+def canonical_pattern(height: int, width: int, pattern: Sequence[int]) -> Tuple[Tuple[int, ...], bool]:
+    """
+    Returns the pattern whose table serves the given one, and whether lookups go through the transposed board.
+    On square boards, the table of a pattern P read at the transposed board gives the table of the transposed
+    pattern (tile t relabeled as its mirrored goal cell), so a partition holding a pattern and its transpose, or
+    several partitions holding either of them, build and store a single table.
+    """
+    pattern = tuple(pattern)
+    symmetries = get_board_tables(height, width).symmetries
+    if len(symmetries) == 1:
+        return pattern, False
+    cells = symmetries[1][0]
+    image = tuple(sorted(cells[tile] for tile in pattern))
+    if image < pattern and set(image) != set(pattern):
+        return image, True
+    return pattern, False
+
+
+class PatternDatabase:
+    """
+    Additive disjoint pattern database heuristic. Each pattern's table is loaded from disk with mmap,
+    or built and persisted first if it does not exist yet. Patterns that are transposes of each other share the
+    table of their canonical_pattern.
+    Each table keeps the smallest distance over the cells of the blank, so with several patterns the sum is
+    admissible but may drop by more than one along a move, i.e. it is not always consistent.
+    """
+
+    def __init__(self, height: int=3, width: int=3, partition: List[Sequence[int]]=None,
+                 directory: str=DEFAULT_TABLES_DIR, build: bool=True):
+        self.height, self.width = height, width
+        self.size = height * width
+        self.patterns = [tuple(pattern) for pattern in (partition or DEFAULT_PARTITIONS[(height, width)])]
+        cells = get_board_tables(height, width).symmetries[-1][0]
+        loaded: Dict[Tuple[int, ...], mmap.mmap] = {}
+        # Each lookup is (tiles read, cell map, table): the tiles of the stored pattern are found on the board
+        # and their cells mapped, which reads the stored table at the transposed board when needed
+        self.lookups = []
+        for pattern in self.patterns:
+            stored, transposed = canonical_pattern(height, width, pattern)
+            if stored not in loaded:
+                path = table_path(height, width, stored, directory)
+                if not os.path.exists(path):
+                    if not build:
+                        raise FileNotFoundError(path)
+                    save_table(path, height, width, stored, build_table(height, width, stored))
+                loaded[stored] = load_table(path, height, width, stored)
+            if transposed:
+                self.lookups.append((tuple(cells[tile] for tile in stored), cells, loaded[stored]))
+            else:
+                self.lookups.append((stored, tuple(range(self.size)), loaded[stored]))
+        self.tables = list(loaded.values())
+
+    def __call__(self, state) -> int:
+        tiles = state.tiles() if hasattr(state, 'tiles') else [elem for row in state.state for elem in row]
+        where = [0] * self.size
+        for pos, tile in enumerate(tiles):
+            where[tile] = pos
+        h = 0
+        for pattern, cells, table in self.lookups:
+            h += table[HEADER.size + rank_positions([cells[where[tile]] for tile in pattern], self.size)]
+        return h
+
+    def close(self) -> None:
+        for table in self.tables:
+            table.close()
+
+
+def parse_partition(text: str) -> List[Tuple[int, ...]]:
+    """
+    Parses a partition written as '1,2,3/4,5,6'
+    """
+    return [tuple(int(tile) for tile in pattern.split(',')) for pattern in text.split('/')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build additive pattern databases')
+    parser.add_argument('--height', type=int, default=3)
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--partition', type=parse_partition, default=None,
+                        help="disjoint patterns, e.g. '1,2,3,5,6,7/9,10,11,13,14,15/4,8,12'")
+    parser.add_argument('--directory', default=DEFAULT_TABLES_DIR)
+    args = parser.parse_args()
+    partition = args.partition or DEFAULT_PARTITIONS[(args.height, args.width)]
+    # Patterns served by the table of another pattern are only built once
+    partition = sorted({canonical_pattern(args.height, args.width, pattern)[0] for pattern in partition})
+    for pattern in partition:
+        start_time = time.time()
+        table = build_table(args.height, args.width, pattern)
+        end_time = time.time()
+        path = table_path(args.height, args.width, pattern, args.directory)
+        save_table(path, args.height, args.width, pattern, table)
+        max_value = max(value for value in table if value != UNVISITED)
+        print("Pattern %s: %d entries, %d bytes, max value %d, built in %f seconds -> %s"
+              % (','.join(map(str, pattern)), len(table), os.path.getsize(path), max_value, end_time - start_time, path))
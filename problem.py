@@ -34,6 +34,13 @@ class SearchProblem:
         """
         raise NotImplementedError
 
+    def get_goal_state(self) -> SearchState:
+        """
+        Returns the goal state for the search problem, needed by searches that also expand backwards from the goal.
+        :return A SearchState instance representing the goal state
+        """
+        raise NotImplementedError
+
     def is_goal_state(self, state: SearchState) -> bool:
         """
         Returns True if  the state is a goal state.
@@ -1,7 +1,60 @@
 from problem import SearchState, SearchProblem
 import random
-import util
-from typing import List, Tuple
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# 2-bit codes of the moves, as stored in search.NodeTable links; code ^ 1 is the reverse move
+MOVE_CODES = {'N': 0, 'S': 1, 'W': 2, 'E': 3}
+MOVES = 'NSWE'
+# Moves of the blank seen through the transpose of the board
+TRANSPOSED_MOVES = {'N': 'W', 'W': 'N', 'S': 'E', 'E': 'S'}
+
+
+class UnsolvableError(ValueError):
+    """
+    Raised when a board cannot reach the goal configuration.
+    """
+
+
+def count_inversions(values: Sequence[int]) -> int:
+    """
+    Returns the number of pairs i < j with values[i] > values[j] in O(n log n) by merge sort
+    :param values: a sequence of distinct comparable values
+    :return: the number of inversions
+    """
+    values = list(values)
+    inversions = 0
+    width = 1
+    while width < len(values):
+        merged = []
+        for low in range(0, len(values), 2 * width):
+            left, right = values[low: low + width], values[low + width: low + 2 * width]
+            i = j = 0
+            while i < len(left) and j < len(right):
+                if right[j] < left[i]:
+                    # right[j] jumps over everything left in the left run
+                    inversions += len(left) - i
+                    merged.append(right[j])
+                    j += 1
+                else:
+                    merged.append(left[i])
+                    i += 1
+            merged += left[i:] + right[j:]
+        values = merged
+        width *= 2
+    return inversions
+
+
+def is_solvable(tiles: Sequence[int], width: int) -> bool:
+    """
+    Returns True if the board can reach the goal with the blank top-left and tile t at cell t.
+    Every move swaps the blank with a neighbor, flipping both the permutation parity of the board and the parity
+    of the blank's distance to its goal cell, so a board is solvable exactly when those two parities agree.
+    :param tiles: the tiles of the board in row-major order, the blank as 0
+    :param width: number of columns of the board
+    :return: bool value indicating whether or not the board is solvable
+    """
+    row, column = divmod(list(tiles).index(0), width)
+    return count_inversions(tiles) % 2 == (row + column) % 2
 
 
 class PuzzleState(SearchState):
@@ -22,6 +75,13 @@ class PuzzleState(SearchState):
                 if elem == 0:
                     self.empty_pos = (i, j)
 
+    @property
+    def blank(self) -> int:
+        """
+        Returns the cell of the blank in row-major order, like PackedPuzzleState.blank
+        """
+        return self.empty_pos[0] * self.width + self.empty_pos[1]
+
     def __str__(self):
         return '\n'.join([' '.join([str(elem) if elem != 0 else ' ' for elem in row]) for row in self.state])
 
@@ -31,6 +91,14 @@ class PuzzleState(SearchState):
     def __hash__(self):
         return hash(str(self))
 
+    def canonical(self) -> 'PuzzleState':
+        """
+        Returns the canonical representative of this state under the symmetries of the board (see canonical_tiles)
+        """
+        tiles, _ = canonical_tiles([elem for row in self.state for elem in row],
+                                   get_board_tables(self.height, self.width))
+        return PuzzleState([tiles[i: i + self.width] for i in range(0, len(tiles), self.width)])
+
     def next_state(self, move: str) -> 'PuzzleState':
         """
         Returns the next state that results from applying the action to the current state
@@ -76,21 +144,331 @@ class PuzzleState(SearchState):
         return next_states
 
 
+class BoardTables:
+    """
+    Lookup tables shared by every packed state of a given board size.
+    The board is packed into a single integer holding `bits` bits per cell, cell k
+    (row-major) living at bit offset k * bits.
+    symmetries lists the (cells, moves) pairs of the symmetries that keep the goal in place: the identity and, on
+    square boards, the transpose about the main diagonal. A symmetry sends cell c to cells[c] and, since tile t
+    belongs on cell t, relabels tile t as cells[t]; moves maps each move to its image.
+    """
+    __slots__ = ('height', 'width', 'size', 'bits', 'mask', 'shifts', 'neighbors', 'moves', 'symmetries')
+
+    def __init__(self, height: int, width: int):
+        self.height, self.width = height, width
+        self.size = height * width
+        self.bits = max(4, (self.size - 1).bit_length())
+        self.mask = (1 << self.bits) - 1
+        self.shifts = tuple(pos * self.bits for pos in range(self.size))
+        # neighbors[blank] lists (new_blank, move) in the same order PuzzleState.get_neighbors uses
+        neighbors = []
+        for pos in range(self.size):
+            i, j = divmod(pos, width)
+            options = []
+            if i != height - 1:
+                options.append((pos + width, 'S'))
+            if i != 0:
+                options.append((pos - width, 'N'))
+            if j != width - 1:
+                options.append((pos + 1, 'E'))
+            if j != 0:
+                options.append((pos - 1, 'W'))
+            neighbors.append(tuple(options))
+        self.neighbors = tuple(neighbors)
+        self.moves = tuple({move: new_pos for new_pos, move in options} for options in self.neighbors)
+        symmetries = [(tuple(range(self.size)), {move: move for move in MOVES})]
+        if height == width:
+            symmetries.append((tuple(j * width + i for i in range(height) for j in range(width)), TRANSPOSED_MOVES))
+        self.symmetries = tuple(symmetries)
+
+    def pack(self, tiles: List[int]) -> int:
+        """
+        Packs a row-major list of tiles into a single integer
+        :param tiles: the tiles of the board in row-major order
+        :return: the packed board
+        """
+        packed = 0
+        for pos, tile in enumerate(tiles):
+            packed |= tile << self.shifts[pos]
+        return packed
+
+    def unpack(self, packed: int) -> List[int]:
+        """
+        Unpacks an integer produced by pack back into a row-major list of tiles
+        :param packed: the packed board
+        :return: the tiles of the board in row-major order
+        """
+        return [(packed >> shift) & self.mask for shift in self.shifts]
+
+
+def transform_tiles(tiles: Sequence[int], cells: Sequence[int]) -> List[int]:
+    """
+    Applies a symmetry to a board: the tile on cell c moves to cells[c] and tile t is relabeled cells[t]
+    :param tiles: the tiles of the board in row-major order
+    :param cells: the cell map of one of BoardTables.symmetries
+    :return: the tiles of the symmetric board
+    """
+    image = [0] * len(tiles)
+    for pos, tile in enumerate(tiles):
+        image[cells[pos]] = cells[tile]
+    return image
+
+
+def canonical_tiles(tiles: Sequence[int], tables: 'BoardTables') -> Tuple[List[int], int]:
+    """
+    Returns the canonical board among the symmetric images of a board, which is at the same distance from the goal,
+    and the index in tables.symmetries of the symmetry that produces it. The canonical board has its blank on or
+    above the main diagonal; when both images do, the one with the smaller packed integer is taken.
+    :param tiles: the tiles of the board in row-major order
+    :param tables: the BoardTables of the board size
+    :return: (canonical tiles, symmetry index)
+    """
+    best, best_index, best_key = list(tiles), 0, None
+    for index, (cells, _) in enumerate(tables.symmetries):
+        image = transform_tiles(tiles, cells) if index else list(tiles)
+        row, column = divmod(image.index(0), tables.width)
+        key = (row > column, tables.pack(image))
+        if best_key is None or key < best_key:
+            best, best_index, best_key = image, index, key
+    return best, best_index
+
+
+_board_tables: Dict[Tuple[int, int], BoardTables] = {}
+
+
+def get_board_tables(height: int, width: int) -> BoardTables:
+    """
+    Returns the lookup tables of the given board size, building them on first use
+    :param height: number of rows of the board
+    :param width: number of columns of the board
+    :return: the BoardTables instance of that board size
+    """
+    tables = _board_tables.get((height, width))
+    if tables is None:
+        tables = _board_tables[(height, width)] = BoardTables(height, width)
+    return tables
+
+
+class PackedPuzzleState(SearchState):
+    """
+    Compact state of an 8-puzzle game with the board packed into a single integer.
+    Hashing and equality work on the packed integer directly and successors are
+    generated from the precomputed neighbor tables of the board size.
+    """
+    __slots__ = ('packed', 'blank', 'tables')
+    packed: int
+    blank: int
+    tables: BoardTables
+
+    def __init__(self, packed: int, blank: int, tables: BoardTables):
+        self.packed = packed
+        self.blank = blank
+        self.tables = tables
+
+    @classmethod
+    def from_board(cls, board: List[List[int]]) -> 'PackedPuzzleState':
+        """
+        Builds a packed state out of a board given as a list of rows
+        :param board: the board as a list of rows
+        :return: the equivalent PackedPuzzleState
+        """
+        tables = get_board_tables(len(board), len(board[0]))
+        tiles = [elem for row in board for elem in row]
+        return cls(tables.pack(tiles), tiles.index(0), tables)
+
+    @property
+    def height(self) -> int:
+        return self.tables.height
+
+    @property
+    def width(self) -> int:
+        return self.tables.width
+
+    @property
+    def state(self) -> List[List[int]]:
+        tiles = self.tiles()
+        width = self.tables.width
+        return [tiles[i: i + width] for i in range(0, len(tiles), width)]
+
+    @property
+    def empty_pos(self) -> Tuple[int, int]:
+        return divmod(self.blank, self.tables.width)
+
+    def tiles(self) -> List[int]:
+        """
+        Returns the tiles of the board in row-major order
+        :return: the tiles of the board in row-major order
+        """
+        return self.tables.unpack(self.packed)
+
+    def __str__(self):
+        return '\n'.join([' '.join([str(elem) if elem != 0 else ' ' for elem in row]) for row in self.state])
+
+    def __eq__(self, other):
+        return isinstance(other, PackedPuzzleState) and self.packed == other.packed and self.tables is other.tables
+
+    def __hash__(self):
+        return hash(self.packed)
+
+    def canonical(self) -> 'PackedPuzzleState':
+        """
+        Returns the canonical representative of this state under the symmetries of the board (see canonical_tiles)
+        """
+        if len(self.tables.symmetries) == 1:
+            return self
+        tiles, _ = canonical_tiles(self.tiles(), self.tables)
+        return PackedPuzzleState(self.tables.pack(tiles), tiles.index(0), self.tables)
+
+    def _slide(self, new_blank: int) -> 'PackedPuzzleState':
+        tables = self.tables
+        tile = (self.packed >> tables.shifts[new_blank]) & tables.mask
+        packed = self.packed - (tile << tables.shifts[new_blank]) + (tile << tables.shifts[self.blank])
+        return PackedPuzzleState(packed, new_blank, tables)
+
+    def next_state(self, move: str) -> 'PackedPuzzleState':
+        """
+        Returns the next state that results from applying the action to the current state
+        :param move: str object that represents an action
+        :return: the next state that results from applying the action to the current state
+        """
+        new_blank = self.tables.moves[self.blank].get(move)
+        if new_blank is None:
+            raise ValueError('Invalid Move {}'.format(move))
+        return self._slide(new_blank)
+
+    def get_neighbors(self) -> List[Tuple['PackedPuzzleState', str, float]]:
+        """
+        Returns a list of tuples (next_state, action, cost)
+        :return: a list of tuples (next_state, action, cost)
+        """
+        return [(self._slide(new_blank), move, 1) for new_blank, move in self.tables.neighbors[self.blank]]
+
+
+def snake_goal(height: int, width: int) -> List[int]:
+    """
+    Returns the goal with tiles 1 to size - 1 laid along the rows in alternating directions and the blank last
+    """
+    order = [row * width + (column if row % 2 == 0 else width - 1 - column)
+             for row in range(height) for column in range(width)]
+    tiles = [0] * (height * width)
+    for tile, pos in enumerate(order[:-1], 1):
+        tiles[pos] = tile
+    return tiles
+
+
+# Named goal layouts, as tiles in row-major order; blank_first is the canonical goal every table is built for
+GOAL_LAYOUTS: Dict[str, Callable[[int, int], List[int]]] = {
+    'blank_first': lambda height, width: list(range(height * width)),
+    'blank_last': lambda height, width: list(range(1, height * width)) + [0],
+    'snake': snake_goal,
+}
+
+
+class GoalRelabeling:
+    """
+    Maps boards solved towards a custom goal onto boards solved towards the canonical goal (blank top-left, tile t
+    on cell t), so every heuristic, distance table and cache built for the canonical goal serves any goal.
+    The board is first mirrored vertically and/or horizontally to bring the goal's blank to the top-left cell,
+    which keeps every move of the blank a move, then each tile is relabeled with the cell it occupies in the
+    mirrored goal. Only goals with the blank in a corner can be mapped: no symmetry of the grid brings another
+    cell to the top-left corner.
+    """
+    __slots__ = ('height', 'width', 'cells', 'labels', 'tiles')
+
+    def __init__(self, goal: Sequence[int], height: int, width: int):
+        size = height * width
+        if sorted(goal) != list(range(size)):
+            raise ValueError('A goal must hold every tile from 0 to {} once, got {}'.format(size - 1, list(goal)))
+        row, column = divmod(list(goal).index(0), width)
+        if row not in (0, height - 1) or column not in (0, width - 1):
+            raise ValueError('Only goals with the blank in a corner can be mapped onto the canonical goal, got the '
+                             'blank at row {} column {}'.format(row, column))
+        self.height, self.width = height, width
+        # cells[c] is the cell that cell c is mirrored to; mirrors are their own inverse
+        self.cells = tuple((height - 1 - r if row else r) * width + (width - 1 - c if column else c)
+                           for r, c in (divmod(pos, width) for pos in range(size)))
+        # tiles[c] is the tile of the mirrored goal on cell c, i.e. the tile that is relabeled c
+        self.tiles = [0] * size
+        for pos, tile in enumerate(goal):
+            self.tiles[self.cells[pos]] = tile
+        self.labels = [0] * size
+        for pos, tile in enumerate(self.tiles):
+            self.labels[tile] = pos
+
+    def to_canonical(self, tiles: Sequence[int]) -> List[int]:
+        """
+        Returns the board to solve towards the canonical goal in place of the given one
+        """
+        image = [0] * len(tiles)
+        for pos, tile in enumerate(tiles):
+            image[self.cells[pos]] = self.labels[tile]
+        return image
+
+    def from_canonical(self, tiles: Sequence[int]) -> List[int]:
+        """
+        Inverse of to_canonical
+        """
+        return [self.tiles[tiles[self.cells[pos]]] for pos in range(len(tiles))]
+
+
 class PuzzleProblem(SearchProblem):
+    """
+    Sliding puzzle towards the canonical goal or, if goal is given, towards that layout. A custom goal is handled
+    by a GoalRelabeling: puzzle then holds the relabeled board the searches solve, query the board as given,
+    and restore_path maps a solution back to boards of the requested goal.
+    """
 
     puzzle: PuzzleState
+    query: PuzzleState
+    goal_packed: int
 
-    def __init__(self, puzzle: PuzzleState=None, width: int=3, height: int=3):
-        self.puzzle = puzzle
+    def __init__(self, puzzle: PuzzleState=None, width: int=3, height: int=3, goal: Sequence[int]=None):
+        if puzzle:
+            height, width = puzzle.height, puzzle.width
+        self.tables = get_board_tables(height, width)
+        self.goal_packed = self.tables.pack(list(range(self.tables.size)))
+        self.relabeling = None
+        if goal is not None and list(goal) != list(range(self.tables.size)):
+            self.relabeling = GoalRelabeling(goal, height, width)
+        self.puzzle = self.query = puzzle
         if not puzzle:
             p = list(range(0, width * height))
             random.shuffle(p)
+            if not is_solvable(p, width):
+                # Swapping two tiles flips the permutation parity without moving the blank
+                i, j = [pos for pos, tile in enumerate(p) if tile != 0][:2]
+                p[i], p[j] = p[j], p[i]
             step = width
             self.puzzle = PuzzleState([p[i: i + step] for i in range(0, width * height, width)])
+            self.query = self.restore_state(self.puzzle)
+        elif self.relabeling is not None:
+            tiles = self.relabeling.to_canonical([elem for row in puzzle.state for elem in row])
+            self.puzzle = PuzzleState([tiles[i: i + width] for i in range(0, len(tiles), width)])
 
     def __eq__(self, other):
         return self.puzzle == other.puzzle
 
+    def restore_state(self, state: SearchState) -> SearchState:
+        """
+        Returns the board of the requested goal that a state of this problem stands for, of the same type
+        """
+        if self.relabeling is None:
+            return state
+        if isinstance(state, PackedPuzzleState):
+            tiles = self.relabeling.from_canonical(state.tiles())
+            return PackedPuzzleState(state.tables.pack(tiles), tiles.index(0), state.tables)
+        tiles = self.relabeling.from_canonical([elem for row in state.state for elem in row])
+        return PuzzleState([tiles[i: i + state.width] for i in range(0, len(tiles), state.width)])
+
+    def restore_path(self, path: List[SearchState]) -> List[SearchState]:
+        """
+        Maps a path returned by a search on this problem back to boards of the requested goal
+        """
+        if self.relabeling is None:
+            return path
+        return [self.restore_state(state) for state in path]
+
     def get_initial_state(self) -> PuzzleState:
         """
         Returns the start state for the search problem.
@@ -98,13 +476,28 @@ class PuzzleProblem(SearchProblem):
         """
         return self.puzzle
 
+    def is_solvable(self) -> bool:
+        """
+        Returns True if the goal state can be reached from the initial state
+        """
+        return is_solvable([elem for row in self.puzzle.state for elem in row], self.puzzle.width)
+
+    def get_goal_state(self) -> PuzzleState:
+        """
+        Returns the goal state for the search problem.
+        :return A PuzzleState instance with the tiles sorted in row-major order
+        """
+        width = self.puzzle.width
+        tiles = list(range(self.puzzle.height * width))
+        return PuzzleState([tiles[i: i + width] for i in range(0, len(tiles), width)])
+
     def is_goal_state(self, state: PuzzleState) -> bool:
         """
         Returns True if  the state is a goal state.
         :param state: PuzzleState The state to be checked
         :return bool value indicating whether or not the state is a goal state
         """
-        return util.is_sorted([elem for row in state.state for elem in row])
+        return self.tables.pack([elem for row in state.state for elem in row]) == self.goal_packed
 
     def get_neighbors(self, state: PuzzleState) -> List[Tuple['PuzzleState', str, float]]:
         """
@@ -113,3 +506,55 @@ class PuzzleProblem(SearchProblem):
         :return: a list of tuples (next_state, action, cost)
         """
         return state.get_neighbors()
+
+
+class PackedPuzzleProblem(PuzzleProblem):
+    """
+    PuzzleProblem whose states are PackedPuzzleState instances.
+    """
+
+    packed_puzzle: PackedPuzzleState
+
+    def __init__(self, puzzle: PuzzleState=None, width: int=3, height: int=3, goal: Sequence[int]=None):
+        super().__init__(puzzle, width, height, goal)
+        self.packed_puzzle = PackedPuzzleState.from_board(self.puzzle.state)
+
+    def get_initial_state(self) -> PackedPuzzleState:
+        """
+        Returns the start state for the search problem.
+        :return A PackedPuzzleState instance representing the initial state
+        """
+        return self.packed_puzzle
+
+    def get_goal_state(self) -> PackedPuzzleState:
+        """
+        Returns the goal state for the search problem.
+        :return A PackedPuzzleState instance with the tiles sorted in row-major order
+        """
+        return PackedPuzzleState(self.goal_packed, 0, self.packed_puzzle.tables)
+
+    def is_goal_state(self, state: PackedPuzzleState) -> bool:
+        """
+        Returns True if  the state is a goal state.
+        :param state: PackedPuzzleState The state to be checked
+        :return bool value indicating whether or not the state is a goal state
+        """
+        return state.packed == self.goal_packed
+
+
+def path_moves(path: List[PackedPuzzleState]) -> str:
+    """
+    Returns the moves of the blank along a path as a string of N, S, W and E
+    """
+    return ''.join(next(move for move, new_blank in state.tables.moves[state.blank].items()
+                        if new_blank == next_state.blank) for state, next_state in zip(path, path[1:]))
+
+
+def check_solvable(problem: SearchProblem) -> None:
+    """
+    Raises UnsolvableError if the problem is a puzzle whose goal cannot be reached, so searches can reject it
+    before exploring the whole reachable half of the state space. Other problems are not checked.
+    :param problem: a SearchProblem
+    """
+    if isinstance(problem, PuzzleProblem) and not problem.is_solvable():
+        raise UnsolvableError('Unsolvable board:\n{}'.format(problem.query))
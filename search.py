@@ -1,18 +1,160 @@
 from problem import SearchState, SearchProblem
-from typing import List, Callable
-from util import Stack, Queue, PriorityQueue
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem, PackedPuzzleState, MOVES, check_solvable
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+from util import Stack, Queue, IndexedPriorityQueue, BucketQueue
+from move_pruning import DEFAULT_DEPTH, MovePruning, get_move_pruning
+from array import array
+import heapq
+import time
 
 
-def bfs_dfs(problem, frontier):
+class NodeTable:
+    """
+    Search bookkeeping for packed puzzle boards kept in parallel arrays instead of state-keyed dicts.
+    Node i has a packed board keys[i], a blank position blanks[i], a path cost g[i], a move pruning automaton
+    state states[i] and a link parent_index * 4 + move_code (-1 for the root); the only dict maps packed boards
+    to node indices.
+    """
+
+    def __init__(self, tables):
+        self.keys = [] if tables.bits * tables.size > 64 else array('Q')
+        self.blanks = array('B')
+        self.states = array('I')
+        self.links = array('q')
+        self.g = array('I')
+        self.h = array('d')
+        self.index = {}
+
+    def add(self, key: int, blank: int, state: int, parent: int, move_code: int, g: int, h: float=0) -> int:
+        """
+        Appends a node and returns its index
+        """
+        node = len(self.links)
+        self.index[key] = node
+        self.keys.append(key)
+        self.blanks.append(blank)
+        self.states.append(state)
+        self.links.append(parent * 4 + move_code if parent >= 0 else -1)
+        self.g.append(g)
+        self.h.append(h)
+        return node
+
+    def path(self, node: int, start: PackedPuzzleState) -> List[PackedPuzzleState]:
+        """
+        Rebuilds the path to a node by replaying the move codes of its ancestors from the start state
+        """
+        codes = []
+        while self.links[node] >= 0:
+            codes.append(self.links[node] & 3)
+            node = self.links[node] >> 2
+        path = [start]
+        for code in reversed(codes):
+            path.append(path[-1].next_state(MOVES[code]))
+        return path
+
+
+def compact_bfs_dfs(problem: PackedPuzzleProblem, frontier, pruning: MovePruning, observer=None):
+    start = problem.get_initial_state()
+    tables = start.tables
+    shifts, mask, moves, removed = tables.shifts, tables.mask, pruning.moves, pruning.removed
+    goal = problem.goal_packed
+    nodes = NodeTable(tables)
+    if observer is not None:
+        nodes.index = observer.wrap_visited(nodes.index)
+    index, keys, blanks, states, depth = nodes.index, nodes.keys, nodes.blanks, nodes.states, nodes.g
+    explored_states_count = 0
+    maximum_depth_reached = -1
+    pruned = 0
+    pruning.reset()
+    frontier.push(nodes.add(start.packed, start.blank, pruning.start(start.blank), -1, 0, 0))
+    while not frontier.is_empty():
+        cur = frontier.pop()
+        explored_states_count += 1
+        maximum_depth_reached = max(maximum_depth_reached, depth[cur])
+        packed, blank, state = keys[cur], blanks[cur], states[cur]
+        if packed == goal:
+            pruning.count(explored_states_count, pruned)
+            return nodes.path(cur, start), explored_states_count, maximum_depth_reached
+        pruned += removed[state]
+        for new_blank, code, next_state in moves[state]:
+            tile = (packed >> shifts[new_blank]) & mask
+            child = packed - (tile << shifts[new_blank]) + (tile << shifts[blank])
+            if child not in index:
+                frontier.push(nodes.add(child, new_blank, next_state, cur, code, depth[cur] + 1))
+    pruning.count(explored_states_count, pruned)
+    return [], explored_states_count, maximum_depth_reached
+
+
+def compact_ucs_astar(problem: PackedPuzzleProblem, frontier, heuristic, pruning: MovePruning, observer=None):
+    start = problem.get_initial_state()
+    tables = start.tables
+    shifts, mask, moves, removed = tables.shifts, tables.mask, pruning.moves, pruning.removed
+    goal = problem.goal_packed
+    delta = getattr(heuristic, 'delta', None)
+    nodes = NodeTable(tables)
+    if observer is not None:
+        nodes.index = observer.wrap_visited(nodes.index)
+    index, keys, blanks, states, links = nodes.index, nodes.keys, nodes.blanks, nodes.states, nodes.links
+    cost, h_value = nodes.g, nodes.h
+    explored_states_count = 0
+    maximum_depth_reached = -1
+    pruned = 0
+    pruning.reset()
+    start_h = heuristic(start)
+    frontier.push(nodes.add(start.packed, start.blank, pruning.start(start.blank), -1, 0, 0, start_h), 0 + start_h)
+    while not frontier.is_empty():
+        cur = frontier.pop()
+        explored_states_count += 1
+        maximum_depth_reached = max(maximum_depth_reached, cost[cur])
+        packed, blank, state = keys[cur], blanks[cur], states[cur]
+        if packed == goal:
+            pruning.count(explored_states_count, pruned)
+            return nodes.path(cur, start), explored_states_count, maximum_depth_reached
+        pruned += removed[state]
+        for new_blank, code, next_state in moves[state]:
+            tile = (packed >> shifts[new_blank]) & mask
+            child = packed - (tile << shifts[new_blank]) + (tile << shifts[blank])
+            node = index.get(child)
+            if node is None:
+                if delta is not None:
+                    h = h_value[cur] + delta(packed, tile, new_blank, blank)
+                else:
+                    h = heuristic(PackedPuzzleState(child, new_blank, tables))
+                frontier.push(nodes.add(child, new_blank, next_state, cur, code, cost[cur] + 1, h),
+                              cost[cur] + 1 + h)
+            elif cost[node] > cost[cur] + 1:
+                links[node] = cur * 4 + code
+                states[node] = next_state
+                cost[node] = cost[cur] + 1
+                frontier.update(node, cost[node] + h_value[node])
+    pruning.count(explored_states_count, pruned)
+    return [], explored_states_count, maximum_depth_reached
+
+
+def _prune(pruning: MovePruning, state: int, neighbors: List[Tuple[SearchState, Any, float]]):
+    """
+    Drops the successors the move pruning automaton rules out in the given automaton state, and counts them
+    :return: the remaining successors and the map from their moves to the next automaton state
+    """
+    transitions = pruning.transitions[state]
+    pruning.count(1, pruning.removed[state])
+    return [next_state for next_state in neighbors if next_state[1] in transitions], transitions
+
+
+def bfs_dfs(problem, frontier, pruning: MovePruning=None, observer=None):
     parent = {}
-    explored = set()
+    explored = observer.wrap_visited(set()) if observer is not None else set()
     depth = {}
+    automaton = {}
     explored_states_count = 0
     maximum_depth_reached = -1
     frontier.push(problem.get_initial_state())
     parent[problem.get_initial_state()] = None
     depth[problem.get_initial_state()] = 0
     explored.add(problem.get_initial_state())
+    if pruning is not None:
+        pruning.reset()
+        automaton[problem.get_initial_state()] = pruning.start(problem.get_initial_state().blank)
     while not frontier.is_empty():
         cur = frontier.pop()
         explored_states_count += 1
@@ -25,27 +167,60 @@ def bfs_dfs(problem, frontier):
                 p = parent[p]
             path.reverse()
             return path, explored_states_count, maximum_depth_reached
-        for next_state in problem.get_neighbors(cur):
+        neighbors = problem.get_neighbors(cur)
+        if pruning is not None:
+            neighbors, transitions = _prune(pruning, automaton[cur], neighbors)
+        for next_state in neighbors:
             state = next_state[0]
             if state not in explored:
                 parent[state] = cur
                 depth[state] = depth[cur] + 1
+                if pruning is not None:
+                    automaton[state] = transitions[next_state[1]]
                 frontier.push(state)
                 explored.add(state)
     return [], explored_states_count, maximum_depth_reached
 
 
-def ucs_astar(problem, frontier, heuristic):
+def successor_heuristic(heuristic: Callable[[SearchState], float]) -> Callable[[SearchState, SearchState, float], float]:
+    """
+    Returns a function evaluate(state, parent, parent_h) giving the heuristic value of a successor. Heuristics with
+    a delta(packed, tile, from_pos, to_pos) method get the value of packed successors from the parent's value,
+    other heuristics are evaluated from scratch.
+    :param heuristic: a function estimating the cost from a state to the goal
+    :return: the successor evaluation function
+    """
+    delta = getattr(heuristic, 'delta', None)
+    if delta is None:
+        return lambda state, parent, parent_h: heuristic(state)
+
+    def evaluate(state, parent, parent_h):
+        if not isinstance(state, PackedPuzzleState):
+            return heuristic(state)
+        tables = parent.tables
+        tile = (parent.packed >> tables.shifts[state.blank]) & tables.mask
+        return parent_h + delta(parent.packed, tile, state.blank, parent.blank)
+    return evaluate
+
+
+def ucs_astar(problem, frontier, heuristic, pruning: MovePruning=None, observer=None):
     parent = {}
-    cost = {}
+    cost = observer.wrap_visited({}) if observer is not None else {}
     depth = {}
+    h_value = {}
+    automaton = {}
     explored = set()
     explored_states_count = 0
     maximum_depth_reached = -1
-    frontier.push(problem.get_initial_state(), 0 + heuristic(problem.get_initial_state()))
+    evaluate = successor_heuristic(heuristic)
+    h_value[problem.get_initial_state()] = heuristic(problem.get_initial_state())
+    frontier.push(problem.get_initial_state(), 0 + h_value[problem.get_initial_state()])
     parent[problem.get_initial_state()] = None
     cost[problem.get_initial_state()] = 0
     depth[problem.get_initial_state()] = 0
+    if pruning is not None:
+        pruning.reset()
+        automaton[problem.get_initial_state()] = pruning.start(problem.get_initial_state().blank)
     while not frontier.is_empty():
         cur = frontier.pop()
         explored.add(cur)
@@ -59,54 +234,573 @@ def ucs_astar(problem, frontier, heuristic):
                 p = parent[p]
             path.reverse()
             return path, explored_states_count, maximum_depth_reached
-        for next_state in problem.get_neighbors(cur):
+        neighbors = problem.get_neighbors(cur)
+        if pruning is not None:
+            neighbors, transitions = _prune(pruning, automaton[cur], neighbors)
+        for next_state in neighbors:
             state = next_state[0]
             if state not in cost:
                 parent[state] = cur
                 depth[state] = depth[cur] + 1
                 cost[state] = cost[cur] + next_state[2]
-                frontier.push(state, cost[state] + heuristic(state))
+                h_value[state] = evaluate(state, cur, h_value[cur])
+                if pruning is not None:
+                    automaton[state] = transitions[next_state[1]]
+                frontier.push(state, cost[state] + h_value[state])
             else:
                 if cost[state] > cost[cur] + next_state[2]:
                     parent[state] = cur
                     depth[state] = depth[cur] + 1
                     cost[state] = cost[cur] + next_state[2]
-                    frontier.update(state, cost[state] + heuristic(state))
+                    if pruning is not None:
+                        automaton[state] = transitions[next_state[1]]
+                    frontier.update(state, cost[state] + h_value[state])
     return [], explored_states_count, maximum_depth_reached
 
 
-def bfs(problem: SearchProblem) -> [List[SearchState], int]:
+def default_pruning(problem: PackedPuzzleProblem) -> MovePruning:
+    """
+    Returns the shared automaton pruning inverse moves on the board size of the problem
+    """
+    tables = problem.get_initial_state().tables
+    return get_move_pruning(tables.height, tables.width)
+
+
+def check_pruning(pruning: MovePruning) -> None:
+    """
+    Raises ValueError for automata deeper than DEFAULT_DEPTH, which combined with the duplicate detection of a
+    search that does not expand in breadth-first order can cut off every optimal path
+    """
+    if pruning is not None and pruning.depth > DEFAULT_DEPTH:
+        raise ValueError('Move pruning deeper than {} moves needs bfs, bidirectional_bfs or idastar'
+                         .format(DEFAULT_DEPTH))
+
+
+def bfs(problem: SearchProblem, observer=None, pruning: MovePruning=None) -> [List[SearchState], int]:
     """
     Returns the path from the initial state of the problem to a goal state.
     :param problem: a SearchProblem
+    :param observer: an optional instrumentation.SearchObserver collecting metrics of the run
+    :param pruning: a move_pruning.MovePruning of the board size; packed puzzles prune inverse moves by default
     :return: List[SearchState] representing the path
     """
-    return bfs_dfs(problem, Queue())
+    check_solvable(problem)
+    frontier = Queue()
+    if observer is not None:
+        problem, frontier, _ = observer.instrument('bfs', problem, frontier,
+                                                   inline_successors=isinstance(problem, PackedPuzzleProblem))
+    if isinstance(problem, PackedPuzzleProblem):
+        result = compact_bfs_dfs(problem, frontier, pruning or default_pruning(problem), observer)
+    else:
+        result = bfs_dfs(problem, frontier, pruning, observer)
+    return observer.finish(result) if observer is not None else result
 
 
-def dfs(problem: SearchProblem) -> [List[SearchState], int]:
+def dfs(problem: SearchProblem, observer=None, pruning: MovePruning=None) -> [List[SearchState], int]:
     """
     Returns the path from the initial state of the problem to a goal state.
     :param problem: a SearchProblem
+    :param observer: an optional instrumentation.SearchObserver collecting metrics of the run
+    :param pruning: a move_pruning.MovePruning of the board size; packed puzzles prune inverse moves by default
     :return: List[SearchState] representing the path
     """
-    return bfs_dfs(problem, Stack())
+    check_solvable(problem)
+    check_pruning(pruning)
+    frontier = Stack()
+    if observer is not None:
+        problem, frontier, _ = observer.instrument('dfs', problem, frontier,
+                                                   inline_successors=isinstance(problem, PackedPuzzleProblem))
+    if isinstance(problem, PackedPuzzleProblem):
+        result = compact_bfs_dfs(problem, frontier, pruning or default_pruning(problem), observer)
+    else:
+        result = bfs_dfs(problem, frontier, pruning, observer)
+    return observer.finish(result) if observer is not None else result
 
 
-def ucs(problem: SearchProblem) -> [List[SearchState], int]:
+def priority_frontier(integer_priorities: bool=False):
+    """
+    Returns the frontier used by ucs/astar.
+    :param integer_priorities: True if every f-value is a non-negative integer (e.g. unit costs with an integer
+    heuristic), which allows the O(1) BucketQueue instead of the binary heap
+    :return: a priority queue supporting push, pop and decrease-key through update
+    """
+    return BucketQueue() if integer_priorities else IndexedPriorityQueue()
+
+
+def ucs(problem: SearchProblem, integer_priorities: bool=False, observer=None,
+        pruning: MovePruning=None) -> [List[SearchState], int]:
     """
     Returns the path from the initial state of the problem to a goal state.
     :param problem: a SearchProblem
+    :param integer_priorities: True if all path costs are integers
+    :param observer: an optional instrumentation.SearchObserver collecting metrics of the run
+    :param pruning: a move_pruning.MovePruning of the board size; packed puzzles prune inverse moves by default
     :return: List[SearchState] representing the path
     """
+    check_solvable(problem)
+    check_pruning(pruning)
     zero_heuristic = lambda state : 0
-    return ucs_astar(problem, PriorityQueue(), zero_heuristic)
+    frontier = priority_frontier(integer_priorities)
+    if observer is not None:
+        problem, frontier, zero_heuristic = observer.instrument(
+            'ucs', problem, frontier, zero_heuristic, inline_successors=isinstance(problem, PackedPuzzleProblem))
+    if isinstance(problem, PackedPuzzleProblem):
+        result = compact_ucs_astar(problem, frontier, zero_heuristic, pruning or default_pruning(problem), observer)
+    else:
+        result = ucs_astar(problem, frontier, zero_heuristic, pruning, observer)
+    return observer.finish(result) if observer is not None else result
 
 
-def astar(problem: SearchProblem, heuristic: Callable[[SearchState], float]) -> [List[SearchState], int]:
+def astar(problem: SearchProblem, heuristic: Callable[[SearchState], float],
+          integer_priorities: bool=False, observer=None, pruning: MovePruning=None) -> [List[SearchState], int]:
     """
     Returns the path from the initial state of the problem to a goal state.
     :param problem: a SearchProblem
+    :param heuristic: a function estimating the cost from a state to the goal
+    :param integer_priorities: True if all path costs and heuristic values are integers
+    :param observer: an optional instrumentation.SearchObserver collecting metrics of the run
+    :param pruning: a move_pruning.MovePruning of the board size; packed puzzles prune inverse moves by default
     :return: List[SearchState] representing the path
     """
-    return ucs_astar(problem, PriorityQueue(), heuristic)
+    check_solvable(problem)
+    check_pruning(pruning)
+    frontier = priority_frontier(integer_priorities)
+    if observer is not None:
+        problem, frontier, heuristic = observer.instrument(
+            'astar', problem, frontier, heuristic, inline_successors=isinstance(problem, PackedPuzzleProblem))
+    if isinstance(problem, PackedPuzzleProblem):
+        result = compact_ucs_astar(problem, frontier, heuristic, pruning or default_pruning(problem), observer)
+    else:
+        result = ucs_astar(problem, frontier, heuristic, pruning, observer)
+    return observer.finish(result) if observer is not None else result
+
+
+def idastar(problem: PuzzleProblem, heuristic: Callable[[SearchState], float],
+            pruning: MovePruning=None, observer=None) -> [List[SearchState], int]:
+    """
+    Returns the path from the initial state of the problem to a goal state using iterative-deepening A*.
+    Only the current path is kept in memory and moves are applied and undone on the packed board in place.
+    Successors come from a move pruning automaton, by default the one that never generates the move reversing
+    the previous one; deeper automata also cut off short cycles. If the heuristic has a
+    delta(packed, tile, from_pos, to_pos) method, child h-values are computed from the parent's h-value.
+    :param problem: a PuzzleProblem; other than PackedPuzzleProblem ones are solved packed and get a path of
+    PuzzleState
+    :param heuristic: a function estimating the cost from a state to the goal
+    :param pruning: a move_pruning.MovePruning of the board size
+    :param observer: an optional instrumentation.SearchObserver collecting metrics of the run; its frontier is the
+    current path and f_bound the threshold of the current iteration
+    :return: List[SearchState] representing the path
+    """
+    if not isinstance(problem, PuzzleProblem):
+        raise TypeError('idastar solves puzzle problems, got {}'.format(type(problem).__name__))
+    if not isinstance(problem, PackedPuzzleProblem):
+        # The puzzle of a PuzzleProblem is already relabeled onto the canonical goal
+        path, explored_states_count, maximum_depth_reached = idastar(PackedPuzzleProblem(problem.puzzle), heuristic,
+                                                                     pruning, observer)
+        return [PuzzleState(state.state) for state in path], explored_states_count, maximum_depth_reached
+    check_solvable(problem)
+    start = problem.get_initial_state()
+    tables = start.tables
+    pruning = pruning or default_pruning(problem)
+    pruning.reset()
+    shifts, mask, moves, removed = tables.shifts, tables.mask, pruning.moves, pruning.removed
+    goal = problem.goal_packed
+    delta = getattr(heuristic, 'delta', None)
+    found = -1
+    path = [(start.packed, start.blank)]
+    counters = [0, -1, 0]
+    if observer is not None:
+        _, _, heuristic = observer.instrument('idastar', problem, heuristic=heuristic, inline_successors=True)
+        # Nothing is kept closed; the path is the only open list
+        observer.sizes = lambda: (len(path), 0)
+
+    def search(packed, blank, state, g, h, bound):
+        f = g + h
+        if f > bound:
+            return f
+        counters[0] += 1
+        if g > counters[1]:
+            counters[1] = g
+        if observer is not None:
+            observer.expanded()
+        if packed == goal:
+            return found
+        counters[2] += removed[state]
+        if observer is not None:
+            observer.generated += len(moves[state])
+        minimum = float('inf')
+        for new_blank, _, next_state in moves[state]:
+            tile = (packed >> shifts[new_blank]) & mask
+            child = packed - (tile << shifts[new_blank]) + (tile << shifts[blank])
+            if delta is not None:
+                child_h = h + delta(packed, tile, new_blank, blank)
+            else:
+                child_h = heuristic(PackedPuzzleState(child, new_blank, tables))
+            path.append((child, new_blank))
+            t = search(child, new_blank, next_state, g + 1, child_h, bound)
+            if t == found:
+                return found
+            path.pop()
+            if t < minimum:
+                minimum = t
+        return minimum
+
+    start_h = heuristic(start)
+    bound = start_h
+    while True:
+        if observer is not None:
+            observer.f_bound = bound
+        t = search(start.packed, start.blank, pruning.start(start.blank), 0, start_h, bound)
+        if t == found:
+            pruning.count(counters[0], counters[2])
+            result = [PackedPuzzleState(packed, blank, tables) for packed, blank in path], counters[0], counters[1]
+            break
+        if t == float('inf'):
+            pruning.count(counters[0], counters[2])
+            result = [], counters[0], counters[1]
+            break
+        bound = t
+    return observer.finish(result) if observer is not None else result
+
+
+def _stitch(meeting_state, forward_parent, backward_parent) -> List[SearchState]:
+    path = []
+    p = meeting_state
+    while p is not None:
+        path.append(p)
+        p = forward_parent[p]
+    path.reverse()
+    p = backward_parent[meeting_state]
+    while p is not None:
+        path.append(p)
+        p = backward_parent[p]
+    return path
+
+
+def bidirectional_bfs(problem: SearchProblem, pruning: MovePruning=None,
+                      observer=None) -> [List[SearchState], int]:
+    """
+    Returns a shortest path from the initial state of the problem to its goal state, searching breadth-first
+    from both ends at once and expanding the smaller frontier one whole layer at a time.
+    Moves are assumed to be reversible with unit cost, as in the sliding puzzle.
+    :param problem: a SearchProblem with an explicit goal state
+    :param pruning: an optional move_pruning.MovePruning of the board size, applied in both directions
+    :param observer: an optional instrumentation.SearchObserver collecting metrics of the run
+    :return: List[SearchState] representing the path
+    """
+    check_solvable(problem)
+    if observer is not None:
+        problem, _, _ = observer.instrument('bidirectional_bfs', problem)
+        return observer.finish(_bidirectional_bfs(problem, pruning, observer))
+    return _bidirectional_bfs(problem, pruning)
+
+
+def _bidirectional_bfs(problem: SearchProblem, pruning: MovePruning=None, observer=None):
+    start, goal = problem.get_initial_state(), problem.get_goal_state()
+    parents = ({start: None}, {goal: None})
+    depths = ({start: 0}, {goal: 0})
+    if pruning is not None:
+        pruning.reset()
+    automata = ({start: pruning.start(start.blank)}, {goal: pruning.start(goal.blank)}) if pruning else None
+    frontiers = [[start], [goal]]
+    explored_states_count = 0
+    maximum_depth_reached = 0
+    if observer is not None:
+        parents = tuple(observer.wrap_visited(parent) for parent in parents)
+        # Every state is expanded once, so the expanded states are the closed ones and the rest of the seen ones open
+        observer.sizes = lambda: (len(parents[0]) + len(parents[1]) - explored_states_count, explored_states_count)
+    if start == goal:
+        return [start], 1, 0
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        parent, depth = parents[side], depths[side]
+        other_depth = depths[1 - side]
+        next_layer = []
+        meeting_state, best_length = None, float('inf')
+        maximum_depth_reached = max(maximum_depth_reached, depth[frontiers[side][0]])
+        for cur in frontiers[side]:
+            explored_states_count += 1
+            if observer is not None:
+                observer.expanded()
+            neighbors = problem.get_neighbors(cur)
+            if pruning is not None:
+                neighbors, transitions = _prune(pruning, automata[side][cur], neighbors)
+            for next_state in neighbors:
+                state = next_state[0]
+                if state not in parent:
+                    parent[state] = cur
+                    depth[state] = depth[cur] + 1
+                    if pruning is not None:
+                        automata[side][state] = transitions[next_state[1]]
+                    next_layer.append(state)
+                    if state in other_depth and depth[state] + other_depth[state] < best_length:
+                        meeting_state, best_length = state, depth[state] + other_depth[state]
+        # Every meeting found while expanding a whole layer has the same, optimal, length
+        if meeting_state is not None:
+            return _stitch(meeting_state, parents[0], parents[1]), explored_states_count, maximum_depth_reached
+        frontiers[side] = next_layer
+    return [], explored_states_count, maximum_depth_reached
+
+
+def bidirectional_astar(problem: SearchProblem, heuristic: Callable[[SearchState], float],
+                        backward_heuristic: Callable[[SearchState], float]=None,
+                        pruning: MovePruning=None, observer=None) -> [List[SearchState], int]:
+    """
+    Returns the path from the initial state of the problem to its goal state using front-to-end bidirectional A*.
+    The search stops once the best path found costs no more than the larger of the two smallest f-values, which
+    keeps the result optimal for consistent heuristics. Moves are assumed to be reversible with symmetric costs.
+    :param problem: a SearchProblem with an explicit goal state
+    :param heuristic: a function estimating the cost from a state to the goal state
+    :param backward_heuristic: a function estimating the cost from a state to the initial state, zero if omitted
+    :param pruning: an optional move_pruning.MovePruning of the board size, applied in both directions
+    :param observer: an optional instrumentation.SearchObserver collecting metrics of the run
+    :return: List[SearchState] representing the path
+    """
+    check_solvable(problem)
+    check_pruning(pruning)
+    if observer is not None:
+        problem, _, heuristic = observer.instrument('bidirectional_astar', problem, heuristic=heuristic)
+        if backward_heuristic is not None:
+            backward_heuristic = observer.wrap_heuristic(backward_heuristic)
+        return observer.finish(_bidirectional_astar(problem, heuristic, backward_heuristic, pruning, observer))
+    return _bidirectional_astar(problem, heuristic, backward_heuristic, pruning)
+
+
+def _bidirectional_astar(problem: SearchProblem, heuristic: Callable[[SearchState], float],
+                         backward_heuristic: Callable[[SearchState], float]=None, pruning: MovePruning=None,
+                         observer=None):
+    start, goal = problem.get_initial_state(), problem.get_goal_state()
+    heuristics = (heuristic, backward_heuristic or (lambda state: 0))
+    frontiers = (IndexedPriorityQueue(), IndexedPriorityQueue())
+    parents = ({start: None}, {goal: None})
+    costs = ({start: 0}, {goal: 0})
+    if observer is not None:
+        frontiers = tuple(observer.wrap_frontier(frontier) for frontier in frontiers)
+        costs = tuple(observer.wrap_visited(cost) for cost in costs)
+    depths = ({start: 0}, {goal: 0})
+    if pruning is not None:
+        pruning.reset()
+    automata = ({start: pruning.start(start.blank)}, {goal: pruning.start(goal.blank)}) if pruning else None
+    frontiers[0].push(start, heuristics[0](start))
+    frontiers[1].push(goal, heuristics[1](goal))
+    explored_states_count = 0
+    maximum_depth_reached = 0
+    meeting_state, best_cost = (start, 0) if start == goal else (None, float('inf'))
+    while not frontiers[0].is_empty() and not frontiers[1].is_empty():
+        if best_cost <= max(frontiers[0].peek_priority(), frontiers[1].peek_priority()):
+            break
+        side = 0 if frontiers[0].size() <= frontiers[1].size() else 1
+        frontier, parent, cost, depth = frontiers[side], parents[side], costs[side], depths[side]
+        other_cost, other_depth = costs[1 - side], depths[1 - side]
+        cur = frontier.pop()
+        explored_states_count += 1
+        maximum_depth_reached = max(maximum_depth_reached, depth[cur])
+        neighbors = problem.get_neighbors(cur)
+        if pruning is not None:
+            neighbors, transitions = _prune(pruning, automata[side][cur], neighbors)
+        for next_state in neighbors:
+            state = next_state[0]
+            if state not in cost:
+                parent[state] = cur
+                depth[state] = depth[cur] + 1
+                cost[state] = cost[cur] + next_state[2]
+                if pruning is not None:
+                    automata[side][state] = transitions[next_state[1]]
+                frontier.push(state, cost[state] + heuristics[side](state))
+            elif cost[state] > cost[cur] + next_state[2]:
+                parent[state] = cur
+                depth[state] = depth[cur] + 1
+                cost[state] = cost[cur] + next_state[2]
+                if pruning is not None:
+                    automata[side][state] = transitions[next_state[1]]
+                frontier.update(state, cost[state] + heuristics[side](state))
+            # Same keys as other_cost, whose membership tests an observer would count as generated successors
+            if state in other_depth and cost[state] + other_cost[state] < best_cost:
+                meeting_state, best_cost = state, cost[state] + other_cost[state]
+    if meeting_state is None:
+        return [], explored_states_count, maximum_depth_reached
+    return _stitch(meeting_state, parents[0], parents[1]), explored_states_count, maximum_depth_reached
+
+
+def anytime_astar(problem: SearchProblem, heuristic: Callable[[SearchState], float],
+                  weights: Sequence[float]=(5, 3, 2, 1.5, 1.25, 1), time_budget: float=None,
+                  node_budget: int=None, stop=None, pruning: MovePruning=None,
+                  observer=None) -> Iterator[Tuple[List[SearchState], float, Dict[str, Any]]]:
+    """
+    Anytime Repairing A* (ARA*). Finds a first solution quickly with weighted A* (f = g + w * h) and keeps improving
+    it with decreasing weights, reusing the search effort of the previous iterations. Each time a solution is found
+    or its bound tightens, yields (path, bound, stats) where the path costs at most bound times the optimal cost;
+    a bound of 1 means the path is optimal. Stops when the weights are exhausted, a budget runs out or stop.is_set().
+    Callers can also simply stop iterating at any time.
+    :param problem: a SearchProblem
+    :param heuristic: an admissible heuristic
+    :param weights: decreasing heuristic weights, the last one should be 1 for an optimal final answer
+    :param time_budget: wall-clock seconds after which the search stops
+    :param node_budget: number of expansions after which the search stops
+    :param stop: an object with an is_set() method (e.g. threading.Event) polled on every expansion
+    :param pruning: an optional move_pruning.MovePruning of the board size
+    :param observer: an optional instrumentation.SearchObserver collecting metrics of the run, which gets its final
+    event when the iteration ends
+    :return: an iterator over (path, bound, stats)
+    """
+    check_solvable(problem)
+    check_pruning(pruning)
+    if observer is None:
+        yield from _anytime_astar(problem, heuristic, weights, time_budget, node_budget, stop, pruning)
+        return
+    problem, _, heuristic = observer.instrument('anytime_astar', problem, heuristic=heuristic)
+    try:
+        yield from _anytime_astar(problem, heuristic, weights, time_budget, node_budget, stop, pruning, observer)
+    finally:
+        observer.sample(final=True)
+
+
+def _anytime_astar(problem: SearchProblem, heuristic: Callable[[SearchState], float], weights: Sequence[float],
+                   time_budget: float, node_budget: int, stop, pruning: MovePruning, observer=None):
+    start_time = time.perf_counter()
+    start = problem.get_initial_state()
+    parent = {start: None}
+    cost = observer.wrap_visited({start: 0}) if observer is not None else {start: 0}
+    if pruning is not None:
+        pruning.reset()
+    automaton = {start: pruning.start(start.blank)} if pruning else None
+    h_value = {start: heuristic(start)}
+    evaluate = successor_heuristic(heuristic)
+    explored_states_count = 0
+    best_goal, best_cost = (start, 0) if problem.is_goal_state(start) else (None, float('inf'))
+    reported_cost, reported_bound = None, None
+    frontier = IndexedPriorityQueue()
+    if observer is not None:
+        frontier = observer.wrap_frontier(frontier)
+    inconsistent = set()
+    frontier.push(start, weights[0] * h_value[start])
+
+    def out_of_budget():
+        return (node_budget is not None and explored_states_count >= node_budget) \
+            or (time_budget is not None and time.perf_counter() - start_time >= time_budget) \
+            or (stop is not None and stop.is_set())
+
+    for i, weight in enumerate(weights):
+        closed = set()
+        while not frontier.is_empty() and frontier.peek_priority() < best_cost:
+            if out_of_budget():
+                return
+            cur = frontier.pop()
+            closed.add(cur)
+            explored_states_count += 1
+            neighbors = problem.get_neighbors(cur)
+            if pruning is not None:
+                neighbors, transitions = _prune(pruning, automaton[cur], neighbors)
+            for next_state in neighbors:
+                state = next_state[0]
+                g = cost[cur] + next_state[2]
+                if g < cost.get(state, float('inf')):
+                    parent[state] = cur
+                    cost[state] = g
+                    if pruning is not None:
+                        automaton[state] = transitions[next_state[1]]
+                    if state not in h_value:
+                        h_value[state] = evaluate(state, cur, h_value[cur])
+                    if problem.is_goal_state(state) and g < best_cost:
+                        best_goal, best_cost = state, g
+                    if state in closed:
+                        inconsistent.add(state)
+                    elif state in frontier.entries:
+                        frontier.update(state, g + weight * h_value[state])
+                    else:
+                        frontier.push(state, g + weight * h_value[state])
+        if best_goal is None:
+            return
+        pending = list(frontier.entries) + list(inconsistent)
+        lower_bound = min((cost[state] + h_value[state] for state in pending), default=best_cost)
+        if lower_bound >= best_cost:
+            bound = 1.0
+        else:
+            bound = max(1.0, min(weight, best_cost / lower_bound)) if lower_bound > 0 else weight
+        if best_cost != reported_cost or bound != reported_bound:
+            reported_cost, reported_bound = best_cost, bound
+            path = []
+            p = best_goal
+            while p is not None:
+                path.append(p)
+                p = parent[p]
+            path.reverse()
+            yield path, bound, {'weight': weight, 'cost': best_cost, 'expansions': explored_states_count,
+                                'elapsed': time.perf_counter() - start_time}
+        if bound == 1.0:
+            return
+        # Next iteration: open and inconsistent states are re-queued with the smaller weight
+        next_weight = weights[i + 1] if i + 1 < len(weights) else weight
+        requeued = IndexedPriorityQueue()
+        if observer is not None:
+            requeued = observer.wrap_frontier(requeued, replaces=frontier)
+        for state in pending:
+            requeued.push(state, cost[state] + next_weight * h_value[state])
+        frontier, inconsistent = requeued, set()
+
+
+def beam_search(problem: SearchProblem, heuristic: Callable[[SearchState], float], beam_width: int=1000,
+                max_depth: int=None, pruning: MovePruning=None) -> [List[SearchState], int]:
+    """
+    Breadth-first search that only keeps the beam_width successors with the smallest heuristic values at each depth.
+    Memory and time grow linearly with the solution depth, which lets it finish on boards far too large for the
+    optimal searches, but the path may be longer than optimal and the search fails (returns an empty path) if every
+    path to the goal leaves the beam. Wider beams find shorter paths; a width of 1 is greedy hill climbing.
+    :param problem: a SearchProblem
+    :param heuristic: a function estimating the cost from a state to the goal
+    :param beam_width: number of states kept at each depth
+    :param max_depth: give up after this many moves
+    :param pruning: a move_pruning.MovePruning of the board size; packed puzzles prune inverse moves by default
+    :return: List[SearchState] representing the path
+    """
+    check_solvable(problem)
+    check_pruning(pruning)
+    start = problem.get_initial_state()
+    if pruning is None and isinstance(problem, PackedPuzzleProblem):
+        pruning = default_pruning(problem)
+    evaluate = successor_heuristic(heuristic)
+    # Only the states kept in a beam get a parent, so discarded successors may be generated again later
+    parent = {start: None}
+    if pruning is not None:
+        pruning.reset()
+    automaton = {start: pruning.start(start.blank)} if pruning is not None else None
+    beam = [(heuristic(start), start)]
+    explored_states_count = 0
+    depth = 0
+    goal = start if problem.is_goal_state(start) else None
+    while goal is None and beam and (max_depth is None or depth < max_depth):
+        depth += 1
+        candidates = {}
+        for h, cur in beam:
+            explored_states_count += 1
+            neighbors = problem.get_neighbors(cur)
+            if pruning is not None:
+                neighbors, transitions = _prune(pruning, automaton[cur], neighbors)
+            for next_state in neighbors:
+                state = next_state[0]
+                if state in parent or state in candidates:
+                    continue
+                if problem.is_goal_state(state):
+                    goal = state
+                    parent[state] = cur
+                    break
+                candidates[state] = (evaluate(state, cur, h), cur, transitions[next_state[1]] if pruning else None)
+            if goal is not None:
+                break
+        # The insertion order breaks ties, so the search is deterministic
+        kept = heapq.nsmallest(beam_width, candidates.items(), key=lambda item: item[1][0])
+        beam = []
+        for state, (h, cur, automaton_state) in kept:
+            parent[state] = cur
+            if pruning is not None:
+                automaton[state] = automaton_state
+            beam.append((h, state))
+    if goal is None:
+        return [], explored_states_count, depth
+    path = []
+    p = goal
+    while p is not None:
+        path.append(p)
+        p = parent[p]
+    path.reverse()
+    return path, explored_states_count, depth
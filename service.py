@@ -0,0 +1,395 @@
+from puzzle import PuzzleState, PackedPuzzleProblem, PackedPuzzleState, get_board_tables
+from puzzle import path_moves
+from search import anytime_astar
+from batch import HEURISTICS, board_problem
+from instances import random_walk_instances
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 64
+# Latencies kept for the percentiles reported by the stats operation
+LATENCY_WINDOW = 10000
+# Time allowed past a deadline for the anytime result of a search stopped at that deadline to reach the waiter
+RESULT_GRACE = 0.05
+
+# Worker process state, set by _init_worker
+_worker_flags = None
+_worker_heuristic = None
+_worker_heuristics: Dict[Tuple[int, int], Callable] = {}
+
+
+class _StopFlag:
+    """
+    Stop signal of anytime_astar reading one slot of the flags shared by the service and its worker processes
+    """
+    __slots__ = ('flags', 'slot')
+
+    def __init__(self, flags, slot: int):
+        self.flags, self.slot = flags, slot
+
+    def is_set(self) -> bool:
+        return self.flags[self.slot] != 0
+
+
+def _init_worker(flags, heuristic: str) -> None:
+    global _worker_flags, _worker_heuristic
+    _worker_flags, _worker_heuristic = flags, heuristic
+    _worker_heuristics.clear()
+
+
+def _solve(slot: int, height: int, width: int, tiles: Sequence[int], deadline: Optional[float]) -> Dict[str, Any]:
+    """
+    Runs an anytime search in a worker process until it proves its path optimal, the deadline (a time.time()
+    value) passes or the service raises the slot's stop flag, and returns the last path found as packed boards
+    """
+    start_time = time.time()
+    if deadline is not None and deadline <= start_time:
+        return {'status': 'timeout'}
+    tables = get_board_tables(height, width)
+    if (height, width) not in _worker_heuristics:
+        _worker_heuristics[(height, width)] = HEURISTICS[_worker_heuristic](height, width)
+    problem = PackedPuzzleProblem(PuzzleState([list(tiles[i: i + width]) for i in range(0, tables.size, width)]))
+    stop = _StopFlag(_worker_flags, slot)
+    best = None
+    for best in anytime_astar(problem, _worker_heuristics[(height, width)],
+                              time_budget=deadline - start_time if deadline is not None else None, stop=stop):
+        pass
+    if best is None:
+        return {'status': 'cancelled' if stop.is_set() else 'timeout'}
+    path, bound, stats = best
+    return {'status': 'ok', 'path': [state.packed for state in path], 'bound': bound,
+            'expansions': stats['expansions']}
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """
+    Returns the nearest-rank q-th percentile of sorted values, None if there are none
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+class _Job:
+    __slots__ = ('future', 'slot', 'waiters')
+
+    def __init__(self, future: asyncio.Future, slot: int):
+        self.future, self.slot, self.waiters = future, slot, 0
+
+
+class SolverService:
+    """
+    Solves boards received as line-delimited JSON on a TCP or Unix socket. Each request is one object such as
+    {"id": 1, "tiles": [1, 2, 0, 3, 4, 5, 6, 7, 8], "width": 3, "deadline_ms": 500}, optionally with a "goal" given
+    as tiles or as a puzzle.GOAL_LAYOUTS name, answered by one line with the same id, in completion order.
+    {"op": "stats"} returns the counters and latency percentiles instead.
+    Searches run anytime_astar on a pool of worker processes, so a request whose deadline passes gets the best path
+    found so far together with its suboptimality bound, or a timeout if none was found yet. Requests for a board
+    already being solved (after relabeling onto the canonical goal) are coalesced onto that computation, which keeps
+    the deadline of the first request. A computation nobody waits for any more, because its requests timed out or
+    their connections closed, is stopped through a flag shared with the workers. At most max_queue computations
+    wait for a worker; further requests are rejected at once.
+    """
+
+    def __init__(self, workers: int=None, max_queue: int=DEFAULT_MAX_QUEUE, heuristic: str='linear_conflict',
+                 default_deadline_ms: float=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.default_deadline_ms = default_deadline_ms
+        slots = self.workers + max_queue
+        self.flags = multiprocessing.Array('b', slots, lock=False)
+        self.free_slots = list(range(slots))
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.flags, heuristic))
+        self.jobs: Dict[Tuple[int, int, int], _Job] = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = dict.fromkeys(('received', 'ok', 'optimal', 'timeout', 'rejected', 'unsolvable', 'error',
+                                       'coalesced', 'cancelled'), 0)
+        self.start_time = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the request counters, the computations running or queued and the latency percentiles in
+        milliseconds over the last LATENCY_WINDOW requests
+        """
+        elapsed = time.time() - self.start_time
+        latencies = sorted(self.latencies)
+        completed = sum(self.counters[status] for status in ('ok', 'timeout', 'unsolvable', 'error'))
+        return dict(self.counters, uptime=elapsed, in_flight=len(self.jobs),
+                    queued=max(0, len(self.jobs) - self.workers),
+                    throughput=completed / elapsed if elapsed > 0 else None,
+                    p50_ms=percentile(latencies, 50), p99_ms=percentile(latencies, 99),
+                    max_ms=latencies[-1] if latencies else None)
+
+    def _submit(self, key: Tuple[int, int, int], tiles: List[int], deadline: Optional[float]) -> _Job:
+        slot = self.free_slots.pop()
+        self.flags[slot] = 0
+        height, width, _ = key
+        job = _Job(asyncio.get_running_loop().run_in_executor(self.executor, _solve, slot, height, width, tiles,
+                                                              deadline), slot)
+
+        def finished(_):
+            if self.jobs.get(key) is job:
+                del self.jobs[key]
+            self.free_slots.append(slot)
+        job.future.add_done_callback(finished)
+        self.jobs[key] = job
+        return job
+
+    def _release(self, key: Tuple[int, int, int], job: _Job) -> None:
+        job.waiters -= 1
+        if job.waiters == 0 and not job.future.done():
+            # Later requests for the board start a new computation instead of joining the stopped one
+            self.flags[job.slot] = 1
+            if self.jobs.get(key) is job:
+                del self.jobs[key]
+            self.counters['cancelled'] += 1
+
+    async def solve(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answers one request object, see SolverService
+        """
+        start_time = time.time()
+        self.counters['received'] += 1
+        try:
+            response = await self._solve(request, start_time)
+        except Exception as e:
+            # Whatever goes wrong, e.g. a worker process dying, the request still gets an answer
+            response = {'status': 'error', 'error': '{}: {}'.format(type(e).__name__, e)}
+        self.counters[response['status']] += 1
+        if response['status'] == 'ok' and response['optimal']:
+            self.counters['optimal'] += 1
+        response['latency_ms'] = (time.time() - start_time) * 1000
+        if response['status'] != 'rejected':
+            self.latencies.append(response['latency_ms'])
+        return response
+
+    async def _solve(self, request: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        try:
+            if not isinstance(request.get('tiles'), list):
+                raise ValueError("A request needs 'tiles', a list of tiles in row-major order")
+            tiles = [int(tile) for tile in request['tiles']]
+            width = int(request.get('width', 3))
+            problem = board_problem(tiles, width, request.get('goal'))
+            height = len(tiles) // width
+            deadline_ms = request.get('deadline_ms', self.default_deadline_ms)
+            deadline = start_time + float(deadline_ms) / 1000 if deadline_ms is not None else None
+        except (TypeError, ValueError) as e:
+            return {'status': 'error', 'error': str(e)}
+        if not problem.is_solvable():
+            return {'status': 'unsolvable'}
+
+        canonical = [elem for row in problem.puzzle.state for elem in row]
+        tables = get_board_tables(height, width)
+        key = (height, width, tables.pack(canonical))
+        job = self.jobs.get(key)
+        coalesced = job is not None
+        if coalesced:
+            self.counters['coalesced'] += 1
+        elif not self.free_slots:
+            # Every computation holds a slot until its worker returns, including stopped ones no longer in jobs
+            return {'status': 'rejected'}
+        else:
+            job = self._submit(key, canonical, deadline)
+        job.waiters += 1
+        try:
+            timeout = max(0.0, deadline - time.time()) + RESULT_GRACE if deadline is not None else None
+            result = await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            return {'status': 'timeout', 'coalesced': coalesced}
+        finally:
+            self._release(key, job)
+        if result['status'] != 'ok':
+            # A computation stopped because its other waiters left counts as a timeout for this one
+            return {'status': 'timeout', 'coalesced': coalesced}
+        path = problem.restore_path([PackedPuzzleState(packed, tables.unpack(packed).index(0), tables)
+                                     for packed in result['path']])
+        return {'status': 'ok', 'moves': path_moves(path), 'cost': len(path) - 1, 'optimal': result['bound'] == 1.0,
+                'bound': result['bound'], 'expansions': result['expansions'], 'coalesced': coalesced}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves one client: every line is answered as soon as it is solved, so requests are pipelined. The client
+        must keep the connection open until its answers arrive; requests still pending when it closes are dropped.
+        """
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(line):
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('A request must be a JSON object')
+            except ValueError as e:
+                request, response = {}, {'status': 'error', 'error': str(e)}
+            else:
+                response = self.stats() if request.get('op') == 'stats' else await self.solve(request)
+            if 'id' in request:
+                response['id'] = request['id']
+            async with lock:
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            # Requests of a closed connection stop waiting, which stops computations nobody else waits for
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def serve(self, host: str='127.0.0.1', port: int=DEFAULT_PORT, unix: str=None):
+        """
+        Starts listening on a Unix socket if unix is given, on host:port otherwise
+        :return: the asyncio server
+        """
+        if unix is not None:
+            return await asyncio.start_unix_server(self.handle_connection, unix)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self) -> None:
+        for job in self.jobs.values():
+            self.flags[job.slot] = 1
+        self.executor.shutdown()
+
+
+async def _connect(host: str, port: int, unix: str=None):
+    if unix is not None:
+        return await asyncio.open_unix_connection(unix)
+    return await asyncio.open_connection(host, port)
+
+
+async def _load_connection(boards: List[List[int]], width: int, concurrency: int, deadline_ms: Optional[float],
+                           host: str, port: int, unix: str, latencies: List[float], statuses: Dict[str, int]):
+    reader, writer = await _connect(host, port, unix)
+    window = asyncio.Semaphore(concurrency)
+    sent: Dict[int, float] = {}
+
+    async def receive():
+        for _ in range(len(boards)):
+            response = json.loads(await reader.readline())
+            latencies.append((time.perf_counter() - sent.pop(response['id'])) * 1000)
+            statuses[response['status']] = statuses.get(response['status'], 0) + 1
+            window.release()
+
+    receiver = asyncio.ensure_future(receive())
+    for number, tiles in enumerate(boards):
+        await window.acquire()
+        request = {'id': number, 'tiles': tiles, 'width': width}
+        if deadline_ms is not None:
+            request['deadline_ms'] = deadline_ms
+        sent[number] = time.perf_counter()
+        writer.write((json.dumps(request) + '\n').encode())
+        await writer.drain()
+    await receiver
+    writer.close()
+
+
+async def load_test(boards: List[List[int]], width: int, connections: int=1, concurrency: int=16,
+                    deadline_ms: float=None, host: str='127.0.0.1', port: int=DEFAULT_PORT,
+                    unix: str=None) -> Dict[str, Any]:
+    """
+    Sends boards to a running SolverService over several connections, each keeping up to concurrency requests in
+    flight, and measures the latencies seen by the client
+    :return: the client-side counters and latency percentiles, and the service's own stats
+    """
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    start_time = time.perf_counter()
+    await asyncio.gather(*[_load_connection(boards[i::connections], width, concurrency, deadline_ms,
+                                            host, port, unix, latencies, statuses) for i in range(connections)])
+    elapsed = time.perf_counter() - start_time
+    reader, writer = await _connect(host, port, unix)
+    writer.write(b'{"op": "stats"}\n')
+    server_stats = json.loads(await reader.readline())
+    writer.close()
+    latencies.sort()
+    return {'requests': len(boards), 'elapsed': elapsed, 'throughput': len(boards) / elapsed if elapsed > 0 else None,
+            'statuses': statuses, 'p50_ms': percentile(latencies, 50), 'p99_ms': percentile(latencies, 99),
+            'max_ms': latencies[-1] if latencies else None, 'server': server_stats}
+
+
+def load_boards(height: int, width: int, count: int, min_depth: int, max_depth: int, repeat: float,
+                seed: int=None) -> List[List[int]]:
+    """
+    Returns random-walk boards of which a fraction repeat repeats a recent board, to exercise coalescing
+    """
+    rng = random.Random(seed)
+    tables = get_board_tables(height, width)
+    generated = random_walk_instances(height, width, min_depth, max_depth, rng.randrange(1 << 30))
+    boards: List[List[int]] = []
+    for packed, _ in itertools.islice(generated, count):
+        if boards and rng.random() < repeat:
+            boards.append(rng.choice(boards[-16:]))
+        else:
+            boards.append(tables.unpack(packed))
+    return boards
+
+
+async def _serve_forever(args) -> None:
+    service = SolverService(args.workers, args.max_queue, args.heuristic, args.deadline_ms)
+    server = await service.serve(args.host, args.port, args.unix)
+    print('Serving on %s' % (args.unix or '%s:%d' % (args.host, args.port)), file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Line-delimited JSON solver service and its load generator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', default=None, help='Unix socket path, used instead of host and port')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='run the service')
+    serve.add_argument('--workers', type=int, default=None)
+    serve.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                       help='computations allowed to wait for a worker before requests are rejected')
+    serve.add_argument('--heuristic', default='linear_conflict', choices=sorted(HEURISTICS))
+    serve.add_argument('--deadline-ms', type=float, default=None, help='deadline of requests that set none')
+    load = commands.add_parser('load', help='benchmark a running service')
+    load.add_argument('--height', type=int, default=3)
+    load.add_argument('--width', type=int, default=3)
+    load.add_argument('--count', type=int, default=1000)
+    load.add_argument('--min-depth', type=int, default=10)
+    load.add_argument('--max-depth', type=int, default=60)
+    load.add_argument('--repeat', type=float, default=0.1, help='fraction of requests repeating a recent board')
+    load.add_argument('--connections', type=int, default=4)
+    load.add_argument('--concurrency', type=int, default=16, help='requests in flight per connection')
+    load.add_argument('--deadline-ms', type=float, default=None)
+    load.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(_serve_forever(args))
+        except KeyboardInterrupt:
+            pass
+    else:
+        boards = load_boards(args.height, args.width, args.count, args.min_depth, args.max_depth, args.repeat,
+                             args.seed)
+        report = asyncio.run(load_test(boards, args.width, args.connections, args.concurrency, args.deadline_ms,
+                                       args.host, args.port, args.unix))
+        print(json.dumps(report, indent=1))
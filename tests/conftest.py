@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from puzzle import is_solvable
+from heuristic import state_tiles
+from distance_table import DistanceTable
+
+# Fixed random 3x3 boards, the same on every run
+BOARD_SEED = 2024
+BOARD_COUNT = 6
+
+
+def random_boards(count: int, seed: int, height: int=3, width: int=3):
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        tiles = list(range(height * width))
+        rng.shuffle(tiles)
+        if is_solvable(tiles, width):
+            boards.append(tiles)
+    return boards
+
+
+BOARDS = random_boards(BOARD_COUNT, BOARD_SEED)
+
+
+def rows(tiles, width: int=3):
+    return [tiles[i: i + width] for i in range(0, len(tiles), width)]
+
+
+def assert_valid_path(path, start_tiles, goal_tiles, width: int=3):
+    tiles = [state_tiles(state) for state in path]
+    assert tiles[0] == start_tiles
+    assert tiles[-1] == goal_tiles
+    for before, after in zip(tiles, tiles[1:]):
+        blank, new_blank = before.index(0), after.index(0)
+        assert abs(blank - new_blank) == width or (abs(blank - new_blank) == 1 and blank // width == new_blank // width)
+        swapped = list(before)
+        swapped[blank], swapped[new_blank] = swapped[new_blank], swapped[blank]
+        assert swapped == after
+
+
+@pytest.fixture(scope='session')
+def distance_table():
+    table = DistanceTable(3, 3)
+    yield table
+    table.close()
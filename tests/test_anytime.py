@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem, UnsolvableError
+from heuristic import ManhattanDistance, LinearConflict
+from benchmark import corpus_korf100
+from search import anytime_astar
+from conftest import BOARDS, rows, assert_valid_path
+
+MANHATTAN = ManhattanDistance(3, 3)
+PROBLEM_TYPES = {'packed': PackedPuzzleProblem, 'plain': PuzzleProblem}
+
+
+@pytest.mark.parametrize('kind', sorted(PROBLEM_TYPES))
+@pytest.mark.parametrize('tiles', BOARDS)
+def test_answers_improve_to_an_optimal_path(distance_table, tiles, kind):
+    optimal = distance_table.distance(PuzzleState(rows(tiles)))
+    answers = list(anytime_astar(PROBLEM_TYPES[kind](PuzzleState(rows(tiles))), MANHATTAN))
+    costs = [len(path) - 1 for path, _, _ in answers]
+    bounds = [bound for _, bound, _ in answers]
+    assert costs == sorted(costs, reverse=True) and bounds == sorted(bounds, reverse=True)
+    for (path, bound, stats), cost in zip(answers, costs):
+        assert_valid_path(path, tiles, list(range(9)))
+        assert stats['cost'] == cost and optimal <= cost <= bound * optimal
+    assert bounds[-1] == 1.0 and costs[-1] == optimal
+
+
+def test_node_budget_stops_the_search():
+    tiles = corpus_korf100()[0][4]
+    problem = PackedPuzzleProblem(PuzzleState(rows(tiles, 4)))
+    answers = list(anytime_astar(problem, LinearConflict(4, 4), node_budget=20000))
+    assert answers and all(stats['expansions'] <= 20000 for _, _, stats in answers)
+    path, bound, _ = answers[-1]
+    assert_valid_path(path, tiles, list(range(16)), 4)
+    assert bound > 1.0
+
+
+def test_stop_and_time_budget():
+    problem = PackedPuzzleProblem(PuzzleState(rows(BOARDS[0])))
+    stop = threading.Event()
+    stop.set()
+    assert list(anytime_astar(problem, MANHATTAN, stop=stop)) == []
+    assert list(anytime_astar(problem, MANHATTAN, time_budget=0)) == []
+
+
+def test_goal_board_and_unsolvable_board():
+    answers = list(anytime_astar(PackedPuzzleProblem(PuzzleState(rows(list(range(9))))), MANHATTAN))
+    assert [(len(path), bound) for path, bound, _ in answers] == [(1, 1.0)]
+    with pytest.raises(UnsolvableError):
+        list(anytime_astar(PackedPuzzleProblem(PuzzleState([[2, 1, 3], [4, 5, 6], [7, 8, 0]])), MANHATTAN))
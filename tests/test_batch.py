@@ -0,0 +1,50 @@
+import pytest
+
+from puzzle import path_moves
+from batch import SOLVED, UNSOLVABLE, ERROR, board_problem, solve_many
+from heuristic import ManhattanDistance
+from conftest import BOARDS
+
+
+def test_board_problem_validates_tiles():
+    assert board_problem(BOARDS[0], 3).query.state == [BOARDS[0][i: i + 3] for i in range(0, 9, 3)]
+    for tiles, width in (([1, 2, 3, 0], 3), ([1, 1, 2, 0], 2), ([0, 1, 2, 4], 2), ([], 3), ([1, 0], 0)):
+        with pytest.raises(ValueError):
+            board_problem(tiles, width)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_solve_many(distance_table, workers):
+    unsolvable = board_problem([2, 1, 3, 4, 5, 6, 7, 8, 0], 3)
+    problems = [board_problem(tiles, 3) for tiles in BOARDS] + [ValueError('bad line'), unsolvable]
+    results = sorted(solve_many(problems, 'astar', 'manhattan', workers), key=lambda result: result.index)
+    assert [result.index for result in results] == list(range(len(problems)))
+    for tiles, result in zip(BOARDS, results):
+        assert result.error is None
+        assert result.path[0].tiles() == tiles and result.path[-1].tiles() == list(range(9))
+        assert len(path_moves(result.path)) == distance_table.distance(board_problem(tiles, 3).puzzle)
+    assert all(result.status == SOLVED for result in results[:-2])
+    assert results[-2].status == ERROR and results[-2].error == 'bad line' and results[-2].path == []
+    assert results[-1].status == UNSOLVABLE and results[-1].error is None and results[-1].path == []
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_solve_many_reports_failing_boards(distance_table, workers):
+    # No distance table for 4x4 boards, no default pattern database for 2x3 ones
+    large = board_problem([1, 0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15], 4)
+    problems = [board_problem(BOARDS[0], 3), large, board_problem(BOARDS[1], 3)]
+    results = sorted(solve_many(problems, 'table', workers=workers), key=lambda result: result.index)
+    assert [result.status for result in results] == [SOLVED, ERROR, SOLVED]
+    assert results[1].error.startswith('ValueError') and results[1].path == []
+    assert len(path_moves(results[2].path)) == distance_table.distance(problems[2].puzzle)
+    problems = [board_problem([1, 2, 0, 3, 4, 5], 3), board_problem(BOARDS[2], 3)]
+    results = sorted(solve_many(problems, 'astar', 'pdb', workers), key=lambda result: result.index)
+    assert results[0].error.startswith('KeyError') and results[1].error is None
+
+
+def test_solve_many_keeps_custom_goals():
+    problem = board_problem([1, 2, 3, 4, 5, 6, 7, 0, 8], 3, 'blank_last')
+    result = next(solve_many([problem], 'idastar', ManhattanDistance(3, 3), 1))
+    assert path_moves(result.path) == 'E'
+    assert result.path[-1].tiles() == [1, 2, 3, 4, 5, 6, 7, 8, 0]
+
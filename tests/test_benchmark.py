@@ -0,0 +1,42 @@
+from puzzle import PuzzleState
+from heuristic import ManhattanDistance
+from benchmark import corpus_3x3, corpus_korf100, run_instance, run_with_budget, summarize, compare
+from batch import board_problem
+
+
+def test_korf100_corpus():
+    instances = corpus_korf100()
+    assert len(instances) == 100
+    assert sum(optimal for *_, optimal in instances) == 5305
+    manhattan = ManhattanDistance(4, 4)
+    for _, _, height, width, tiles, optimal in instances:
+        h = manhattan(board_problem(tiles, width).get_initial_state())
+        # Every move changes the Manhattan distance by one
+        assert h <= optimal and (optimal - h) % 2 == 0
+
+
+def test_corpus_3x3_depths_are_optimal(distance_table):
+    instances = corpus_3x3(per_depth=1, max_attempts=2000)
+    depths = [optimal for *_, optimal in instances]
+    # Random walks rarely reach the deepest boards
+    assert depths == sorted(set(depths)) and depths[:20] == list(range(1, 21)) and depths[-1] <= 31
+    for _, _, height, width, tiles, optimal in instances:
+        assert distance_table.distance(PuzzleState([tiles[i: i + width] for i in range(0, 9, width)])) == optimal
+
+
+def test_runs_over_budget_are_timeouts():
+    korf = corpus_korf100()[0]
+    easy = ('3x3', 'easy', 3, 3, [1, 0, 2, 3, 4, 5, 6, 7, 8], 1)
+    manhattan = ManhattanDistance(4, 4)
+    results = [run_with_budget(korf, 'idastar', manhattan, 'manhattan', False, 0.2),
+               run_with_budget(easy, 'idastar', ManhattanDistance(3, 3), 'manhattan', False, 10),
+               run_instance(easy, 'idastar', ManhattanDistance(3, 3), 'manhattan', False)]
+    assert [result['timeout'] for result in results] == [True, False, False]
+    assert results[0]['cost'] is None and results[1]['cost'] == results[2]['cost'] == 1
+    summary = summarize(results)
+    assert summary['korf100/idastar/manhattan']['timeouts'] == 1
+    assert summary['korf100/idastar/manhattan']['nodes'] == 0
+    assert summary['3x3/idastar/manhattan']['instances'] == 2
+    baseline = dict(summary, **{'korf100/idastar/manhattan': dict(summary['korf100/idastar/manhattan'],
+                                                                  timeouts=0)})
+    assert compare(summary, baseline) == ['korf100/idastar/manhattan: timeouts 0 -> 1']
@@ -0,0 +1,46 @@
+import pytest
+
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem, UnsolvableError
+from heuristic import ManhattanDistance, manhattan_distance_to
+from search import bfs, bidirectional_bfs, bidirectional_astar
+from conftest import BOARDS, rows, assert_valid_path
+
+MANHATTAN = ManhattanDistance(3, 3)
+PROBLEM_TYPES = {'packed': PackedPuzzleProblem, 'plain': PuzzleProblem}
+SEARCHES = {
+    'bidirectional_bfs': lambda problem: bidirectional_bfs(problem),
+    'bidirectional_astar': lambda problem: bidirectional_astar(problem, MANHATTAN),
+    # Front-to-end in both directions, the backward half aiming at the initial board
+    'bidirectional_astar_both': lambda problem: bidirectional_astar(
+        problem, MANHATTAN, manhattan_distance_to(PuzzleState(problem.get_initial_state().state))),
+}
+
+
+@pytest.mark.parametrize('kind', sorted(PROBLEM_TYPES))
+@pytest.mark.parametrize('name', sorted(SEARCHES))
+@pytest.mark.parametrize('tiles', BOARDS)
+def test_bidirectional_searches_are_optimal(distance_table, tiles, name, kind):
+    path = SEARCHES[name](PROBLEM_TYPES[kind](PuzzleState(rows(tiles))))[0]
+    assert_valid_path(path, tiles, list(range(9)))
+    assert len(path) - 1 == distance_table.distance(PuzzleState(rows(tiles)))
+
+
+def test_bidirectional_bfs_expands_fewer_states_than_bfs(distance_table):
+    # The deepest of the fixed boards gains the most from meeting in the middle
+    tiles = max(BOARDS, key=lambda tiles: distance_table.distance(PuzzleState(rows(tiles))))
+    problem = PackedPuzzleProblem(PuzzleState(rows(tiles)))
+    assert bidirectional_bfs(problem)[1] < bfs(problem)[1]
+
+
+@pytest.mark.parametrize('name', sorted(SEARCHES))
+def test_goal_board_is_its_own_path(name):
+    path = SEARCHES[name](PackedPuzzleProblem(PuzzleState(rows(list(range(9))))))[0]
+    assert len(path) == 1
+
+
+def test_unsolvable_board_is_rejected():
+    problem = PackedPuzzleProblem(PuzzleState([[2, 1, 3], [4, 5, 6], [7, 8, 0]]))
+    with pytest.raises(UnsolvableError):
+        bidirectional_bfs(problem)
+    with pytest.raises(UnsolvableError):
+        bidirectional_astar(problem, MANHATTAN)
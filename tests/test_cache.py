@@ -0,0 +1,107 @@
+import pytest
+
+from puzzle import PuzzleState, PackedPuzzleProblem, get_board_tables
+from heuristic import ManhattanDistance
+from search import astar
+from cache import SolutionCache, _blob
+from conftest import BOARDS, rows
+
+MANHATTAN = ManhattanDistance(3, 3)
+
+
+def transpose(tiles, width: int=3):
+    # Mirrors the board about its main diagonal, tiles renamed after their mirrored goal cell
+    cells = [column * width + row for row in range(width) for column in range(width)]
+    return [cells[tiles[cell]] for cell in cells]
+
+
+@pytest.mark.parametrize('tiles', BOARDS[:3])
+def test_cached_paths_are_replayed(distance_table, tiles):
+    cache = SolutionCache()
+    problem = PackedPuzzleProblem(PuzzleState(rows(tiles)))
+    path, explored_states_count, _ = cache.solve(problem, astar, MANHATTAN)
+    assert explored_states_count > 0
+    # Every board along the path is answered without searching
+    for distance, state in enumerate(path):
+        cached, explored_states_count, _ = cache.solve(PackedPuzzleProblem(PuzzleState(rows(state.tiles()))),
+                                                       astar, MANHATTAN)
+        assert explored_states_count == 0
+        assert [s.tiles() for s in cached] == [s.tiles() for s in path[distance:]]
+    assert cache.stats()['hits'] == len(path)
+
+
+def test_symmetric_boards_hit_the_cache(distance_table):
+    cache = SolutionCache()
+    tiles = BOARDS[0]
+    cache.solve(PackedPuzzleProblem(PuzzleState(rows(tiles))), astar, MANHATTAN)
+    path, explored_states_count, _ = cache.solve(PackedPuzzleProblem(PuzzleState(rows(transpose(tiles)))),
+                                                 astar, MANHATTAN)
+    assert explored_states_count == 0
+    assert path[0].tiles() == transpose(tiles) and path[-1].tiles() == list(range(9))
+    assert len(path) - 1 == distance_table.distance(PuzzleState(rows(tiles)))
+
+
+def test_lru_evicts_the_oldest_boards():
+    cache = SolutionCache(max_size=5)
+    path = astar(PackedPuzzleProblem(PuzzleState(rows(BOARDS[0]))), MANHATTAN)[0]
+    cache.record(path)
+    assert cache.stats()['size'] == 5
+    assert cache.stats()['evictions'] == len(path) - 5
+    assert cache.lookup(path[0]) is None
+
+
+def test_sqlite_cache_is_shared_across_instances(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite')
+    problem = PackedPuzzleProblem(PuzzleState(rows(BOARDS[1])))
+    cache = SolutionCache(path=db_path)
+    path = cache.solve(problem, astar, MANHATTAN)[0]
+    cache.close()
+    cache = SolutionCache(path=db_path)
+    cached, explored_states_count, _ = cache.solve(problem, astar, MANHATTAN)
+    assert explored_states_count == 0
+    assert [state.tiles() for state in cached] == [state.tiles() for state in path]
+    assert cache.stats()['disk_hits'] == len(path)
+    cache.close()
+
+
+def test_large_boards_fit_their_keys(tmp_path):
+    tables = get_board_tables(6, 6)
+    tiles = list(range(36))
+    tiles[0], tiles[1] = tiles[1], tiles[0]
+    packed = tables.pack(tiles)
+    assert int.from_bytes(_blob(6, 6, packed), 'little') == packed
+    state = PackedPuzzleProblem(PuzzleState(rows(tiles, 6))).get_initial_state()
+    cache = SolutionCache(path=str(tmp_path / 'cache.sqlite'), symmetric=False)
+    cache.record([state, state.next_state('W')])
+    cache.close()
+    cache = SolutionCache(path=str(tmp_path / 'cache.sqlite'), symmetric=False)
+    assert [s.tiles() for s in cache.lookup(state)] == [tiles, list(range(36))]
+    cache.close()
+
+
+def test_longer_paths_do_not_replace_shorter_entries(distance_table, tmp_path):
+    problem = PackedPuzzleProblem(PuzzleState(rows(BOARDS[2])))
+    optimal = astar(problem, MANHATTAN)[0]
+    # A detour: one move away and back before the optimal path
+    start = optimal[0]
+    detour = [start, start.get_neighbors()[0][0]] + optimal
+    cache = SolutionCache(path=str(tmp_path / 'cache.sqlite'))
+    cache.record(optimal)
+    cache.record(detour)
+    assert [state.tiles() for state in cache.lookup(start)] == [state.tiles() for state in optimal]
+    cache.close()
+    cache = SolutionCache(path=str(tmp_path / 'cache.sqlite'))
+    assert len(cache.lookup(start)) == len(optimal)
+    assert len(cache.lookup(detour[1])) == len(optimal) + 1
+    cache.close()
+
+
+def test_lookup_stops_at_inconsistent_entries():
+    cache = SolutionCache(symmetric=False)
+    goal = PackedPuzzleProblem(PuzzleState(rows(list(range(9))))).get_initial_state()
+    near = goal.next_state('E')
+    # Two boards sending each other back and forth
+    cache.record([near, goal])
+    cache._put(cache._canonical(goal)[0], (2, 'E'))
+    assert cache.lookup(near) is None
+    assert cache.lookup(goal) is None
@@ -0,0 +1,46 @@
+import pytest
+
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem
+from distance_table import DistanceTable, build_table, check_table_size, rank_permutation, symmetric_rank, \
+    table_entries, symmetric_entries
+from conftest import BOARDS, rows, assert_valid_path
+
+PROBLEM_TYPES = {'packed': PackedPuzzleProblem, 'plain': PuzzleProblem}
+
+
+@pytest.mark.parametrize('kind', sorted(PROBLEM_TYPES))
+@pytest.mark.parametrize('tiles', BOARDS)
+def test_distance_table_solve(distance_table, tiles, kind):
+    path, _, maximum_depth_reached = distance_table.solve(PROBLEM_TYPES[kind](PuzzleState(rows(tiles))))
+    assert_valid_path(path, tiles, list(range(9)))
+    assert maximum_depth_reached == len(path) - 1 == distance_table(PuzzleState(rows(tiles)))
+
+
+def test_distance_table_rejects_other_sizes(distance_table):
+    with pytest.raises(ValueError):
+        distance_table.solve(PackedPuzzleProblem(PuzzleState([[1, 2], [3, 0]])))
+
+
+def test_full_and_symmetric_tables_agree(distance_table, tmp_path):
+    full = DistanceTable(3, 3, str(tmp_path), symmetric=False)
+    for tiles in BOARDS:
+        assert full.distance(PuzzleState(rows(tiles))) == distance_table.distance(PuzzleState(rows(tiles)))
+    full.close()
+
+
+def test_ranks_cover_the_table():
+    table = build_table(2, 3)
+    assert len(table) == table_entries(6) and max(table) == 21
+    assert rank_permutation([0, 1, 2, 3, 4, 5], 6) < table_entries(6)
+    assert symmetric_rank([0, 1, 2, 3], 2, 2) < symmetric_entries(2, 2)
+
+
+def test_oversized_tables_are_refused(tmp_path):
+    check_table_size(3, 4)
+    with pytest.raises(ValueError):
+        check_table_size(4, 4)
+    with pytest.raises(ValueError):
+        build_table(4, 4)
+    with pytest.raises(ValueError):
+        DistanceTable(4, 4, str(tmp_path))
+    assert not list(tmp_path.iterdir())
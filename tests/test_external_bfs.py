@@ -0,0 +1,60 @@
+import os
+from collections import Counter
+
+import pytest
+
+import external_bfs
+from puzzle import PuzzleState
+from distance_table import HEADER, UNVISITED, DistanceTable, build_table, table_path
+from external_bfs import external_bfs as search, read_sorted, write_sorted
+from conftest import BOARDS, rows
+
+
+def layer_counts(table):
+    counts = Counter(distance for distance in table if distance != UNVISITED)
+    return [counts[depth] for depth in range(len(counts))]
+
+
+def test_sorted_files_round_trip(tmp_path):
+    path = str(tmp_path / 'layer.bin')
+    boards = [1, 5, 1 << 40, (1 << 64) - 1]
+    assert write_sorted(path, boards) == len(boards)
+    assert list(read_sorted(path)) == boards
+
+
+def test_layers_match_the_distance_table_with_small_runs(tmp_path, monkeypatch):
+    # Tiny chunks and merges force many runs and several merge passes
+    monkeypatch.setattr(external_bfs, 'READ_CHUNK', 16)
+    monkeypatch.setattr(external_bfs, 'MAX_MERGE', 3)
+    counts_path = str(tmp_path / 'counts.tsv')
+    counts = search(2, 3, str(tmp_path / 'layers'), memory_budget=0, counts_path=counts_path)
+    assert counts == layer_counts(build_table(2, 3))
+    with open(counts_path) as f:
+        assert [int(line.split('\t')[1]) for line in f] == counts
+
+
+def test_distance_file_matches_the_distance_table(tmp_path, distance_table):
+    directory = str(tmp_path)
+    distance_path = table_path(3, 3, directory, symmetric=False)
+    counts = search(3, 3, os.path.join(directory, 'layers'), distance_path=distance_path)
+    assert counts == layer_counts(build_table(3, 3))
+    with open(distance_path, 'rb') as f:
+        assert f.read()[HEADER.size:] == build_table(3, 3)
+    table = DistanceTable(3, 3, directory, build=False, symmetric=False)
+    for tiles in BOARDS:
+        assert table.distance(PuzzleState(rows(tiles))) == distance_table.distance(PuzzleState(rows(tiles)))
+    table.close()
+
+
+def test_pattern_space_holds_every_placement(tmp_path):
+    counts = search(2, 3, str(tmp_path), pattern=[1, 2])
+    # The blank and the two pattern tiles on distinct cells, the other three tiles alike
+    assert sum(counts) == 6 * 5 * 4
+
+
+def test_oversized_distance_files_are_refused_up_front(tmp_path):
+    with pytest.raises(ValueError):
+        search(4, 4, str(tmp_path / 'layers'), distance_path=str(tmp_path / 'distance.bin'))
+    assert not os.path.exists(str(tmp_path / 'layers'))
+    with pytest.raises(ValueError):
+        search(2, 3, str(tmp_path / 'layers'), pattern=[1, 2], distance_path=str(tmp_path / 'distance.bin'))
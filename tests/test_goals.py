@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem, GoalRelabeling, GOAL_LAYOUTS, snake_goal
+from heuristic import ManhattanDistance, state_tiles
+from search import bfs, astar, idastar
+from conftest import BOARDS, rows, assert_valid_path
+
+MANHATTAN = ManhattanDistance(3, 3)
+PROBLEM_TYPES = {'packed': PackedPuzzleProblem, 'plain': PuzzleProblem}
+
+
+def corner_goals(height: int, width: int, count: int, seed: int):
+    rng = random.Random(seed)
+    corners = [0, width - 1, (height - 1) * width, height * width - 1]
+    for _ in range(count):
+        goal = list(range(1, height * width))
+        rng.shuffle(goal)
+        blank = rng.choice(corners)
+        goal.insert(blank, 0)
+        yield goal
+
+
+def test_snake_goal():
+    assert snake_goal(3, 3) == [1, 2, 3, 6, 5, 4, 7, 8, 0]
+    assert snake_goal(2, 4) == [1, 2, 3, 4, 0, 7, 6, 5]
+    assert GOAL_LAYOUTS['blank_first'](2, 2) == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('height,width', [(3, 3), (3, 4), (2, 5)])
+def test_relabeling_maps_goals_and_moves(height, width):
+    size = height * width
+    tiles = list(range(size))
+    random.Random(size).shuffle(tiles)
+    for goal in corner_goals(height, width, 10, size):
+        relabeling = GoalRelabeling(goal, height, width)
+        assert relabeling.to_canonical(goal) == list(range(size))
+        image = relabeling.to_canonical(tiles)
+        assert relabeling.from_canonical(image) == tiles
+        # A move of the blank on the board is a move of the blank on its image
+        for next_state, _, _ in PuzzleState(rows(tiles, width)).get_neighbors():
+            next_image = PuzzleState(rows(relabeling.to_canonical(state_tiles(next_state)), width))
+            assert next_image in [state for state, _, _ in PuzzleState(rows(image, width)).get_neighbors()]
+
+
+def test_goals_must_be_complete_with_the_blank_in_a_corner():
+    with pytest.raises(ValueError):
+        GoalRelabeling([1, 2, 3, 4, 0, 5, 6, 7, 8], 3, 3)
+    with pytest.raises(ValueError):
+        GoalRelabeling([1, 1, 3, 4, 5, 6, 7, 8, 0], 3, 3)
+
+
+@pytest.mark.parametrize('kind', sorted(PROBLEM_TYPES))
+@pytest.mark.parametrize('tiles', BOARDS[:3])
+def test_searches_reach_a_custom_goal(distance_table, tiles, kind):
+    goal = snake_goal(3, 3)
+    # The board standing for tiles when solving towards the snake goal
+    board = GoalRelabeling(goal, 3, 3).from_canonical(tiles)
+    problem = PROBLEM_TYPES[kind](PuzzleState(rows(board)), goal=goal)
+    assert state_tiles(problem.puzzle) == tiles
+    optimal = distance_table.distance(PuzzleState(rows(tiles)))
+    for search in (lambda: astar(problem, MANHATTAN), lambda: idastar(problem, MANHATTAN)):
+        path = problem.restore_path(search()[0])
+        assert_valid_path(path, board, goal)
+        assert len(path) - 1 == optimal
+    if kind == 'packed':
+        assert len(problem.restore_path(bfs(problem)[0])) - 1 == optimal
+
+
+def test_unsolvable_for_the_goal():
+    # Solvable for the canonical goal, but the snake goal has the other parity
+    problem = PackedPuzzleProblem(PuzzleState(rows(BOARDS[0])), goal=snake_goal(3, 3))
+    assert not problem.is_solvable()
+    assert PackedPuzzleProblem(PuzzleState(rows(BOARDS[0]))).is_solvable()
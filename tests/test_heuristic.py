@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from puzzle import PuzzleState, PackedPuzzleProblem
+from instances import random_walk_board
+from heuristic import ManhattanDistance, LinearConflict
+from conftest import BOARDS, rows
+
+HEURISTICS = {
+    'manhattan': lambda: ManhattanDistance(3, 3),
+    'linear_conflict': lambda: LinearConflict(3, 3),
+}
+
+
+@pytest.mark.parametrize('name', sorted(HEURISTICS))
+def test_heuristics_are_admissible_and_consistent(distance_table, name):
+    heuristic = HEURISTICS[name]()
+    for tiles in BOARDS:
+        state = PackedPuzzleProblem(PuzzleState(rows(tiles))).get_initial_state()
+        h = heuristic(state)
+        assert 0 <= h <= distance_table.distance(state)
+        assert heuristic(PuzzleState(rows(tiles))) == h
+        for next_state, _, _ in state.get_neighbors():
+            next_h = heuristic(next_state)
+            assert abs(next_h - h) <= 1
+            delta = getattr(heuristic, 'delta', None)
+            if delta is not None:
+                tile = (state.packed >> state.tables.shifts[next_state.blank]) & state.tables.mask
+                assert h + delta(state.packed, tile, next_state.blank, state.blank) == next_h
+    goal = PackedPuzzleProblem(PuzzleState(rows(list(range(9))))).get_initial_state()
+    assert heuristic(goal) == 0
+
+
+@pytest.mark.parametrize('height,width', [(2, 3), (3, 3), (3, 4), (4, 4)])
+def test_linear_conflict_delta_matches_full_evaluation(height, width):
+    heuristic = LinearConflict(height, width)
+    rng = random.Random(height * width)
+    for _ in range(30):
+        tiles = random_walk_board(height, width, rng.randint(10, 60), rng)
+        state = PackedPuzzleProblem(PuzzleState(rows(tiles, width))).get_initial_state()
+        h = heuristic(state)
+        for next_state, _, _ in state.get_neighbors():
+            tile = (state.packed >> state.tables.shifts[next_state.blank]) & state.tables.mask
+            assert h + heuristic.delta(state.packed, tile, next_state.blank, state.blank) == heuristic(next_state)
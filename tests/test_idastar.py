@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem, PackedPuzzleState, UnsolvableError
+from heuristic import ManhattanDistance, LinearConflict, manhattan_distance_heuristic
+from instances import random_walk_board
+from search import astar, idastar
+from conftest import BOARDS, rows, assert_valid_path
+
+HEURISTICS = {
+    'manhattan': ManhattanDistance(3, 3),
+    'linear_conflict': LinearConflict(3, 3),
+    # No delta method, so every child is evaluated from scratch
+    'plain_manhattan': lambda state: manhattan_distance_heuristic(PuzzleState(state.state)),
+}
+
+
+@pytest.mark.parametrize('name', sorted(HEURISTICS))
+@pytest.mark.parametrize('tiles', BOARDS)
+def test_idastar_is_optimal(distance_table, tiles, name):
+    path, explored_states_count, maximum_depth_reached = idastar(PackedPuzzleProblem(PuzzleState(rows(tiles))),
+                                                                 HEURISTICS[name])
+    assert_valid_path(path, tiles, list(range(9)))
+    assert len(path) - 1 == distance_table.distance(PuzzleState(rows(tiles)))
+    assert maximum_depth_reached == len(path) - 1 and explored_states_count >= len(path)
+
+
+def test_plain_problems_get_plain_states(distance_table):
+    path = idastar(PuzzleProblem(PuzzleState(rows(BOARDS[0]))), HEURISTICS['manhattan'])[0]
+    assert all(type(state) is PuzzleState for state in path)
+    assert_valid_path(path, BOARDS[0], list(range(9)))
+    packed_path = idastar(PackedPuzzleProblem(PuzzleState(rows(BOARDS[0]))), HEURISTICS['manhattan'])[0]
+    assert all(type(state) is PackedPuzzleState for state in packed_path)
+
+
+def test_idastar_matches_astar_on_larger_boards():
+    rng = random.Random(5)
+    for height, width in ((3, 4), (4, 4)):
+        heuristic = LinearConflict(height, width)
+        for _ in range(3):
+            tiles = random_walk_board(height, width, 30, rng)
+            problem = PackedPuzzleProblem(PuzzleState(rows(tiles, width)))
+            path = idastar(problem, heuristic)[0]
+            assert_valid_path(path, tiles, list(range(height * width)), width)
+            assert len(path) == len(astar(problem, heuristic)[0])
+
+
+def test_goal_board_is_its_own_path():
+    path, explored_states_count, _ = idastar(PackedPuzzleProblem(PuzzleState(rows(list(range(9))))),
+                                             HEURISTICS['manhattan'])
+    assert len(path) == 1 and explored_states_count == 1
+
+
+def test_idastar_rejects_unsolvable_and_other_problems():
+    with pytest.raises(UnsolvableError):
+        idastar(PackedPuzzleProblem(PuzzleState([[2, 1, 3], [4, 5, 6], [7, 8, 0]])), HEURISTICS['manhattan'])
+    with pytest.raises(TypeError):
+        idastar(object(), HEURISTICS['manhattan'])
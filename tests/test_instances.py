@@ -0,0 +1,61 @@
+import io
+import itertools
+import json
+import random
+
+from puzzle import PuzzleState, count_inversions, is_solvable, get_board_tables
+from distance_table import build_table, rank_permutation, UNVISITED
+from instances import random_walk_board, random_walk_instances, table_instances, write_binary, write_jsonl, \
+    read_binary
+
+
+def test_count_inversions():
+    rng = random.Random(0)
+    for size in (0, 1, 2, 9, 16, 33):
+        values = list(range(size))
+        rng.shuffle(values)
+        assert count_inversions(values) == sum(a > b for a, b in itertools.combinations(values, 2))
+
+
+def test_is_solvable_matches_reachability():
+    # The boards a BFS from the goal reaches are exactly the solvable ones, half of all boards
+    table = build_table(2, 3)
+    solvable = 0
+    for tiles in itertools.permutations(range(6)):
+        if is_solvable(tiles, 3):
+            solvable += 1
+            assert table[rank_permutation(list(tiles), 6)] != UNVISITED
+    assert solvable == len(table)
+
+
+def test_random_walk_boards_are_solvable(distance_table):
+    rng = random.Random(1)
+    for steps in (0, 1, 10, 100):
+        tiles = random_walk_board(3, 3, steps, rng)
+        assert is_solvable(tiles, 3)
+        assert distance_table.distance(PuzzleState([tiles[i: i + 3] for i in range(0, 9, 3)])) <= steps
+
+
+def test_generated_depths(distance_table):
+    tables = get_board_tables(3, 3)
+    for packed, depth in itertools.islice(random_walk_instances(3, 3, 5, 20, seed=2), 50):
+        tiles = tables.unpack(packed)
+        assert 5 <= depth <= 20 and is_solvable(tiles, 3)
+        assert distance_table.distance(PuzzleState([tiles[i: i + 3] for i in range(0, 9, 3)])) <= depth
+    for packed, depth in itertools.islice(table_instances(distance_table, 24, 26, seed=3), 20):
+        tiles = tables.unpack(packed)
+        assert 24 <= depth <= 26
+        assert distance_table.distance(PuzzleState([tiles[i: i + 3] for i in range(0, 9, 3)])) == depth
+
+
+def test_instance_files_round_trip():
+    tables = get_board_tables(4, 4)
+    instances = list(itertools.islice(random_walk_instances(4, 4, 10, 60, seed=4), 20))
+    stream = io.BytesIO()
+    assert write_binary(stream, 4, 4, instances, False) == len(instances)
+    stream.seek(0)
+    assert [(tables.pack(tiles), depth) for _, _, tiles, depth in read_binary(stream)] == instances
+    text = io.StringIO()
+    write_jsonl(text, 4, 4, instances, False)
+    records = [json.loads(line) for line in text.getvalue().splitlines()]
+    assert [(tables.pack(record['tiles']), record['depth']) for record in records] == instances
@@ -0,0 +1,76 @@
+import io
+import json
+import sys
+
+import pytest
+
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem
+from heuristic import ManhattanDistance, state_tiles
+from search import astar, idastar, bidirectional_bfs, bidirectional_astar, anytime_astar
+from instrumentation import PHASES, SearchObserver, JsonlObserver, max_rss_kb, prometheus_snapshot
+from conftest import BOARDS, rows
+
+MANHATTAN = ManhattanDistance(3, 3)
+PROBLEM_TYPES = {'packed': PackedPuzzleProblem, 'plain': PuzzleProblem}
+SEARCHES = {
+    'astar': lambda problem, observer: astar(problem, MANHATTAN, observer=observer),
+    'idastar': lambda problem, observer: idastar(problem, MANHATTAN, observer=observer),
+    'bidirectional_bfs': lambda problem, observer: bidirectional_bfs(problem, observer=observer),
+    'bidirectional_astar': lambda problem, observer: bidirectional_astar(problem, MANHATTAN, observer=observer),
+}
+
+
+@pytest.mark.parametrize('kind', sorted(PROBLEM_TYPES))
+@pytest.mark.parametrize('name', sorted(SEARCHES))
+def test_observer_does_not_change_the_search(name, kind):
+    search = SEARCHES[name]
+    problem = PROBLEM_TYPES[kind](PuzzleState(rows(BOARDS[0])))
+    path, explored_states_count, _ = search(problem, None)
+    observer = SearchObserver()
+    observed_path, observed_count, _ = search(problem, observer)
+    assert [state_tiles(state) for state in observed_path] == [state_tiles(state) for state in path]
+    assert observed_count == explored_states_count
+    event = observer.events[-1]
+    assert event['final'] and event['expansions'] == explored_states_count
+    assert 0 <= event['duplicates'] <= event['generated']
+    if name != 'idastar':
+        assert event['closed_size'] <= event['expansions']
+        assert event['closed_size'] + event['frontier_size'] <= event['generated'] + 2
+
+
+def test_observer_counts_anytime_reopenings():
+    observer = SearchObserver()
+    results = list(anytime_astar(PackedPuzzleProblem(PuzzleState(rows(BOARDS[0]))), MANHATTAN, observer=observer))
+    assert results[-1][1] == 1.0
+    event = observer.events[-1]
+    assert event['final'] and event['expansions'] == results[-1][2]['expansions']
+    assert event['reopened'] >= 0
+
+
+def test_jsonl_observer_streams_samples():
+    stream = io.StringIO()
+    observer = JsonlObserver(stream, sample_every=10)
+    astar(PackedPuzzleProblem(PuzzleState(rows(BOARDS[0]))), MANHATTAN, observer=observer)
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(events) > 1 and events[-1]['final'] and not observer.events
+    assert [event['expansions'] for event in events] == sorted(event['expansions'] for event in events)
+    assert set(events[-1]['phases']) == set(PHASES)
+
+
+def test_prometheus_snapshot():
+    observer = SearchObserver()
+    astar(PackedPuzzleProblem(PuzzleState(rows(BOARDS[0]))), MANHATTAN, observer=observer)
+    snapshot = prometheus_snapshot(observer)
+    assert 'search_expansions_total{algorithm="astar"} %d' % observer.expansions in snapshot
+    assert 'search_max_rss_kilobytes' in snapshot
+
+
+def test_memory_is_none_without_the_resource_module(monkeypatch):
+    assert max_rss_kb() > 0
+    # A None entry makes the import fail, as on platforms without the module
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    assert max_rss_kb() is None
+    observer = SearchObserver()
+    astar(PackedPuzzleProblem(PuzzleState(rows(BOARDS[0]))), MANHATTAN, observer=observer)
+    assert observer.events[-1]['max_rss_kb'] is None
+    assert 'search_max_rss_kilobytes' not in prometheus_snapshot(observer)
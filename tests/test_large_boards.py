@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+import large_boards
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem
+from heuristic import ManhattanDistance, LinearConflict
+from instances import random_walk_board
+from search import beam_search
+from large_boards import PlacementProblem, reduction_solve, suboptimality
+from conftest import BOARDS, rows, assert_valid_path
+
+
+@pytest.mark.parametrize('height,width', [(2, 2), (3, 3), (2, 5), (4, 4), (3, 6), (6, 6)])
+def test_reduction_solve_finds_valid_paths(height, width):
+    rng = random.Random(height * 10 + width)
+    for _ in range(3):
+        tiles = random_walk_board(height, width, 400, rng)
+        path, explored_states_count, depth = reduction_solve(PackedPuzzleProblem(PuzzleState(rows(tiles, width))))
+        assert_valid_path(path, tiles, list(range(height * width)), width)
+        assert depth == len(path) - 1
+        assert explored_states_count > 0
+        assert suboptimality(path, LinearConflict(height, width)(path[0])) >= 1.0
+
+
+def test_reduction_solve_keeps_the_final_region_optimal(distance_table):
+    tiles = random_walk_board(3, 3, 40, random.Random(1))
+    path = reduction_solve(PackedPuzzleProblem(PuzzleState(rows(tiles))))[0]
+    assert len(path) - 1 == distance_table.distance(PuzzleState(rows(tiles)))
+
+
+def test_placement_never_enters_locked_cells():
+    tables = PackedPuzzleProblem(PuzzleState(rows(list(range(9))))).get_initial_state().tables
+    locked = bytearray(9)
+    locked[3] = 1
+    placement = PlacementProblem(tables, 0, [4], [8], locked)
+    assert [state[0] for state, _, _ in placement.get_neighbors(placement.get_initial_state())] == [1]
+
+
+def test_failed_placement_raises(monkeypatch):
+    original = large_boards.astar
+
+    def astar(problem, heuristic):
+        if isinstance(problem, PlacementProblem):
+            return [], 1, 0
+        return original(problem, heuristic)
+
+    monkeypatch.setattr(large_boards, 'astar', astar)
+    tiles = random_walk_board(4, 4, 100, random.Random(0))
+    with pytest.raises(RuntimeError):
+        reduction_solve(PackedPuzzleProblem(PuzzleState(rows(tiles, 4))))
+
+
+@pytest.mark.parametrize('kind', [PackedPuzzleProblem, PuzzleProblem])
+def test_beam_search_finds_valid_paths(distance_table, kind):
+    for tiles in BOARDS:
+        problem = kind(PuzzleState(rows(tiles)))
+        path, explored_states_count, depth = beam_search(problem, ManhattanDistance(3, 3), 100)
+        assert_valid_path(path, tiles, list(range(9)))
+        assert len(path) - 1 >= distance_table.distance(PuzzleState(rows(tiles)))
+        # Each depth expands at most the beam
+        assert explored_states_count <= 100 * (depth + 1)
+
+
+def test_beam_search_on_large_boards():
+    tiles = random_walk_board(6, 6, 300, random.Random(3))
+    path = beam_search(PackedPuzzleProblem(PuzzleState(rows(tiles, 6))), LinearConflict(6, 6), 50)[0]
+    assert_valid_path(path, tiles, list(range(36)), 6)
+
+
+def test_beam_search_gives_up_past_max_depth():
+    tiles = random_walk_board(4, 4, 200, random.Random(4))
+    problem = PackedPuzzleProblem(PuzzleState(rows(tiles, 4)))
+    path, _, depth = beam_search(problem, ManhattanDistance(4, 4), 1, max_depth=3)
+    assert path == [] and depth <= 3
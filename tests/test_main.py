@@ -0,0 +1,72 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+from batch import board_problem, read_boards, read_binary_boards, read_json_boards, write_binary_boards
+from conftest import BOARDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_main(arguments, data):
+    process = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py')] + arguments, input=data,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=120, check=True)
+    return [json.loads(line) for line in process.stdout.decode().splitlines()], process.stderr.decode()
+
+
+def test_readers_report_bad_lines_in_place():
+    lines = ['1 2 0 3 4 5 6 7 8', '1 2 3', '1,1,2,3,4,5,6,7,8', 'x', '', '0 1 2 3 4 5 6 7 8']
+    results = list(read_boards(lines, 3))
+    assert [isinstance(result, ValueError) for result in results] == [False, True, True, True, False]
+    records = [json.dumps(BOARDS[0]), json.dumps({'id': 'a', 'tiles': [[1, 0], [2, 3]]}), '{"id": "b"}',
+               json.dumps({'id': 'c', 'tiles': [[1, 0], [2]]}), 'not json', json.dumps([0, 1, 2, 3, 4, 5, 6, 7, 9]),
+               json.dumps({'id': 'd', 'tiles': [0, 1, 2, 3], 'width': 2, 'goal': [1, 2, 3, 0]})]
+    results = list(read_json_boards(records, 3))
+    assert [board_id for board_id, _ in results] == [None, 'a', 'b', 'c', None, None, 'd']
+    assert [isinstance(problem, ValueError) for _, problem in results] == [False, False, True, True, True, True, False]
+
+
+def test_binary_boards_round_trip():
+    problems = [board_problem(tiles, 3) for tiles in BOARDS] + [board_problem([1, 0, 2, 3], 2)]
+    stream = io.BytesIO()
+    assert write_binary_boards(stream, problems) == len(problems)
+    stream.seek(0)
+    assert [problem.query.state for problem in read_binary_boards(stream)] == [p.query.state for p in problems]
+    # An invalid board is reported in place, a truncated one ends the stream
+    stream = io.BytesIO(bytes([2, 2, 1, 1, 2, 3]) + bytes([2, 2, 0, 1, 2, 3]) + bytes([3, 3, 0]))
+    results = list(read_binary_boards(stream))
+    assert [isinstance(result, ValueError) for result in results] == [True, False, True]
+
+
+def test_cli_streams_jsonl_results(distance_table):
+    lines = [json.dumps({'id': 'first', 'tiles': BOARDS[0]}), json.dumps(BOARDS[1]), 'not json',
+             json.dumps([2, 1, 3, 4, 5, 6, 7, 8, 0])]
+    records, summary = run_main(['--algorithm', 'idastar'], ('\n'.join(lines) + '\n').encode())
+    assert [record['index'] for record in records] == [0, 1, 2, 3]
+    assert records[0]['id'] == 'first' and 'id' not in records[1]
+    assert [record['status'] for record in records] == ['solved', 'solved', 'error', 'unsolvable']
+    for tiles, record in zip(BOARDS, records[:2]):
+        assert record['cost'] == len(record['moves']) == distance_table.distance(board_problem(tiles, 3).puzzle)
+    assert records[3]['cost'] is None
+    assert summary.startswith('Solved 2 of 4 boards (1 errors)')
+
+
+def test_cli_reads_text_and_binary_boards():
+    text = '\n'.join(' '.join(map(str, tiles)) for tiles in BOARDS[:2]) + '\n'
+    text_records, _ = run_main(['--format', 'text', '--workers', '2'], text.encode())
+    stream = io.BytesIO()
+    write_binary_boards(stream, [board_problem(tiles, 3) for tiles in BOARDS[:2]])
+    binary_records, _ = run_main(['--format', 'binary'], stream.getvalue())
+    # Workers answer in completion order
+    text_records.sort(key=lambda record: record['index'])
+    assert [record['cost'] for record in text_records] == [record['cost'] for record in binary_records]
+
+
+def test_cli_does_not_import_the_visualizer():
+    # pygame is only needed by --show
+    process = subprocess.run([sys.executable, '-X', 'importtime', os.path.join(ROOT, 'main.py')], input=b'',
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=120, check=True)
+    imported = [line.split('|')[-1].strip() for line in process.stderr.decode().splitlines() if '|' in line]
+    assert 'batch' in imported and 'pygame' not in imported
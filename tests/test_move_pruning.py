@@ -0,0 +1,62 @@
+import pytest
+
+from puzzle import PuzzleProblem, PuzzleState, PackedPuzzleProblem
+from heuristic import ManhattanDistance
+from search import bfs, astar, idastar, bidirectional_bfs, bidirectional_astar
+from move_pruning import MovePruning, redundant_sequences, get_move_pruning
+from conftest import BOARDS, rows
+
+MANHATTAN = ManhattanDistance(3, 3)
+PROBLEM_TYPES = {'packed': PackedPuzzleProblem, 'plain': PuzzleProblem}
+
+
+def test_depth_two_only_drops_inverse_moves():
+    pruning = MovePruning(3, 3)
+    assert all(len(sequence) == 2 for sequence in redundant_sequences(3, 3, 2))
+    assert pruning.stats()['patterns'] == len(redundant_sequences(3, 3, 2))
+    # From the corner start state both moves are allowed, after a move its inverse is not
+    assert len(pruning.moves[0]) == 2
+    for _, _, state in pruning.moves[0]:
+        assert len(pruning.moves[state]) == len(pruning.moves[pruning.blanks[state]]) - 1
+
+
+def test_deeper_automata_find_longer_sequences():
+    sequences = redundant_sequences(3, 3, 8)
+    assert max(len(sequence) for sequence in sequences) == 8
+    assert get_move_pruning(3, 3, 8) is get_move_pruning(3, 3, 8)
+
+
+@pytest.mark.parametrize('kind', sorted(PROBLEM_TYPES))
+@pytest.mark.parametrize('tiles', BOARDS[:3])
+def test_pruning_keeps_optimal_paths(distance_table, tiles, kind):
+    optimal = distance_table.distance(PuzzleState(rows(tiles)))
+    problem = PROBLEM_TYPES[kind](PuzzleState(rows(tiles)))
+    pruning = get_move_pruning(3, 3)
+    deep_pruning = get_move_pruning(3, 3, 8)
+    assert len(astar(problem, MANHATTAN, pruning=pruning)[0]) - 1 == optimal
+    assert len(bidirectional_astar(problem, MANHATTAN, pruning=pruning)[0]) - 1 == optimal
+    assert len(bidirectional_bfs(problem, pruning=deep_pruning)[0]) - 1 == optimal
+    assert len(idastar(problem, MANHATTAN, pruning=deep_pruning)[0]) - 1 == optimal
+    if kind == 'packed':
+        assert len(bfs(problem, pruning=deep_pruning)[0]) - 1 == optimal
+
+
+def test_deep_pruning_is_refused_by_best_first_searches():
+    problem = PackedPuzzleProblem(PuzzleState(rows(BOARDS[0])))
+    with pytest.raises(ValueError):
+        astar(problem, MANHATTAN, pruning=get_move_pruning(3, 3, 8))
+
+
+@pytest.mark.parametrize('search', [
+    lambda problem, pruning: astar(problem, MANHATTAN, pruning=pruning),
+    lambda problem, pruning: idastar(problem, MANHATTAN, pruning=pruning),
+    lambda problem, pruning: bidirectional_bfs(problem, pruning=pruning),
+])
+def test_counters_describe_the_latest_search(search):
+    pruning = get_move_pruning(3, 3)
+    problem = PackedPuzzleProblem(PuzzleState(rows(BOARDS[0])))
+    search(problem, pruning)
+    first = pruning.stats()
+    assert first['expansions'] > 0 and first['pruned'] > 0
+    search(problem, pruning)
+    assert pruning.stats() == first
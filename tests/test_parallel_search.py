@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from puzzle import PuzzleState, PackedPuzzleProblem
+from heuristic import ManhattanDistance
+from parallel_search import hdastar
+from conftest import BOARDS, rows, assert_valid_path
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('tiles', BOARDS[:3])
+def test_hdastar_is_optimal(distance_table, tiles, workers):
+    path, explored_states_count, _ = hdastar(PackedPuzzleProblem(PuzzleState(rows(tiles))), ManhattanDistance(3, 3),
+                                             workers)
+    assert_valid_path(path, tiles, list(range(9)))
+    assert len(path) - 1 == distance_table.distance(PuzzleState(rows(tiles)))
+    assert explored_states_count > 0
+
+
+class FailingHeuristic:
+    # Works in the process that made it and raises in the workers
+
+    def __init__(self):
+        self.pid = os.getpid()
+
+    def __call__(self, state):
+        if os.getpid() != self.pid:
+            raise RuntimeError('heuristic failure')
+        return 0
+
+
+def test_dead_worker_is_reported():
+    with pytest.raises(RuntimeError, match='died'):
+        hdastar(PackedPuzzleProblem(PuzzleState(rows(BOARDS[0]))), FailingHeuristic(), 2)
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from puzzle import PuzzleState, PackedPuzzleProblem
+from heuristic import ManhattanDistance
+from pattern_database import (HEADER, PatternDatabase, build_table, load_table, parse_partition, rank_positions,
+                              table_entries, table_path, unrank_positions)
+from conftest import BOARDS, rows
+
+SPLIT = [(1, 2, 3, 4), (5, 6, 7, 8)]
+
+
+def packed(tiles):
+    return PackedPuzzleProblem(PuzzleState(rows(tiles))).get_initial_state()
+
+
+def test_ranks_are_dense_and_invertible():
+    ranks = set()
+    for rank in range(table_entries(6, 3)):
+        positions = unrank_positions(rank, 6, 3)
+        assert len(set(positions)) == 3 and rank_positions(positions, 6) == rank
+        ranks.add(rank)
+    assert len(ranks) == 6 * 5 * 4
+
+
+def test_full_pattern_gives_exact_distances(distance_table):
+    pdb = PatternDatabase(3, 3)
+    for tiles in BOARDS:
+        assert pdb(packed(tiles)) == pdb(PuzzleState(rows(tiles))) == distance_table.distance(packed(tiles))
+    assert pdb(packed(list(range(9)))) == 0
+
+
+def test_additive_patterns_are_admissible_and_beat_manhattan(distance_table, tmp_path):
+    pdb = PatternDatabase(3, 3, SPLIT, str(tmp_path))
+    manhattan = ManhattanDistance(3, 3)
+    for tiles in BOARDS:
+        state = packed(tiles)
+        assert manhattan(state) <= pdb(state) <= distance_table.distance(state)
+        for next_state, _, _ in state.get_neighbors():
+            assert manhattan(next_state) <= pdb(next_state) <= distance_table.distance(next_state)
+    pdb.close()
+
+
+def test_transposed_patterns_share_a_table(tmp_path):
+    # On the 3x3 board tiles 3 and 6 sit on the transposed goal cells of tiles 1 and 2
+    pdb = PatternDatabase(3, 3, [(1, 2), (3, 6)], str(tmp_path))
+    assert len(pdb.tables) == 1 and len(os.listdir(str(tmp_path))) == 1
+    tables = {pattern: build_table(3, 3, pattern) for pattern in ((1, 2), (3, 6))}
+    for tiles in BOARDS:
+        expected = sum(tables[pattern][rank_positions([tiles.index(tile) for tile in pattern], 9)]
+                       for pattern in tables)
+        assert pdb(packed(tiles)) == expected
+    pdb.close()
+
+
+def test_tables_are_persisted_and_checked(tmp_path):
+    directory = str(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        PatternDatabase(3, 3, SPLIT, directory, build=False)
+    PatternDatabase(3, 3, SPLIT, directory).close()
+    pdb = PatternDatabase(3, 3, SPLIT, directory, build=False)
+    assert pdb(packed(BOARDS[0])) > 0
+    pdb.close()
+    path = table_path(3, 3, SPLIT[0], directory)
+    assert os.path.getsize(path) == HEADER.size + table_entries(9, 4)
+    with pytest.raises(ValueError):
+        load_table(path, 3, 3, SPLIT[1])
+
+
+def test_parse_partition():
+    assert parse_partition('1,2,3/4,5') == [(1, 2, 3), (4, 5)]
@@ -0,0 +1,49 @@
+import pytest
+
+from puzzle import (PuzzleProblem, PuzzleState, PackedPuzzleProblem, PackedPuzzleState, get_board_tables,
+                    path_moves)
+from heuristic import state_tiles
+from conftest import BOARDS, rows
+
+
+@pytest.mark.parametrize('height,width', [(2, 2), (3, 3), (4, 4), (5, 5), (3, 7)])
+def test_pack_round_trip(height, width):
+    tables = get_board_tables(height, width)
+    assert get_board_tables(height, width) is tables
+    tiles = list(range(height * width))[::-1]
+    assert tables.unpack(tables.pack(tiles)) == tiles
+    assert 1 << tables.bits >= height * width
+
+
+@pytest.mark.parametrize('tiles', BOARDS)
+def test_packed_states_move_like_plain_ones(tiles):
+    plain = PuzzleState(rows(tiles))
+    packed = PackedPuzzleState.from_board(rows(tiles))
+    assert packed.state == plain.state and packed.empty_pos == plain.empty_pos and packed.blank == plain.blank
+    assert str(packed) == str(plain)
+    plain_neighbors, packed_neighbors = plain.get_neighbors(), packed.get_neighbors()
+    # Same successors in the same order
+    assert [(state.state, move, cost) for state, move, cost in plain_neighbors] == \
+        [(state.state, move, cost) for state, move, cost in packed_neighbors]
+    for state, move, _ in packed_neighbors:
+        assert packed.next_state(move) == state and hash(packed.next_state(move)) == hash(state)
+    assert len({state for state, _, _ in packed_neighbors} | {packed}) == len(packed_neighbors) + 1
+
+
+def test_invalid_moves_are_rejected():
+    corner = PackedPuzzleState.from_board(rows(list(range(9))))
+    for move in ('N', 'W', 'X'):
+        with pytest.raises(ValueError):
+            corner.next_state(move)
+    with pytest.raises(ValueError):
+        PuzzleState(rows(list(range(9)))).next_state('X')
+
+
+def test_packed_problem_and_path_moves():
+    problem = PackedPuzzleProblem(PuzzleState([[1, 0, 2], [3, 4, 5], [6, 7, 8]]))
+    start = problem.get_initial_state()
+    assert isinstance(start, PackedPuzzleState) and not problem.is_goal_state(start)
+    goal = start.next_state('W')
+    assert problem.is_goal_state(goal) and goal == problem.get_goal_state()
+    assert path_moves([start, goal]) == 'W'
+    assert state_tiles(PuzzleProblem(PuzzleState(rows(BOARDS[0]))).get_initial_state()) == BOARDS[0]
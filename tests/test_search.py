@@ -0,0 +1,66 @@
+import pytest
+
+from puzzle import MOVE_CODES, PuzzleProblem, PuzzleState, PackedPuzzleProblem, UnsolvableError
+from heuristic import ManhattanDistance, LinearConflict, state_tiles
+from search import NodeTable, bfs, dfs, ucs, astar
+from move_pruning import get_move_pruning
+from conftest import BOARDS, rows, assert_valid_path
+
+MANHATTAN = ManhattanDistance(3, 3)
+OPTIMAL_SOLVERS = {
+    'bfs': lambda problem: bfs(problem),
+    'ucs': lambda problem: ucs(problem, integer_priorities=True),
+    'astar': lambda problem: astar(problem, MANHATTAN),
+    'astar_buckets': lambda problem: astar(problem, LinearConflict(3, 3), integer_priorities=True),
+}
+PROBLEM_TYPES = {'packed': PackedPuzzleProblem, 'plain': PuzzleProblem}
+
+
+@pytest.mark.parametrize('kind', sorted(PROBLEM_TYPES))
+@pytest.mark.parametrize('name', sorted(OPTIMAL_SOLVERS))
+@pytest.mark.parametrize('tiles', BOARDS)
+def test_optimal_solvers_match_distance_table(distance_table, tiles, name, kind):
+    if name in ('bfs', 'ucs') and kind == 'plain':
+        pytest.skip('covered on packed boards, too slow on plain ones')
+    problem = PROBLEM_TYPES[kind](PuzzleState(rows(tiles)))
+    path = OPTIMAL_SOLVERS[name](problem)[0]
+    assert_valid_path(path, tiles, list(range(9)))
+    assert len(path) - 1 == distance_table.distance(PuzzleState(rows(tiles)))
+
+
+@pytest.mark.parametrize('tiles', BOARDS[:2])
+def test_dfs_finds_valid_paths(tiles):
+    problem = PackedPuzzleProblem(PuzzleState(rows(tiles)))
+    assert_valid_path(dfs(problem)[0], tiles, list(range(9)))
+
+
+def test_unsolvable_board_is_rejected():
+    problem = PackedPuzzleProblem(PuzzleState([[2, 1, 3], [4, 5, 6], [7, 8, 0]]))
+    for solver in (bfs, dfs, ucs):
+        with pytest.raises(UnsolvableError):
+            solver(problem)
+
+
+@pytest.mark.parametrize('tiles', BOARDS[:3])
+def test_node_table_searches_match_dict_searches(tiles):
+    # Packed problems run on a NodeTable; plain ones, given the same pruning, keep the dict-based bookkeeping
+    packed = PackedPuzzleProblem(PuzzleState(rows(tiles)))
+    plain = PuzzleProblem(PuzzleState(rows(tiles)))
+    pruning = get_move_pruning(3, 3)
+    for search in (lambda problem, **options: astar(problem, MANHATTAN, **options),
+                   lambda problem, **options: astar(problem, LinearConflict(3, 3), integer_priorities=True, **options)):
+        compact_path, compact_count, compact_depth = search(packed)
+        path, count, depth = search(plain, pruning=pruning)
+        assert [state_tiles(state) for state in compact_path] == [state_tiles(state) for state in path]
+        assert (compact_count, compact_depth) == (count, depth)
+
+
+def test_node_table_rebuilds_paths_from_move_codes():
+    start = PackedPuzzleProblem(PuzzleState(rows(BOARDS[0]))).get_initial_state()
+    nodes = NodeTable(start.tables)
+    node = nodes.add(start.packed, start.blank, 0, -1, 0, 0)
+    path = [start]
+    for g, move in enumerate('ES', 1):
+        path.append(path[-1].next_state(move))
+        node = nodes.add(path[-1].packed, path[-1].blank, 0, node, MOVE_CODES[move], g)
+    assert nodes.path(node, start) == path and nodes.index[path[-1].packed] == node
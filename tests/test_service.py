@@ -0,0 +1,124 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from puzzle import PuzzleState, GoalRelabeling, snake_goal
+from heuristic import state_tiles
+from benchmark import corpus_korf100
+from service import SolverService, percentile
+from conftest import BOARDS, rows
+
+HARD_BOARD = corpus_korf100()[0][4]
+
+
+@pytest.fixture(scope='module')
+def service():
+    service = SolverService(workers=1, max_queue=4)
+    yield service
+    service.close()
+
+
+def solve(service, *requests):
+    async def run():
+        return await asyncio.gather(*[service.solve(request) for request in requests])
+    return asyncio.run(run())
+
+
+def replay(tiles, moves, width: int=3):
+    state = PuzzleState(rows(tiles, width))
+    for move in moves:
+        state = state.next_state(move)
+    return state_tiles(state)
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile(list(range(1, 101)), 50) == 50
+    assert percentile(list(range(1, 101)), 99) == 99
+    assert percentile([7], 99) == 7
+
+
+def test_answers_are_optimal_paths(service, distance_table):
+    responses = solve(service, *[{'tiles': tiles} for tiles in BOARDS[:3]])
+    for tiles, response in zip(BOARDS, responses):
+        assert response['status'] == 'ok' and response['optimal'] and response['bound'] == 1.0
+        assert replay(tiles, response['moves']) == list(range(9))
+        assert response['cost'] == len(response['moves']) == distance_table.distance(PuzzleState(rows(tiles)))
+
+
+def test_named_goals_are_restored(service, distance_table):
+    goal = snake_goal(3, 3)
+    board = GoalRelabeling(goal, 3, 3).from_canonical(BOARDS[0])
+    response, = solve(service, {'tiles': board, 'goal': 'snake'})
+    assert response['status'] == 'ok'
+    assert replay(board, response['moves']) == goal
+    assert response['cost'] == distance_table.distance(PuzzleState(rows(BOARDS[0])))
+
+
+def test_bad_and_unsolvable_requests(service):
+    unsolvable, missing, duplicate = solve(service, {'tiles': [2, 1, 3, 4, 5, 6, 7, 8, 0]}, {'width': 3},
+                                           {'tiles': [0, 0, 1, 2], 'width': 2})
+    assert unsolvable['status'] == 'unsolvable'
+    assert missing['status'] == 'error' and duplicate['status'] == 'error'
+
+
+def test_identical_requests_are_coalesced(service):
+    before = service.counters['coalesced']
+    first, second = solve(service, {'tiles': BOARDS[3]}, {'tiles': BOARDS[3]})
+    assert first['status'] == second['status'] == 'ok' and first['moves'] == second['moves']
+    assert (first['coalesced'], second['coalesced']) == (False, True)
+    assert service.counters['coalesced'] == before + 1
+
+
+def test_deadlines_bound_the_latency(service):
+    start_time = time.time()
+    response, = solve(service, {'tiles': HARD_BOARD, 'width': 4, 'deadline_ms': 300})
+    assert time.time() - start_time < 5
+    assert response['status'] in ('ok', 'timeout')
+    if response['status'] == 'ok':
+        assert replay(HARD_BOARD, response['moves'], 4) == list(range(16))
+        assert response['bound'] >= 1.0
+
+
+def test_full_queue_rejects_requests():
+    service = SolverService(workers=1, max_queue=0)
+    try:
+        first, second = solve(service, {'tiles': HARD_BOARD, 'width': 4, 'deadline_ms': 300},
+                              {'tiles': BOARDS[0]})
+        assert second['status'] == 'rejected'
+        assert first['status'] in ('ok', 'timeout')
+    finally:
+        service.close()
+
+
+def test_socket_protocol_and_cancellation(service, tmp_path):
+    path = str(tmp_path / 'service.sock')
+
+    async def run():
+        server = await service.serve(unix=path)
+        reader, writer = await asyncio.open_unix_connection(path)
+        lines = ['not json', json.dumps([1, 2]), json.dumps({'id': 'a', 'tiles': BOARDS[4]}),
+                 json.dumps({'id': 'b', 'op': 'stats'})]
+        writer.write(''.join(line + '\n' for line in lines).encode())
+        responses = [json.loads(await reader.readline()) for _ in lines]
+        # A request still running when its connection closes is stopped
+        cancelled = service.counters['cancelled']
+        writer.write((json.dumps({'id': 'c', 'tiles': HARD_BOARD, 'width': 4}) + '\n').encode())
+        await asyncio.sleep(0.3)
+        writer.close()
+        await asyncio.sleep(0.3)
+        assert service.counters['cancelled'] == cancelled + 1
+        # The worker is free again for the next request
+        later = await asyncio.wait_for(service.solve({'tiles': BOARDS[5]}), 10)
+        server.close()
+        await server.wait_closed()
+        return responses, later
+
+    responses, later = asyncio.run(run())
+    by_id = {response.get('id'): response for response in responses}
+    assert [response['status'] for response in responses if 'id' not in response] == ['error', 'error']
+    assert by_id['a']['status'] == 'ok' and replay(BOARDS[4], by_id['a']['moves']) == list(range(9))
+    assert by_id['b']['received'] >= 1 and 'p50_ms' in by_id['b']
+    assert later['status'] == 'ok'
@@ -0,0 +1,50 @@
+import pytest
+
+from puzzle import PuzzleState, PackedPuzzleProblem, get_board_tables, transform_tiles, canonical_tiles
+from heuristic import ManhattanDistance, SymmetricMax, state_tiles
+from pattern_database import PatternDatabase
+from conftest import BOARDS, rows
+
+TABLES = get_board_tables(3, 3)
+TRANSPOSE = TABLES.symmetries[1][0]
+
+
+def packed(tiles, width: int=3):
+    return PackedPuzzleProblem(PuzzleState(rows(tiles, width))).get_initial_state()
+
+
+def test_only_square_boards_have_a_transpose():
+    assert len(TABLES.symmetries) == 2
+    assert len(get_board_tables(2, 3).symmetries) == 1
+    assert transform_tiles(list(range(9)), TRANSPOSE) == list(range(9))
+
+
+@pytest.mark.parametrize('tiles', BOARDS)
+def test_symmetric_boards_share_their_canonical_board_and_distance(distance_table, tiles):
+    image = transform_tiles(tiles, TRANSPOSE)
+    assert transform_tiles(image, TRANSPOSE) == tiles
+    assert distance_table.distance(PuzzleState(rows(image))) == distance_table.distance(PuzzleState(rows(tiles)))
+    canonical, _ = canonical_tiles(tiles, TABLES)
+    assert canonical_tiles(image, TABLES)[0] == canonical
+    row, column = divmod(canonical.index(0), 3)
+    assert row <= column
+    assert state_tiles(PuzzleState(rows(tiles)).canonical()) == canonical
+    assert packed(tiles).canonical() == packed(canonical)
+
+
+def test_rectangular_boards_are_their_own_canonical_board():
+    state = packed([1, 2, 0, 3, 4, 5], 3)
+    assert state.canonical() is state
+
+
+def test_symmetric_max_is_admissible_and_not_weaker(distance_table):
+    pdb = PatternDatabase(3, 3)
+    heuristic = SymmetricMax(pdb, 3, 3)
+    for tiles in BOARDS:
+        state = packed(tiles)
+        h = heuristic(state)
+        assert max(pdb(state), pdb(packed(transform_tiles(tiles, TRANSPOSE)))) == h
+        assert h <= distance_table.distance(state)
+        for next_state, _, _ in state.get_neighbors():
+            assert abs(heuristic(next_state) - h) <= 1
+    assert SymmetricMax(ManhattanDistance(3, 3), 3, 3)(packed(list(range(9)))) == 0
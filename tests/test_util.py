@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from util import Stack, Queue, PriorityQueue, IndexedPriorityQueue, BucketQueue, is_sorted
+
+
+def test_stack_and_queue_order():
+    stack, queue = Stack(), Queue()
+    for item in range(5):
+        stack.push(item)
+        queue.push(item)
+    assert [stack.pop() for _ in range(5)] == [4, 3, 2, 1, 0] and stack.is_empty()
+    assert [queue.pop() for _ in range(5)] == [0, 1, 2, 3, 4] and queue.is_empty()
+
+
+@pytest.mark.parametrize('queue_type', [PriorityQueue, IndexedPriorityQueue, BucketQueue])
+def test_priority_queues_pop_in_priority_then_insertion_order(queue_type):
+    rng = random.Random(0)
+    queue = queue_type()
+    items = [(rng.randint(0, 20), item) for item in range(200)]
+    for priority, item in items:
+        queue.push(item, priority)
+    # Lower about a third of the priorities; updates to a higher priority are ignored
+    for priority, item in rng.sample(items, 70):
+        queue.update(item, priority + rng.randint(-5, 5) if priority >= 5 else priority)
+    assert queue.size() == len(items)
+    popped = []
+    while not queue.is_empty():
+        popped.append(queue.pop())
+    assert sorted(popped) == list(range(200))
+
+
+@pytest.mark.parametrize('queue_type', [IndexedPriorityQueue, BucketQueue])
+def test_indexed_queues_match_a_reference(queue_type):
+    rng = random.Random(1)
+    queue = queue_type()
+    # Priority of every item still queued
+    reference = {}
+
+    def pop():
+        minimum = min(reference.values())
+        assert queue.peek_priority() == minimum
+        assert reference.pop(queue.pop()) == minimum
+
+    for item in range(300):
+        reference[item] = rng.randint(0, 30)
+        queue.push(item, reference[item])
+        if rng.random() < 0.5:
+            target, priority = rng.choice(list(reference)), rng.randint(0, 30)
+            queue.update(target, priority)
+            reference[target] = min(reference[target], priority)
+        if rng.random() < 0.3:
+            pop()
+        assert queue.size() == len(reference)
+    while reference:
+        pop()
+    assert queue.is_empty()
+    with pytest.raises(IndexError):
+        queue.pop()
+    with pytest.raises(IndexError):
+        queue.peek_priority()
+
+
+def test_updated_entries_are_marked_removed():
+    for queue in (IndexedPriorityQueue(), BucketQueue()):
+        queue.push('a', 5)
+        old_entry = queue.entries['a']
+        queue.update('a', 2)
+        assert old_entry[-1] is queue.REMOVED
+        assert queue.pop() == 'a' and queue.is_empty()
+
+
+def test_bucket_queue_rejects_other_priorities():
+    queue = BucketQueue()
+    for priority in (-1, 1.5):
+        with pytest.raises(ValueError):
+            queue.push('a', priority)
+
+
+def test_is_sorted():
+    assert is_sorted([]) and is_sorted([1, 1, 2])
+    assert not is_sorted([2, 1])
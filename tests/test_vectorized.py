@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from puzzle import PuzzleState, PackedPuzzleProblem, UnsolvableError
+from heuristic import ManhattanDistance, LinearConflict
+from vectorized import (get_board_arrays, encode, decode, expand_batch, manhattan_batch, linear_conflict_batch,
+                        layered_bfs, batched_astar)
+from conftest import BOARDS, rows, assert_valid_path
+
+ARRAYS = get_board_arrays(3, 3)
+
+
+def test_keys_round_trip_and_match_packed_states():
+    boards = np.array(BOARDS, dtype=np.uint8)
+    keys = encode(boards, ARRAYS)
+    assert (decode(keys, ARRAYS) == boards).all()
+    for tiles, key in zip(BOARDS, keys):
+        assert int(key) == PackedPuzzleProblem(PuzzleState(rows(tiles))).get_initial_state().packed
+
+
+def test_batch_heuristics_match_scalar_ones():
+    boards = np.array(BOARDS, dtype=np.uint8)
+    manhattan, linear_conflict = ManhattanDistance(3, 3), LinearConflict(3, 3)
+    assert manhattan_batch(boards, ARRAYS).tolist() == [manhattan(PuzzleState(rows(tiles))) for tiles in BOARDS]
+    assert linear_conflict_batch(boards, ARRAYS).tolist() == \
+        [linear_conflict(PuzzleState(rows(tiles))) for tiles in BOARDS]
+
+
+def test_expand_batch_matches_neighbors():
+    states = [PackedPuzzleProblem(PuzzleState(rows(tiles))).get_initial_state() for tiles in BOARDS]
+    keys = np.array([state.packed for state in states], dtype=np.uint64)
+    child_keys, child_boards, parent_index = expand_batch(keys, ARRAYS)
+    assert (encode(child_boards, ARRAYS) == child_keys).all()
+    for i, state in enumerate(states):
+        expected = sorted(next_state.packed for next_state, _, _ in state.get_neighbors())
+        assert sorted(int(key) for key in child_keys[parent_index == i]) == expected
+
+
+@pytest.mark.parametrize('tiles', BOARDS)
+def test_vectorized_searches_are_optimal(distance_table, tiles):
+    optimal = distance_table.distance(PuzzleState(rows(tiles)))
+    problem = PackedPuzzleProblem(PuzzleState(rows(tiles)))
+    path = layered_bfs(problem)[0]
+    assert_valid_path(path, tiles, list(range(9)))
+    assert len(path) - 1 == optimal
+    for heuristic, batch_size in (('manhattan', 4096), ('linear_conflict', 64), ('manhattan', 1)):
+        path = batched_astar(problem, heuristic, batch_size)[0]
+        assert_valid_path(path, tiles, list(range(9)))
+        assert len(path) - 1 == optimal
+
+
+def test_vectorized_searches_reject_bad_problems():
+    with pytest.raises(UnsolvableError):
+        batched_astar(PackedPuzzleProblem(PuzzleState([[2, 1, 3], [4, 5, 6], [7, 8, 0]])))
+    with pytest.raises(ValueError):
+        get_board_arrays(5, 5)
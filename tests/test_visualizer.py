@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame = pytest.importorskip('pygame')
+
+import visualizer
+from visualizer import (Visualizer, get_puzzle_states, ANIMATION_SPEED, TILE_SIZE, OFFSET_BETWEEN_TILES,
+                        SOLVING_MESSAGE, SOLVED_MESSAGE)
+
+# Frames of one sliding tile, as drawn by Visualizer._slide_animation
+FRAMES_PER_MOVE = len(range(ANIMATION_SPEED, TILE_SIZE + OFFSET_BETWEEN_TILES, ANIMATION_SPEED)) + 1
+
+
+def redrawn(path, board, message):
+    # The whole board drawn from scratch on a separate headless surface
+    reference = Visualizer(path)
+    reference._init_headless()
+    reference._draw_board(board.state, message)
+    return pygame.image.tobytes(reference._display_surf, 'RGB')
+
+
+def test_headless_frames_match_full_redraws():
+    path = get_puzzle_states()
+    frames = [pygame.image.tobytes(surface, 'RGB') for surface in Visualizer(path).frames()]
+    assert len(frames) == 2 + (len(path) - 1) * FRAMES_PER_MOVE
+    assert frames[0] == redrawn(path, path[0], SOLVING_MESSAGE)
+    # The dirty rectangles of each slide leave the surface equal to the next board drawn in full
+    for move, board in enumerate(path[1:], 1):
+        assert frames[move * FRAMES_PER_MOVE] == redrawn(path, board, SOLVING_MESSAGE)
+    assert frames[-1] == redrawn(path, path[-1], SOLVED_MESSAGE)
+
+
+def test_sprites_are_rendered_once_per_tile():
+    view = Visualizer(get_puzzle_states())
+    for _ in view.frames():
+        pass
+    assert sorted(tile for tile, _ in view._sprites) == list(range(1, 9))
+
+
+def test_save_frames_and_gif(tmp_path):
+    path = get_puzzle_states()
+    view = Visualizer(path)
+    count = view.save_frames(str(tmp_path / 'frames'))
+    assert count == 2 + (len(path) - 1) * FRAMES_PER_MOVE
+    assert len(os.listdir(str(tmp_path / 'frames'))) == count
+    pytest.importorskip('PIL')
+    from PIL import Image
+    view.save(str(tmp_path / 'path.gif'))
+    with Image.open(str(tmp_path / 'path.gif')) as image:
+        assert image.size == (view._width, view._height)
+        assert image.n_frames > 1
+
+
+def test_save_video_needs_ffmpeg(tmp_path, monkeypatch):
+    monkeypatch.setattr(visualizer.shutil, 'which', lambda name: None)
+    with pytest.raises(FileNotFoundError):
+        Visualizer(get_puzzle_states()).save(str(tmp_path / 'path.mp4'))
@@ -0,0 +1,36 @@
+import pytest
+
+import walking_distance
+from puzzle import PuzzleState, PackedPuzzleProblem
+from search import astar, idastar
+from walking_distance import WalkingDistance
+from conftest import BOARDS, rows
+
+
+@pytest.fixture(scope='module')
+def heuristic():
+    return WalkingDistance(3, 3)
+
+
+def test_walking_distance_is_admissible_and_consistent(distance_table, heuristic):
+    for tiles in BOARDS:
+        state = PackedPuzzleProblem(PuzzleState(rows(tiles))).get_initial_state()
+        h = heuristic(state)
+        assert 0 <= h <= distance_table.distance(state)
+        assert heuristic(PuzzleState(rows(tiles))) == h
+        for next_state, _, _ in state.get_neighbors():
+            next_h = heuristic(next_state)
+            assert abs(next_h - h) <= 1
+            tile = (state.packed >> state.tables.shifts[next_state.blank]) & state.tables.mask
+            assert h + heuristic.delta(state.packed, tile, next_state.blank, state.blank) == next_h
+    assert heuristic(PackedPuzzleProblem(PuzzleState(rows(list(range(9))))).get_initial_state()) == 0
+
+
+@pytest.mark.parametrize('search', [astar, idastar])
+def test_signature_cache_stays_bounded(distance_table, monkeypatch, search):
+    monkeypatch.setattr(walking_distance, 'SIGNATURE_CACHE_SIZE', 16)
+    heuristic = WalkingDistance(3, 3)
+    for tiles in BOARDS[:3]:
+        path = search(PackedPuzzleProblem(PuzzleState(rows(tiles))), heuristic)[0]
+        assert len(path) - 1 == distance_table.distance(PuzzleState(rows(tiles)))
+        assert len(heuristic.signatures) <= 16
@@ -72,9 +72,10 @@ class PriorityQueue:
         for index, (p, c, i) in enumerate(self.heap):
             if i == item:
                 if p <= priority:
-                    break;
-                del self.heap[index]
-                heapq.heappush(self.heap, (priority, c, item))
+                    break
+                self.heap[index] = (priority, c, item)
+                heapq.heapify(self.heap)
+                break
     
     def size(self):
         "Return the current size of the priority queue."
@@ -85,6 +86,134 @@ class PriorityQueue:
         return len(self.heap) == 0
 
 
+class IndexedPriorityQueue:
+    """
+        Priority queue with an index from items to their heap entries, giving
+        O(log n) decrease-key. Updated items leave their old entry behind marked
+        as removed and these stale entries are skipped when popping. Equal
+        priority items are popped in the order they were originally inserted.
+    """
+    REMOVED = False
+
+    def __init__(self):
+        self.heap = []
+        self.entries = {}
+        self.count = 0
+
+    def push(self, item, priority):
+        "Push 'item' with 'priority' into the priority queue."
+        entry = [priority, self.count, item, True]
+        self.entries[item] = entry
+        heapq.heappush(self.heap, entry)
+        self.count += 1
+
+    def pop(self):
+        "Pop and return the item with the smallest priority from the priority queue."
+        while self.heap:
+            _, _, item, alive = heapq.heappop(self.heap)
+            if alive:
+                del self.entries[item]
+                return item
+        raise IndexError('pop from an empty priority queue')
+
+    def peek_priority(self):
+        "Return the smallest priority in the priority queue without popping it."
+        while self.heap and not self.heap[0][3]:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            raise IndexError('peek from an empty priority queue')
+        return self.heap[0][0]
+
+    def update(self, item, priority):
+        "Update item with a lower priority if it exists in the priority queue."
+        entry = self.entries.get(item)
+        if entry is None or entry[0] <= priority:
+            return
+        entry[3] = self.REMOVED
+        new_entry = [priority, entry[1], item, True]
+        self.entries[item] = new_entry
+        heapq.heappush(self.heap, new_entry)
+
+    def size(self):
+        "Return the current size of the priority queue."
+        return len(self.entries)
+
+    def is_empty(self):
+        "Return true if the priority queue is empty."
+        return len(self.entries) == 0
+
+
+class BucketQueue:
+    """
+        Priority queue for non-negative integer priorities, such as the f-values of
+        unit-cost puzzles. Items are kept in one FIFO bucket per priority so push,
+        update and pop are O(1) amortized, and equal priority items are popped in
+        the order they were inserted.
+    """
+    REMOVED = False
+
+    def __init__(self):
+        self.buckets = []
+        self.entries = {}
+        self.minimum = 0
+
+    def _bucket(self, priority):
+        index = int(priority)
+        if index != priority or index < 0:
+            raise ValueError('BucketQueue needs non-negative integer priorities, got {}'.format(priority))
+        while len(self.buckets) <= index:
+            self.buckets.append(deque())
+        self.minimum = min(self.minimum, index)
+        return self.buckets[index]
+
+    def push(self, item, priority):
+        "Push 'item' with 'priority' into the priority queue."
+        entry = [priority, item, True]
+        self.entries[item] = entry
+        self._bucket(priority).append(entry)
+
+    def pop(self):
+        "Pop and return the item with the smallest priority from the priority queue."
+        while self.minimum < len(self.buckets):
+            bucket = self.buckets[self.minimum]
+            while bucket:
+                _, item, alive = bucket.popleft()
+                if alive:
+                    del self.entries[item]
+                    return item
+            self.minimum += 1
+        raise IndexError('pop from an empty priority queue')
+
+    def peek_priority(self):
+        "Return the smallest priority in the priority queue without popping it."
+        while self.minimum < len(self.buckets):
+            bucket = self.buckets[self.minimum]
+            while bucket and not bucket[0][2]:
+                bucket.popleft()
+            if bucket:
+                return bucket[0][0]
+            self.minimum += 1
+        raise IndexError('peek from an empty priority queue')
+
+    def update(self, item, priority):
+        "Update item with a lower priority if it exists in the priority queue."
+        entry = self.entries.get(item)
+        if entry is None or entry[0] <= priority:
+            return
+        entry[2] = self.REMOVED
+        new_entry = [priority, item, True]
+        self.entries[item] = new_entry
+        self._bucket(priority).append(new_entry)
+
+    def size(self):
+        "Return the current size of the priority queue."
+        return len(self.entries)
+
+    def is_empty(self):
+        "Return true if the priority queue is empty."
+        return len(self.entries) == 0
+
+
 def is_sorted(l: List[int]) -> bool:
     """
     Checks if a list is sorted or not
@@ -0,0 +1,274 @@
+from puzzle import PackedPuzzleProblem, PackedPuzzleState, check_solvable, get_board_tables
+from typing import Callable, Dict, List, Union
+import numpy as np
+
+# Boards are handled as (N, H*W) uint8 arrays, and as uint64 keys holding 4 bits per cell, which is the same
+# integer PackedPuzzleState.packed uses for boards of up to 16 cells.
+BITS = 4
+
+
+class BoardArrays:
+    """
+    NumPy lookup tables of one board size.
+    """
+
+    def __init__(self, height: int, width: int):
+        self.height, self.width = height, width
+        self.size = height * width
+        if self.size > 16:
+            raise ValueError('Vectorized boards are limited to 16 cells, got {}x{}'.format(height, width))
+        self.shifts = np.arange(self.size, dtype=np.uint64) * np.uint64(BITS)
+        self.goal = np.arange(self.size, dtype=np.uint8)
+        self.goal_key = int(encode(self.goal[None, :], self)[0])
+        positions = np.arange(self.size)
+        tiles = np.arange(self.size)
+        self.goal_row, self.goal_column = tiles // width, tiles % width
+        # distance[tile, pos] is the Manhattan distance of tile sitting at pos, zero for the blank
+        self.distance = (np.abs(positions[None, :] // width - self.goal_row[:, None])
+                         + np.abs(positions[None, :] % width - self.goal_column[:, None]))
+        self.distance[0, :] = 0
+        # targets[blank, k] is where the blank goes with move k, -1 if the move leaves the board
+        neighbors = get_board_tables(height, width).neighbors
+        self.targets = np.full((self.size, 4), -1, dtype=np.int64)
+        for blank, options in enumerate(neighbors):
+            for k, (new_blank, _) in enumerate(options):
+                self.targets[blank, k] = new_blank
+        self.rows = [np.arange(i * width, (i + 1) * width) for i in range(height)]
+        self.columns = [np.arange(j, self.size, width) for j in range(width)]
+
+
+_board_arrays: Dict[tuple, BoardArrays] = {}
+
+
+def get_board_arrays(height: int, width: int) -> BoardArrays:
+    """
+    Returns the NumPy tables of the given board size, building them on first use
+    """
+    arrays = _board_arrays.get((height, width))
+    if arrays is None:
+        arrays = _board_arrays[(height, width)] = BoardArrays(height, width)
+    return arrays
+
+
+def encode(boards: np.ndarray, arrays: BoardArrays) -> np.ndarray:
+    """
+    Packs an (N, H*W) array of boards into N uint64 keys
+    """
+    return (boards.astype(np.uint64) << arrays.shifts).sum(axis=1, dtype=np.uint64)
+
+
+def decode(keys: np.ndarray, arrays: BoardArrays) -> np.ndarray:
+    """
+    Unpacks N uint64 keys into an (N, H*W) uint8 array of boards
+    """
+    return ((keys[:, None] >> arrays.shifts) & np.uint64(0xF)).astype(np.uint8)
+
+
+def to_array(states: List[PackedPuzzleState]) -> np.ndarray:
+    """
+    Converts a list of states of the same size into an (N, H*W) uint8 array
+    """
+    return np.array([state.tiles() for state in states], dtype=np.uint8).reshape(len(states), -1)
+
+
+def manhattan_batch(boards: np.ndarray, arrays: BoardArrays) -> np.ndarray:
+    """
+    Returns the Manhattan distance heuristic of every board of an (N, H*W) array
+    """
+    return arrays.distance[boards, np.arange(arrays.size)].sum(axis=1)
+
+
+def _line_conflicts_batch(lines: np.ndarray, line: int, goal_line: np.ndarray, goal_offset: np.ndarray) -> np.ndarray:
+    # Same count as heuristic.LinearConflict: tiles of the line minus their longest in-order run
+    belongs = (goal_line[lines] == line) & (lines != 0)
+    offsets = goal_offset[lines]
+    longest = np.zeros(lines.shape, dtype=np.int64)
+    for i in range(lines.shape[1]):
+        best = np.zeros(lines.shape[0], dtype=np.int64)
+        for k in range(i):
+            before = belongs[:, k] & (offsets[:, k] < offsets[:, i])
+            best = np.maximum(best, np.where(before, longest[:, k], 0))
+        longest[:, i] = np.where(belongs[:, i], best + 1, 0)
+    return belongs.sum(axis=1) - longest.max(axis=1)
+
+
+def linear_conflict_batch(boards: np.ndarray, arrays: BoardArrays) -> np.ndarray:
+    """
+    Returns the linear conflict heuristic of every board of an (N, H*W) array
+    """
+    conflicts = np.zeros(boards.shape[0], dtype=np.int64)
+    for row, cells in enumerate(arrays.rows):
+        conflicts += _line_conflicts_batch(boards[:, cells], row, arrays.goal_row, arrays.goal_column)
+    for column, cells in enumerate(arrays.columns):
+        conflicts += _line_conflicts_batch(boards[:, cells], column, arrays.goal_column, arrays.goal_row)
+    return manhattan_batch(boards, arrays) + 2 * conflicts
+
+
+def goal_batch(boards: np.ndarray, arrays: BoardArrays) -> np.ndarray:
+    """
+    Returns a boolean array telling which boards of an (N, H*W) array are solved
+    """
+    return (boards == arrays.goal).all(axis=1)
+
+
+BATCH_HEURISTICS = {
+    'manhattan': manhattan_batch,
+    'linear_conflict': linear_conflict_batch,
+}
+
+
+def expand_batch(keys: np.ndarray, arrays: BoardArrays):
+    """
+    Generates every successor of a batch of boards
+    :param keys: N uint64 keys
+    :return: (child_keys, child_boards, parent_index) with one row per successor
+    """
+    boards = decode(keys, arrays)
+    blanks = np.argmin(boards, axis=1)
+    child_keys, child_boards, parents = [], [], []
+    for k in range(4):
+        targets = arrays.targets[blanks, k]
+        rows = np.nonzero(targets >= 0)[0]
+        if not len(rows):
+            continue
+        targets, blank = targets[rows], blanks[rows]
+        tiles = boards[rows, targets]
+        children = boards[rows].copy()
+        children[np.arange(len(rows)), blank] = tiles
+        children[np.arange(len(rows)), targets] = 0
+        moved = tiles.astype(np.uint64)
+        child_keys.append(keys[rows] - (moved << arrays.shifts[targets]) + (moved << arrays.shifts[blank]))
+        child_boards.append(children)
+        parents.append(rows)
+    return np.concatenate(child_keys), np.concatenate(child_boards), np.concatenate(parents)
+
+
+def _path(keys: List[int], tables) -> List[PackedPuzzleState]:
+    path = []
+    for key in keys:
+        tiles = tables.unpack(key)
+        path.append(PackedPuzzleState(key, tiles.index(0), tables))
+    return path
+
+
+def _check_problem(problem: PackedPuzzleProblem) -> BoardArrays:
+    tables = problem.get_initial_state().tables
+    if tables.bits != BITS:
+        raise ValueError('Vectorized search needs boards of at most 16 cells')
+    return get_board_arrays(tables.height, tables.width)
+
+
+def layered_bfs(problem: PackedPuzzleProblem) -> [List[PackedPuzzleState], int]:
+    """
+    Returns a shortest path from the initial state of the problem to the goal, expanding one whole BFS layer at a
+    time as arrays. Since every move is reversible, a new layer only has to be checked against the current and
+    previous layers.
+    :param problem: a PackedPuzzleProblem of at most 16 cells
+    :return: the same (path, explored_states_count, maximum_depth_reached) triple as bfs
+    """
+    check_solvable(problem)
+    arrays = _check_problem(problem)
+    tables = problem.get_initial_state().tables
+    layer = np.array([problem.get_initial_state().packed], dtype=np.uint64)
+    previous = np.array([], dtype=np.uint64)
+    layers, parents = [layer], [np.array([-1])]
+    explored_states_count = 0
+    depth = 0
+    while len(layer):
+        hits = np.nonzero(layer == np.uint64(arrays.goal_key))[0]
+        if len(hits):
+            explored_states_count += 1
+            index, keys = hits[0], []
+            for d in range(depth, -1, -1):
+                keys.append(int(layers[d][index]))
+                index = parents[d][index]
+            keys.reverse()
+            return _path(keys, tables), explored_states_count, depth
+        explored_states_count += len(layer)
+        child_keys, _, parent_index = expand_batch(layer, arrays)
+        child_keys, first = np.unique(child_keys, return_index=True)
+        fresh = ~np.isin(child_keys, previous) & ~np.isin(child_keys, layer)
+        previous, layer = np.sort(layer), child_keys[fresh]
+        layers.append(layer)
+        parents.append(parent_index[first][fresh])
+        depth += 1
+    return [], explored_states_count, depth - 1
+
+
+def batched_astar(problem: PackedPuzzleProblem,
+                  heuristic: Union[str, Callable[[np.ndarray, BoardArrays], np.ndarray]]='manhattan',
+                  batch_size: int=4096) -> [List[PackedPuzzleState], int]:
+    """
+    Returns the path from the initial state of the problem to the goal using A* that expands slices of up to
+    batch_size open nodes with the smallest f-value at once. Successor generation, heuristics, goal tests and
+    duplicate detection run as NumPy operations on the whole slice. The heuristic must be consistent.
+    :param problem: a PackedPuzzleProblem of at most 16 cells
+    :param heuristic: a name from BATCH_HEURISTICS or a function of an (N, H*W) array and the BoardArrays
+    :param batch_size: maximum number of nodes expanded together
+    :return: the same (path, explored_states_count, maximum_depth_reached) triple as astar
+    """
+    check_solvable(problem)
+    arrays = _check_problem(problem)
+    tables = problem.get_initial_state().tables
+    evaluate = BATCH_HEURISTICS[heuristic] if isinstance(heuristic, str) else heuristic
+    start = np.array([problem.get_initial_state().packed], dtype=np.uint64)
+    # Sorted table of every generated board with its best g and the key of its parent
+    seen_keys, seen_g, seen_parent = start, np.zeros(1, dtype=np.int64), np.array([0], dtype=np.uint64)
+    start_f = int(evaluate(decode(start, arrays), arrays)[0])
+    buckets = {start_f: [(start, np.zeros(1, dtype=np.int64))]}
+    explored_states_count = 0
+    maximum_depth_reached = -1
+    while buckets:
+        f = min(buckets)
+        keys = np.concatenate([keys for keys, _ in buckets[f]])
+        g = np.concatenate([g for _, g in buckets[f]])
+        if len(keys) > batch_size:
+            buckets[f] = [(keys[batch_size:], g[batch_size:])]
+            keys, g = keys[:batch_size], g[:batch_size]
+        else:
+            del buckets[f]
+        # Skip entries that were reached again with a smaller g after being queued
+        index = np.searchsorted(seen_keys, keys)
+        current = seen_g[index] == g
+        keys, g = keys[current], g[current]
+        if not len(keys):
+            continue
+        explored_states_count += len(keys)
+        maximum_depth_reached = max(maximum_depth_reached, int(g.max()))
+        goal = np.nonzero(keys == np.uint64(arrays.goal_key))[0]
+        if len(goal):
+            path = [int(keys[goal[0]])]
+            while path[-1] != int(start[0]):
+                path.append(int(seen_parent[np.searchsorted(seen_keys, np.uint64(path[-1]))]))
+            path.reverse()
+            return _path(path, tables), explored_states_count, maximum_depth_reached
+        child_keys, child_boards, parent_index = expand_batch(keys, arrays)
+        child_g = g[parent_index] + 1
+        order = np.lexsort((child_g, child_keys))
+        child_keys, child_boards, child_g, parent_index = \
+            child_keys[order], child_boards[order], child_g[order], parent_index[order]
+        first = np.ones(len(child_keys), dtype=bool)
+        first[1:] = child_keys[1:] != child_keys[:-1]
+        child_keys, child_boards, child_g, parent_index = \
+            child_keys[first], child_boards[first], child_g[first], parent_index[first]
+        index = np.searchsorted(seen_keys, child_keys)
+        clipped = np.minimum(index, len(seen_keys) - 1)
+        exists = seen_keys[clipped] == child_keys
+        better = exists & (child_g < seen_g[clipped])
+        seen_g[clipped[better]] = child_g[better]
+        seen_parent[clipped[better]] = keys[parent_index[better]]
+        new = ~exists
+        if new.any():
+            # The new keys are sorted already, so inserting them at their searchsorted positions keeps the table
+            # sorted without sorting it again
+            index = index[new]
+            seen_keys = np.insert(seen_keys, index, child_keys[new])
+            seen_g = np.insert(seen_g, index, child_g[new])
+            seen_parent = np.insert(seen_parent, index, keys[parent_index[new]])
+        push = better | new
+        child_keys, child_g = child_keys[push], child_g[push]
+        child_f = child_g + evaluate(child_boards[push], arrays)
+        for value in np.unique(child_f):
+            selected = child_f == value
+            buckets.setdefault(int(value), []).append((child_keys[selected], child_g[selected]))
+    return [], explored_states_count, maximum_depth_reached
@@ -1,6 +1,10 @@
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 from problem import SearchState
 from puzzle import PuzzleState
+import argparse
+import os
+import shutil
+import subprocess
 import pygame
 from pygame.locals import *
 
@@ -23,14 +27,25 @@ BASIC_FONT_SIZE = 20
 TILE_SIZE = 80 # In pixels
 BORDER_WIDTH = 1
 OFFSET_BETWEEN_TILES = 8
+ANIMATION_SPEED = int(TILE_SIZE / 12) # In pixels per frame
+
+SOLVING_MESSAGE = "Solving puzzle..."
+SOLVED_MESSAGE = "Puzzle Solved!"
 
 class Visualizer:
+    """
+    Animates a solution path. play() shows it in a window paced at fps; frames(), save_frames(), save_gif() and
+    save_video() render it headless, on an off-screen surface as fast as possible, for batch reports.
+    Tiles are drawn from sprites rendered once per tile value and size, and a sliding tile only redraws the
+    rectangle it sweeps.
+    """
 
     def __init__(self, history: List[SearchState], fps=45):
         self._running = True
         self._display_surf = None
         self._fps = fps
         self._history = history
+        self._sprites: Dict[Tuple[int, int], pygame.Surface] = {}
         self.clock = pygame.time.Clock()
 
         self._tiles_per_row = len(history[0].state[0])
@@ -47,6 +62,13 @@ class Visualizer:
         self._running = True
         pygame.display.set_caption('Slide Puzzle Visualization')
 
+    def _init_headless(self):
+        # Fonts are the only subsystem needed to draw on an off-screen surface, so no display is opened
+        pygame.font.init()
+        self._tile_font = pygame.font.Font('freesansbold.ttf', BASIC_FONT_SIZE)
+        self._display_surf = pygame.Surface((self._width, self._height))
+        self._sprites.clear()
+
     def on_event(self, event):
         if event.type == pygame.QUIT:
             self._running = False
@@ -54,33 +76,44 @@ class Visualizer:
     def on_loop(self):
         pass
 
-    def on_render(self, game_state, msg):
-        self._draw_board(game_state.state, msg)
-        pygame.display.flip()
-
     def on_cleanup(self):
+        self._sprites.clear()
         pygame.quit()
 
-    def _slide_animation(self, board, tile_curr_pos, tile_target_pos, animation_speed):
-        # Save a copy of the original surface
-        self._draw_board(board, "Solving puzzle...")
-        original_surf = self._display_surf.copy()
-
+    def _slide_animation(self, board, tile_curr_pos, tile_target_pos, animation_speed) -> Iterator[List[Rect]]:
+        """
+        Slides a tile to the blank cell, yielding the rectangles changed by each frame. Only the tile and the cells
+        it sweeps change, and they lie on the background color, so each frame fills the union of the previous and
+        the new tile rectangle and blits the tile sprite.
+        """
         src_grid_x, src_grid_y = tile_curr_pos[0], tile_curr_pos[1]
         dest_grid_x, dest_grid_y = tile_target_pos[0], tile_target_pos[1]
-
-        # Erase the tile from the original surface
-        src_coord_left, src_coord_top = self._get_tile_pos(src_grid_x, src_grid_y)
-        pygame.draw.rect(original_surf, BACKGROUND_COLOR, (src_coord_left, src_coord_top, TILE_SIZE, TILE_SIZE))
-
-        # print(board[src_x][src_y])
-        # Move a distance of TILE_SIZE with speed = animation_speed per iteration
-        for i in range(0, TILE_SIZE + animation_speed, animation_speed):
-            # Check for exit here
-            self._display_surf.blit(original_surf, (0,0))
-            self._draw_tile(src_grid_x, src_grid_y, board[src_grid_x][src_grid_y], (dest_grid_y - src_grid_y) * i, (dest_grid_x - src_grid_x) * i)
-            pygame.display.flip()
-            self.clock.tick(self._fps)
+        sprite = self._tile_sprite(board[src_grid_x][src_grid_y])
+        start = pygame.Rect(self._get_tile_pos(src_grid_x, src_grid_y), (TILE_SIZE, TILE_SIZE))
+        previous = start
+
+        # Move a distance of one cell with speed = animation_speed per iteration, ending exactly on the target cell
+        distance = TILE_SIZE + OFFSET_BETWEEN_TILES
+        for i in list(range(animation_speed, distance, animation_speed)) + [distance]:
+            rect = start.move((dest_grid_y - src_grid_y) * i, (dest_grid_x - src_grid_x) * i)
+            dirty = rect.union(previous)
+            self._display_surf.fill(BACKGROUND_COLOR, dirty)
+            self._display_surf.blit(sprite, rect)
+            previous = rect
+            yield [dirty]
+
+    def _animation_frames(self) -> Iterator[Optional[List[Rect]]]:
+        """
+        Draws the whole path frame by frame on the display surface, yielding the rectangles changed by each frame,
+        or None when the whole surface changed
+        """
+        self._draw_board(self._history[0].state, SOLVING_MESSAGE)
+        yield None
+        for curr_board, next_board in zip(self._history, self._history[1:]):
+            moved_tile_pos, target_pos = self._get_moved_tile_pos(curr_board, next_board)
+            yield from self._slide_animation(curr_board.state, moved_tile_pos, target_pos, ANIMATION_SPEED)
+        self._draw_board(self._history[-1].state, SOLVED_MESSAGE)
+        yield None
 
     def _get_moved_tile_pos(self, curr_board, next_board):
         """
@@ -93,22 +126,18 @@ class Visualizer:
         if self.on_init() == False:
             self._running = False
 
-        self.on_render(self._history[0], "Solving puzzle...")
-        next_board_idx = 1
+        frames = self._animation_frames()
         while self._running:
             for event in pygame.event.get():
                 self.on_event(event)
-            if next_board_idx >= len(self._history):
-                self.on_render(self._history[-1], "Puzzle Solved!")
-                # Display puzzle solved message, wait for 2-3 seconds then quit or something
-                # pygame.time.delay(3000)
-                # self._running = False
-                pass
-            else:
-                moved_tile_pos, target_pos = self._get_moved_tile_pos(self._history[next_board_idx - 1], self._history[next_board_idx])
-                self._slide_animation(self._history[next_board_idx - 1].state, moved_tile_pos, target_pos, animation_speed=int(TILE_SIZE / 12))
-                next_board_idx += 1
+            # Once the path is over the solved board stays on screen until the window is closed
+            dirty = next(frames, [])
+            if dirty is None:
+                pygame.display.flip()
+            elif dirty:
+                pygame.display.update(dirty)
             self.on_loop()
+            self.clock.tick(self._fps)
         self.on_cleanup()
 
     def play(self) -> None:
@@ -117,6 +146,68 @@ class Visualizer:
         """
         self.on_execute()
 
+    def frames(self) -> Iterator[pygame.Surface]:
+        """
+        Renders the visualization headless, without a display or frame pacing, yielding the surface after every
+        frame. The same surface is yielded each time and redrawn in place, so copy it to keep a frame.
+        """
+        self._init_headless()
+        for _ in self._animation_frames():
+            yield self._display_surf
+
+    def save_frames(self, directory: str, prefix: str='frame') -> int:
+        """
+        Renders the visualization headless to numbered PNG files
+        :return: the number of frames written
+        """
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for count, surface in enumerate(self.frames(), 1):
+            pygame.image.save(surface, os.path.join(directory, '{}_{:05d}.png'.format(prefix, count)))
+        return count
+
+    def save_gif(self, path: str) -> None:
+        """
+        Renders the visualization headless to an animated GIF played at fps. Needs Pillow.
+        """
+        from PIL import Image
+        size = (self._width, self._height)
+        images = (Image.frombytes('RGB', size, pygame.image.tobytes(surface, 'RGB')) for surface in self.frames())
+        first = next(images)
+        first.save(path, save_all=True, append_images=images, duration=int(1000 / self._fps), loop=0)
+
+    def save_video(self, path: str) -> None:
+        """
+        Renders the visualization headless to a video file played at fps, encoded by ffmpeg in the format given by
+        the file extension
+        """
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg is None:
+            raise FileNotFoundError('ffmpeg is needed to write videos')
+        # Common video codecs need even dimensions, so the frames are padded by one pixel if needed
+        command = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                   '-s', '{}x{}'.format(self._width, self._height), '-r', str(self._fps), '-i', '-',
+                   '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', path]
+        with subprocess.Popen(command, stdin=subprocess.PIPE) as encoder:
+            for surface in self.frames():
+                encoder.stdin.write(pygame.image.tobytes(surface, 'RGB'))
+            encoder.stdin.close()
+        if encoder.returncode != 0:
+            raise RuntimeError('ffmpeg failed to write {}'.format(path))
+
+    def save(self, path: str) -> None:
+        """
+        Renders the visualization headless to a .gif file, a directory of PNG frames (a path without extension) or
+        a video file of any other extension
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.gif':
+            self.save_gif(path)
+        elif not extension:
+            self.save_frames(path)
+        else:
+            self.save_video(path)
+
     def _get_tile_pos(self, grid_x, grid_y):
         """
         Given position of tile relative to board (grid position), returns the screen position of the tile (coordinates position)
@@ -130,28 +221,38 @@ class Visualizer:
         Draws tile value at given position in the board
         """
         tile_left, tile_top = self._get_tile_pos(pos_x, pos_y)
-        self._draw_round_rect(pygame.Rect(tile_left + offset_x, tile_top + offset_y, TILE_SIZE, TILE_SIZE), TILE_COLOR, radius=0.2)
-        text_surf = self._tile_font.render(str(tile), True, TEXT_COLOR)
-        text_rect_surf = text_surf.get_rect()
-        text_rect_surf.center = tile_left + int(TILE_SIZE / 2) + offset_x, tile_top + int(TILE_SIZE / 2) + offset_y
-        self._display_surf.blit(text_surf, text_rect_surf)
+        return self._display_surf.blit(self._tile_sprite(tile), (tile_left + offset_x, tile_top + offset_y))
 
-    def _draw_round_rect(self, rect, color,radius=0.4):
+    def _tile_sprite(self, tile, size=TILE_SIZE):
+        """
+        Returns the image of a tile, rendered once per tile value and size
+        """
+        sprite = self._sprites.get((tile, size))
+        if sprite is None:
+            sprite = self._round_rect(pygame.Rect(0, 0, size, size), TILE_COLOR, radius=0.2)
+            text_surf = self._tile_font.render(str(tile), True, TEXT_COLOR)
+            text_rect_surf = text_surf.get_rect()
+            text_rect_surf.center = int(size / 2), int(size / 2)
+            sprite.blit(text_surf, text_rect_surf)
+            self._sprites[(tile, size)] = sprite
+        return sprite
+
+    def _round_rect(self, rect, color,radius=0.4):
 
         """
-        AAfilledRoundedRect(surface,rect,color,radius=0.4)
+        AAfilledRoundedRect(rect,color,radius=0.4)
 
-        surface : destination
         rect    : rectangle
         color   : rgb or rgba
         radius  : 0 <= radius <= 1
+
+        Returns a surface of the size of rect holding the rounded rectangle
         """
 
         rect         = Rect(rect)
         color        = Color(*color)
         alpha        = color.a
         color.a      = 0
-        pos          = rect.topleft
         rect.topleft = 0,0
         rectangle    = pygame.Surface(rect.size,SRCALPHA)
 
@@ -173,7 +274,7 @@ class Visualizer:
         rectangle.fill(color,special_flags=BLEND_RGBA_MAX)
         rectangle.fill((255,255,255,alpha),special_flags=BLEND_RGBA_MIN)
 
-        return self._display_surf.blit(rectangle,pos)
+        return rectangle
 
     def _draw_board(self, board, msg=None):
         """
@@ -211,7 +312,15 @@ def get_puzzle_states():
             ]
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Animate a solution path')
+    parser.add_argument('--output', default=None,
+                        help='render headless to a .gif, a video file or a directory of PNG frames instead of playing')
+    parser.add_argument('--fps', type=int, default=45)
+    args = parser.parse_args()
     path = get_puzzle_states()
     # for state in path:
     #     print(state)
-    Visualizer(path).play()
+    if args.output:
+        Visualizer(path, args.fps).save(args.output)
+    else:
+        Visualizer(path, args.fps).play()
@@ -0,0 +1,228 @@
+from puzzle import PuzzleState, PackedPuzzleProblem
+from heuristic import IncrementalHeuristic, ManhattanDistance, LinearConflict, state_tiles
+from search import astar
+from instances import random_walk_instances
+from typing import Dict, List, Tuple
+import argparse
+import itertools
+import os
+import struct
+import time
+
+from pattern_database import DEFAULT_TABLES_DIR
+
+# Header of a walking distance table file: magic, number of lines, cells per line, bytes per signature
+HEADER = struct.Struct('<4sBBB')
+MAGIC = b'WDT1'
+# Signatures remembered for the boards whose successors delta evaluates next; cleared when full. idastar expands
+# the children of the board it just expanded, so a few thousand boards keep its memory small; best-first searches
+# rescan the boards they pop after a clear
+SIGNATURE_CACHE_SIZE = 4096
+
+
+def signature_weights(lines: int, cells: int) -> Tuple[List[List[int]], int]:
+    """
+    Returns the weights of the signature of a line configuration: the number of tiles on line l whose goal line is
+    g, at most cells, is a digit of weight weights[l][g] in base cells + 1, and the line of the blank is the digit
+    of weight blank_weight above them
+    :return: (weights, blank_weight)
+    """
+    base = cells + 1
+    return [[base ** (line * lines + goal) for goal in range(lines)] for line in range(lines)], base ** (lines * lines)
+
+
+def build_table(lines: int, cells: int) -> Dict[int, int]:
+    """
+    Builds the walking distance of every configuration of a board of lines lines of cells cells by a BFS from the
+    goal. A configuration only records how many tiles of each goal line every line holds and which line holds the
+    blank; a move swaps the blank with any tile of an adjacent line. Rows give the vertical walking distance
+    (lines = height, cells = width), columns the horizontal one (lines = width, cells = height).
+    :param lines: number of lines
+    :param cells: number of cells of each line
+    :return: the distance of every configuration, keyed by its signature (see signature_weights)
+    """
+    weights, blank_weight = signature_weights(lines, cells)
+    base = cells + 1
+    # The goal has the blank on the first line, the other lines full of their own tiles
+    goal = (cells - 1) * weights[0][0] + sum(cells * weights[line][line] for line in range(1, lines))
+    distances = {goal: 0}
+    layer = [goal]
+    distance = 0
+    while layer:
+        distance += 1
+        next_layer = []
+        for signature in layer:
+            blank = signature // blank_weight
+            for new_blank in (blank - 1, blank + 1):
+                if not 0 <= new_blank < lines:
+                    continue
+                for goal_line in range(lines):
+                    if (signature // weights[new_blank][goal_line]) % base:
+                        child = signature - weights[new_blank][goal_line] + weights[blank][goal_line] \
+                            + (new_blank - blank) * blank_weight
+                        if child not in distances:
+                            distances[child] = distance
+                            next_layer.append(child)
+        layer = next_layer
+    return distances
+
+
+def table_path(lines: int, cells: int, directory: str=DEFAULT_TABLES_DIR) -> str:
+    """
+    Returns the file name a walking distance table is persisted to
+    """
+    return os.path.join(directory, 'wd_{}x{}.bin'.format(lines, cells))
+
+
+def save_table(path: str, lines: int, cells: int, table: Dict[int, int]) -> None:
+    """
+    Writes a walking distance table to disk as (signature, distance) records after its header
+    """
+    signature_bytes = (max(table).bit_length() + 7) // 8
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, lines, cells, signature_bytes))
+        f.write(b''.join(signature.to_bytes(signature_bytes, 'little') + bytes((distance,))
+                         for signature, distance in sorted(table.items())))
+    os.replace(tmp_path, path)
+
+
+def load_table(path: str, lines: int, cells: int) -> Dict[int, int]:
+    """
+    Reads a walking distance table written by save_table
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, file_lines, file_cells, signature_bytes = HEADER.unpack_from(data)
+    record = signature_bytes + 1
+    if magic != MAGIC or (file_lines, file_cells) != (lines, cells) or (len(data) - HEADER.size) % record:
+        raise ValueError('{} is not a walking distance table of {} lines of {} cells'.format(path, lines, cells))
+    return {int.from_bytes(data[offset: offset + signature_bytes], 'little'): data[offset + signature_bytes]
+            for offset in range(HEADER.size, len(data), record)}
+
+
+_tables: Dict[Tuple[int, int, str], Dict[int, int]] = {}
+
+
+def get_table(lines: int, cells: int, directory: str=DEFAULT_TABLES_DIR, build: bool=True) -> Dict[int, int]:
+    """
+    Returns the walking distance table of a line shape, loaded from disk (built and persisted first if it does not
+    exist yet) on first use and shared afterwards
+    """
+    key = (lines, cells, directory)
+    if key not in _tables:
+        path = table_path(lines, cells, directory)
+        if not os.path.exists(path):
+            if not build:
+                raise FileNotFoundError(path)
+            save_table(path, lines, cells, build_table(lines, cells))
+        _tables[key] = load_table(path, lines, cells)
+    return _tables[key]
+
+
+class WalkingDistance(IncrementalHeuristic):
+    """
+    Walking distance: the moves needed to bring every tile to its goal row, counting that the blank can only swap
+    with a tile of an adjacent row, plus the same for columns. Unlike the Manhattan distance it accounts for tiles
+    getting in each other's way, and it is admissible because every move changes only one of the two terms.
+    A board is reduced to a row signature and a column signature (see signature_weights), each looked up in a
+    table enumerated once per board size. A move changes each signature by a precomputed amount, so delta updates
+    the signatures of a parent instead of scanning the child, and remembers them for the child's own successors.
+    """
+
+    def __init__(self, height: int=3, width: int=3, directory: str=DEFAULT_TABLES_DIR, build: bool=True):
+        super().__init__(height, width)
+        size = self.size
+        self.rows = get_table(height, width, directory, build)
+        self.columns = self.rows if height == width else get_table(width, height, directory, build)
+        row_weights, row_blank_weight = signature_weights(height, width)
+        column_weights, column_blank_weight = signature_weights(width, height)
+        # row_terms[pos][tile] is what a tile (or the blank) on cell pos adds to the row signature
+        self.row_terms = [[row_weights[pos // width][tile // width] if tile else pos // width * row_blank_weight
+                           for tile in range(size)] for pos in range(size)]
+        self.column_terms = [[column_weights[pos % width][tile % width] if tile else pos % width * column_blank_weight
+                              for tile in range(size)] for pos in range(size)]
+        self.signature_deltas = [
+            (self._term_delta(self.row_terms, tile, from_pos, to_pos),
+             self._term_delta(self.column_terms, tile, from_pos, to_pos))
+            for tile in range(size) for from_pos in range(size) for to_pos in range(size)]
+        self.signatures: Dict[int, Tuple[int, int]] = {}
+
+    @staticmethod
+    def _term_delta(terms: List[List[int]], tile: int, from_pos: int, to_pos: int) -> int:
+        # The tile moves from from_pos to to_pos and the blank the other way
+        return terms[to_pos][tile] - terms[from_pos][tile] + terms[from_pos][0] - terms[to_pos][0]
+
+    def _signatures(self, tiles: List[int]) -> Tuple[int, int]:
+        row_terms, column_terms = self.row_terms, self.column_terms
+        return sum(row_terms[pos][tile] for pos, tile in enumerate(tiles)), \
+            sum(column_terms[pos][tile] for pos, tile in enumerate(tiles))
+
+    def _remember(self, packed: int, signatures: Tuple[int, int]) -> None:
+        if len(self.signatures) >= SIGNATURE_CACHE_SIZE:
+            self.signatures.clear()
+        self.signatures[packed] = signatures
+
+    def __call__(self, state) -> int:
+        row_signature, column_signature = self._signatures(state_tiles(state))
+        if hasattr(state, 'packed'):
+            self._remember(state.packed, (row_signature, column_signature))
+        return self.rows[row_signature] + self.columns[column_signature]
+
+    def delta(self, packed: int, tile: int, from_pos: int, to_pos: int) -> int:
+        signatures = self.signatures.get(packed)
+        if signatures is None:
+            signatures = self._signatures(self.tables.unpack(packed))
+        row_signature, column_signature = signatures
+        row_delta, column_delta = self.signature_deltas[(tile * self.size + from_pos) * self.size + to_pos]
+        child = packed - (tile << self.tables.shifts[from_pos]) + (tile << self.tables.shifts[to_pos])
+        self._remember(child, (row_signature + row_delta, column_signature + column_delta))
+        return self.rows[row_signature + row_delta] + self.columns[column_signature + column_delta] \
+            - self.rows[row_signature] - self.columns[column_signature]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the walking distance tables of a board size and compare '
+                                                 'the heuristic with the Manhattan distance on astar')
+    parser.add_argument('--height', type=int, default=4)
+    parser.add_argument('--width', type=int, default=4)
+    parser.add_argument('--directory', default=DEFAULT_TABLES_DIR)
+    parser.add_argument('--count', type=int, default=20, help='random-walk boards to solve, 0 to only build')
+    parser.add_argument('--min-depth', type=int, default=30)
+    parser.add_argument('--max-depth', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for lines, cells in sorted({(args.height, args.width), (args.width, args.height)}):
+        start_time = time.time()
+        table = get_table(lines, cells, args.directory)
+        path = table_path(lines, cells, args.directory)
+        print("Walking distance %dx%d: %d configurations, max distance %d, %d bytes, loaded in %f seconds -> %s"
+              % (lines, cells, len(table), max(table.values()), os.path.getsize(path), time.time() - start_time,
+                 path))
+
+    heuristics = [('manhattan', ManhattanDistance(args.height, args.width)),
+                  ('linear_conflict', LinearConflict(args.height, args.width)),
+                  ('walking_distance', WalkingDistance(args.height, args.width, args.directory))]
+    totals = {name: [0, 0.0] for name, _ in heuristics}
+    tables = WalkingDistance(args.height, args.width, args.directory).tables
+    for number, (packed, _) in enumerate(itertools.islice(
+            random_walk_instances(args.height, args.width, args.min_depth, args.max_depth, args.seed), args.count)):
+        tiles = tables.unpack(packed)
+        problem = PackedPuzzleProblem(PuzzleState([tiles[i: i + args.width]
+                                                   for i in range(0, len(tiles), args.width)]))
+        costs = []
+        for name, heuristic in heuristics:
+            start_time = time.perf_counter()
+            path, explored_states_count, _ = astar(problem, heuristic, integer_priorities=True)
+            elapsed = time.perf_counter() - start_time
+            totals[name][0] += explored_states_count
+            totals[name][1] += elapsed
+            costs.append(len(path) - 1)
+            print("%d %-16s cost=%d nodes=%d time=%.4fs" % (number, name, len(path) - 1, explored_states_count,
+                                                             elapsed))
+        if len(set(costs)) > 1:
+            print("%d cost mismatch %s" % (number, costs))
+    for name, (nodes, elapsed) in totals.items():
+        print("%-16s nodes=%d time=%.3fs nodes/sec=%.0f" % (name, nodes, elapsed, nodes / elapsed if elapsed else 0))